@@ -26,9 +26,54 @@ SPARK_UI_PORT=4066
 
 MAX_CORES=4
 
+# memory in MB available to the feature tasks on each worker node. Tasks of
+# the features decoding raw MotionSense packets are admitted against it, so
+# MAX_CORES can be raised without OOM-killing the workers. Leave blank to
+# disable.
+MEMORY_BUDGET=""
+if [ -n "$MEMORY_BUDGET" ]
+    then
+	MEMORY_OPTION="--memory-budget $MEMORY_BUDGET"
+fi
+
 # set to True to make use of spark parallel execution
 SPARK_JOB="True"
 
+# set to True to keep a single driver running which polls for new data and
+# processes only the user-days that received it, instead of re-running the
+# whole date range every hour
+CONTINUOUS="False"
+POLL_INTERVAL=300
+WATERMARK_FILE="/tmp/cc_feature_watermarks.json"
+MANIFEST_FILE="/tmp/cc_feature_manifest.json"
+
+# features failing on a user-day are recorded in the failure ledger. Run
+# core/driver.py with --retry-failed and the same ledger to recompute only
+# those user-days. A feature running longer than TASK_TIMEOUT seconds on a
+# user-day is interrupted.
+FAILURE_LEDGER="/tmp/cc_feature_failures.json"
+TASK_TIMEOUT=7200
+
+if [ $CONTINUOUS == 'True' ]
+    then
+	echo 'Executing continuously'
+	spark-submit --master $SPARK_MASTER \
+		     --conf spark.ui.port=$SPARK_UI_PORT \
+		     --conf spark.cores.max=$MAX_CORES \
+		     --conf spark.speculation=true \
+		     --conf spark.speculation.multiplier=3 \
+		     --conf spark.app.name=$FEATURES \
+		     --py-files $PY_FILES \
+		     core/driver.py -c $CC_CONFIG_FILEPATH \
+		     -s $STUDY_NAME -sd $START_DATE \
+		     -ed $END_DATE -u $USERIDS -f $FEATURES \
+		     -p $MAX_CORES --continuous \
+		     --poll-interval $POLL_INTERVAL \
+		     -w $WATERMARK_FILE -m $MANIFEST_FILE $MEMORY_OPTION \
+		     --failure-ledger $FAILURE_LEDGER --task-timeout $TASK_TIMEOUT
+	exit $?
+fi
+
 while :
 do
 	echo `date` >> /tmp/loop_test
@@ -40,19 +85,25 @@ do
 		spark-submit --master $SPARK_MASTER \
 			     --conf spark.ui.port=$SPARK_UI_PORT \
 			     --conf spark.cores.max=$MAX_CORES \
+			     --conf spark.speculation=true \
+			     --conf spark.speculation.multiplier=3 \
 			     --conf spark.app.name=$FEATURES \
 			     --py-files $PY_FILES \
 			     core/driver.py -c $CC_CONFIG_FILEPATH \
 			     -s $STUDY_NAME -sd $START_DATE \
 			     -ed $END_DATE -u $USERIDS -f $FEATURES \
-			     -p $MAX_CORES
+			     -p $MAX_CORES $MEMORY_OPTION \
+			     --failure-ledger $FAILURE_LEDGER \
+			     --task-timeout $TASK_TIMEOUT
 	    else
 		echo 'Executing single threaded'
 		export PYTHONPATH=.:${CC_EGG}:$PYTHONPATH
 		echo $PYTHONPATH
 		python3.6 core/driver.py -c $CC_CONFIG_FILEPATH \
 			       -s $STUDY_NAME -sd $START_DATE \
-			       -ed $END_DATE -u $USERIDS -f $FEATURES
+			       -ed $END_DATE -u $USERIDS -f $FEATURES \
+			       --failure-ledger $FAILURE_LEDGER \
+			       --task-timeout $TASK_TIMEOUT
 
 	fi
 	sleep 3600
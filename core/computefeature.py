@@ -24,6 +24,7 @@
 
 import traceback
 import pkg_resources
+import numpy as np
 from cerebralcortex.core.datatypes.datastream import DataStream
 from cerebralcortex.core.log_manager.log_handler import LogTypes
 from cerebralcortex.core.datatypes.stream_types import StreamTypes
@@ -32,7 +33,19 @@ import os
 import json
 import sys
 import ast
+import copy
 from distutils.version import StrictVersion
+from core.signalprocessing.timeseries import TimeSeries
+
+# Process-wide caches of the parsed metadata templates, keyed by template file,
+# and of the output stream identifiers, keyed by (template file, user, feature
+# class). Both only depend on their key, so they are filled on first use and
+# never invalidated.
+_metadata_templates = {}
+_output_stream_ids = {}
+
+# The version of a stream identifier never changes and is cached for good.
+_stream_versions = {}
 
 class ComputeFeatureBase(object):
     '''
@@ -50,9 +63,6 @@ class ComputeFeatureBase(object):
         '''
         This method saves the computed DataStreams from different features
         '''
-        stream_str = str(filepath) 
-        stream_str += str(user_id) 
-        
         # creating new input_streams list with only the needed information
         input_streams_metadata = []
         for input_strm in input_streams:
@@ -66,21 +76,17 @@ class ComputeFeatureBase(object):
             stream_info['name'] = input_strm['name']
             input_streams_metadata.append(stream_info)
 
-        metadata_file_path = '/'.join(['core','resources','metadata',filepath])
-        # FIXME
-        metadata_str = str(__loader__.get_data(metadata_file_path).decode("utf-8"))
-
-        metadata = json.loads(metadata_str)
-        
-        stream_str += str(self.__class__.__name__)
-        stream_str += str(metadata)
-        stream_name = metadata['name']
+        template = get_metadata_template(filepath)
+        stream_name = template['name']
         #stream_name = stream_name.replace('feature.','feature.v2.')
-        stream_str += str(stream_name)
+        output_stream_id = get_output_stream_id(filepath, user_id,
+                                                self.__class__.__name__)
 
-        output_stream_id = str(uuid.uuid3(uuid.NAMESPACE_DNS, stream_str))
-        metadata["execution_context"]["processing_module"]["input_streams"]\
-                = input_streams_metadata
+        # the stored stream gets its own copy of the cached template, which
+        # the storage layer or a write-behind writer may modify
+        metadata = copy.deepcopy(template)
+        metadata["execution_context"]["processing_module"]["input_streams"] = \
+            input_streams_metadata
         metadata["identifier"] = str(output_stream_id)
         metadata["owner"] = str(user_id)
         self.CC.logging.log('%s called '
@@ -98,6 +104,8 @@ class ComputeFeatureBase(object):
               localtime=True):
         '''
         All store operations MUST be through this method.
+        When a StreamWriter is attached to the feature as writer, the stream
+        is handed to it and saved in the background.
         '''
         if not data:
             self.CC.logging.log(error_type=LogTypes.MISSING_DATA, error_message
@@ -110,6 +118,12 @@ class ComputeFeatureBase(object):
                         execution_context=execution_context, 
                         annotations=annotations,
                         stream_type=stream_type, data=data)
+        # the stream may now be the latest version of its name
+        self._latest_stream_ids().pop((str(owner), name), None)
+        writer = getattr(self, 'writer', None)
+        if writer is not None:
+            writer.write(ds, localtime=localtime)
+            return
         try:
             self.CC.save_stream(datastream=ds, localtime=localtime)
             self.CC.logging.log('Saved %d data points stream id %s user_id '
@@ -122,20 +136,27 @@ class ComputeFeatureBase(object):
 
 
     def get_latest_stream_id(self, user_id, stream_name):
+        '''
+        Returns the identifiers of the streams with the given name that have
+        the latest algorithm version. Within a run of the feature, the
+        answer is memoized per user and stream name, unless no stream was
+        found, and dropped when the feature stores a stream of that name.
+        '''
+        self.flush_pending_writes(user_id, stream_name)
+        key = (str(user_id), stream_name)
+        cached = self._latest_stream_ids().get(key)
+        if cached is not None:
+            # let an InputRecorder see the lookup it would have recorded
+            note_stream_ids = getattr(self.CC, 'note_stream_ids', None)
+            if note_stream_ids is not None:
+                note_stream_ids(stream_name, cached[0])
+            return list(cached[1])
+
         streamids = self.CC.get_stream_id(user_id, stream_name)
         latest_stream_id = []
         latest_stream_version = None
         for stream in streamids:
-            stream_metadata = self.CC.get_stream_metadata(stream['identifier'])
-            execution_context = stream_metadata[0]['execution_context']
-            execution_context = ast.literal_eval(execution_context)
-            stream_version = execution_context['algorithm']['version']
-            try:
-                stream_version = int(stream_version)
-                stream_version = str(stream_version) + '.0'
-            except:
-                pass
-            stream_version = StrictVersion(stream_version)
+            stream_version = self.get_stream_version(stream['identifier'])
             if not latest_stream_version:
                 latest_stream_id.append(stream)
                 latest_stream_version = stream_version
@@ -146,13 +167,178 @@ class ComputeFeatureBase(object):
                 elif stream_version == latest_stream_version:
                     latest_stream_id.append(stream)
 
+        if latest_stream_id:
+            self._latest_stream_ids()[key] = (list(streamids),
+                                              list(latest_stream_id))
         return latest_stream_id
 
+    def flush_pending_writes(self, user_id, stream_name):
+        '''
+        Waits until the streams with the given name this feature stored
+        through its writer are saved, so that they can be read back.
+        '''
+        writer = getattr(self, 'writer', None)
+        if writer is not None and writer.is_pending(user_id, stream_name):
+            writer.flush()
+
+    def sub_feature(self, feature_class):
+        '''
+        Returns a feature run as part of this one. It shares the
+        CerebralCortex object and the writer of this feature, so that its
+        stores and reads are ordered with the ones of this feature.
+        '''
+        feature = feature_class(self.CC)
+        feature.writer = getattr(self, 'writer', None)
+        return feature
+
+    def _latest_stream_ids(self):
+        '''
+        Returns the get_latest_stream_id answers of this feature object,
+        which runs the feature once on a user's days.
+        '''
+        return self.__dict__.setdefault('_latest_stream_id_cache', {})
+
+    def load_day_array(self, user_id, stream_name, day, columns=None,
+                       dtype=np.float64, width=None, localtime=True):
+        '''
+        Returns a day of all the streams named stream_name of a user as one
+        TimeSeries sorted by time, whose timestamps and samples are NumPy
+        arrays. Days cached by a DiskStreamCache are read as memory mapped
+        arrays. Otherwise the storage layer returns DataPoints, which are
+        converted one stream id at a time and dropped, so a full day of
+        DataPoints of all the stream ids is never held at once.
+
+        :param list columns: indices of the sample values to keep, all by
+            default
+        :param dtype: float type of the samples, e.g. np.float32
+        :param int width: number of values of the samples, the points with
+            another number of values are dropped. Defaults to the number of
+            values of the first sample.
+        '''
+        self.flush_pending_writes(user_id, stream_name)
+        series = []
+        # a DiskStreamCache returns cached days as memory mapped arrays
+        get_stream_timeseries = getattr(self.CC, 'get_stream_timeseries',
+                                        None)
+        for stream_id in self.CC.get_stream_id(user_id, stream_name) or []:
+            if get_stream_timeseries is not None:
+                timeseries = get_stream_timeseries(stream_id['identifier'],
+                                                   user_id, day, localtime)
+                if timeseries is not None:
+                    if width is None:
+                        width = timeseries.samples.shape[1]
+                    if timeseries.samples.shape[1] != width:
+                        continue
+                    series.append(timeseries.with_samples(
+                        timeseries.samples.astype(dtype, copy=False),
+                        timeseries.scalar))
+                    continue
+            datastream = self.CC.get_stream(stream_id=stream_id['identifier'],
+                                            user_id=user_id, day=day,
+                                            localtime=localtime)
+            if datastream is None or not datastream.data:
+                continue
+            data = datastream.data
+            datastream = None
+            if width is None:
+                sample = data[0].sample
+                if isinstance(sample, str):
+                    width = len(sample.split(','))
+                elif isinstance(sample, (list, tuple)):
+                    width = len(sample)
+                else:
+                    width = 1
+            series.append(TimeSeries.from_datapoints(data, dtype, width))
+            data = None
+        timeseries = TimeSeries.concatenate(series).sort()
+        if columns is not None:
+            timeseries = timeseries.with_samples(
+                timeseries.samples[:, columns], len(columns) == 1)
+        return timeseries
+
+    def iter_stream_chunks(self, user_id, stream_name, days, localtime=True):
+        '''
+        Yields the DataPoints of all the streams named stream_name of a user
+        one day at a time, sorted by time. Windowed with window_stream, a
+        multi-day range is processed holding a day of DataPoints at most.
+
+        :param list days: days as YYYYMMDD strings, in time order
+        '''
+        self.flush_pending_writes(user_id, stream_name)
+        stream_ids = self.CC.get_stream_id(user_id, stream_name) or []
+        for day in days:
+            data = []
+            for stream_id in stream_ids:
+                datastream = self.CC.get_stream(
+                    stream_id=stream_id['identifier'], user_id=user_id,
+                    day=day, localtime=localtime)
+                if datastream is not None and datastream.data:
+                    data.extend(datastream.data)
+            data.sort(key=lambda dp: dp.start_time)
+            yield data
+
+    def get_stream_version(self, stream_id):
+        '''
+        Returns the algorithm version of a stream as a StrictVersion.
+        '''
+        stream_version = _stream_versions.get(str(stream_id))
+        if stream_version is None:
+            stream_metadata = self.CC.get_stream_metadata(stream_id)
+            execution_context = stream_metadata[0]['execution_context']
+            execution_context = ast.literal_eval(execution_context)
+            stream_version = execution_context['algorithm']['version']
+            try:
+                stream_version = int(stream_version)
+                stream_version = str(stream_version) + '.0'
+            except:
+                pass
+            stream_version = StrictVersion(stream_version)
+            _stream_versions[str(stream_id)] = stream_version
+        return stream_version
+
 
 
     
     def __init__(self, CC = None):
         self.CC = CC
+        self.writer = None
+
+
+def get_metadata_template(filepath):
+    '''
+    This method returns the parsed metadata template of an output stream,
+    read once per process. The returned dict is shared and must not be
+    modified.
+    parameters
+    filepath: name of the template file in core/resources/metadata
+    '''
+    template = _metadata_templates.get(filepath)
+    if template is None:
+        metadata_file_path = '/'.join(['core','resources','metadata',filepath])
+        # FIXME
+        metadata_str = str(__loader__.get_data(metadata_file_path).decode("utf-8"))
+        template = json.loads(metadata_str)
+        _metadata_templates[filepath] = template
+    return template
+
+
+def get_output_stream_id(filepath, user_id, class_name):
+    '''
+    This method returns the identifier of the stream stored by a feature
+    class from a metadata template for a user.
+    '''
+    key = (filepath, str(user_id), class_name)
+    output_stream_id = _output_stream_ids.get(key)
+    if output_stream_id is None:
+        template = get_metadata_template(filepath)
+        stream_str = str(filepath)
+        stream_str += str(user_id)
+        stream_str += str(class_name)
+        stream_str += str(template)
+        stream_str += str(template['name'])
+        output_stream_id = str(uuid.uuid3(uuid.NAMESPACE_DNS, stream_str))
+        _output_stream_ids[key] = output_stream_id
+    return output_stream_id
 
 
 def get_resource_contents(resource_name):
@@ -30,69 +30,622 @@ import traceback
 import importlib
 from datetime import datetime
 from datetime import timedelta
-from random import shuffle
+import time
+import threading
 import syslog
 from syslog import LOG_ERR
-from cerebralcortex.cerebralcortex import CerebralCortex
-from cerebralcortex.core.util.spark_helper import get_or_create_sc
+from core.utils.admission import MemoryBudget, PointCounter, \
+    estimate_task_memory
+from core.utils.cc_pool import get_cerebralcortex, is_connection_error, \
+    release_cerebralcortex
+from core.utils.disk_cache import DiskStreamCache
+from core.utils.failures import MAX_RETRIES, FailureLedger, TaskTimeout, \
+    get_feature_timeout, retry_delay, time_limit
+from core.utils.feature_registry import FEATURES, feature_module
+from core.utils.manifest import InputRecorder, Manifest
+from core.utils.model_registry import broadcast_models, get_feature_models, \
+    preload_models, use_broadcasts
+from core.utils.partitioning import TaskCostModel, longest_first, \
+    partition_tasks
+from core.utils.process_backend import ProcessPoolBackend, \
+    import_feature_modules
+from core.utils.profiling import PROCESS, Profiler, ProfileReport, \
+    ProfilingCC, profiling
+from core.utils.stream_cache import DATAPOINT_BYTES, MAX_CACHED_POINTS, \
+    StreamCache
+from core.utils.stream_writer import StreamWriter
+from core.utils.scheduler import JobsFailed, build_dependency_graph, \
+    plan_jobs, run_jobs, topological_order
+from core.utils.watermark import Watermarks
 
 cc_config_path = None
 gps_key = None
+write_behind = False
+memory_budget = None
+task_timeout = None
+disk_cache = None
 
-def process_features(feature_list, all_users, all_days, num_cores=1):
+def process_features(feature_list, all_users, all_days, num_cores=1,
+                     fused=False, backend='spark', timings_file=None,
+                     partitions_per_core=2, manifest_file=None,
+                     user_days=None, executor=None, profile_report=None,
+                     failure_ledger=None, user_level_days=None):
     '''
     This method runs the processing pipeline for each of
-    the features in the list.
-    '''
-    for module in feature_list:
-        if num_cores > 1:
-            #num_cores *= 4
-
-            print('Driver: Spark job',module)
-            spark_context = get_or_create_sc(type="sparkContext")
-            if 'core.feature.gps.gps' == str(module) \
-                or 'sleep_duration_analysis' in str(module) \
-                or 'office_time' in str(module) \
-                or 'phone_screen_touch_features' in str(module) \
-                or 'socialjetlag' in str(module) \
-                or 'gps_location_daywise' in str(module):
-                '''
-                # FIXME # TODO Currently only GPS feature computes features on a
-                range of days. Need to find a better way if there are other
-                modules that also works on range of days.
-                '''
-                print('-'*120)
-                print('MODULE parallelized on only users',module)
-                rdd = spark_context.parallelize(all_users,num_cores)
-                results = rdd.map(
-                    lambda user: process_feature_on_user(user, module, all_days, 
-                                                         cc_config_path))
-                results.count()
-            else:
-                print('MODULE',module)
-                parallelize_per_day = []
-                for usr in all_users:
-                    for day in all_days:
-                        parallelize_per_day.append((usr,[day]))
-
-                shuffle(parallelize_per_day)
-                rdd = spark_context.parallelize(parallelize_per_day,
-                                                len(parallelize_per_day))
-                results = rdd.map(
-                    lambda user_day: process_feature_on_user(user_day[0],
-                                                             module, user_day[1], 
-                                                             cc_config_path))
-                results.count()
-
-            spark_context.stop()
+    the features in the list. Features are scheduled according to their
+    declared dependencies; independent features run concurrently on the same
+    spark context or process pool. With fused set, all per-day features are
+    computed in a single pass per user-day sharing the streams read from
+    CerebralCortex.
+
+    Tasks are ordered longest first and packed into partitions of balanced
+    cost, estimated from the timings recorded in timings_file by previous
+    runs. The timings of this run are written back to it.
+
+    With a manifest_file, per-day features skip the user-days whose inputs
+    and algorithm versions did not change since they were last computed.
+
+    user_days, a dict of user -> list of days, restricts the processing to
+    the given user-days instead of all_users x all_days. user_level_days, in
+    the same format, gives the user level features other days than
+    user_days, e.g. the whole range of the users. An executor opened
+    with open_executor is reused and left open, otherwise one is opened and
+    closed for this call.
+
+    With a profile_report file, the wall time, CPU time, peak RSS and data
+    read and written of every feature run on a user-day are measured and
+    written to it as JSON, or CSV for a .csv file, and an aggregate summary
+    is printed at the end of the run.
+
+    With a failure_ledger file, the features failing on a user-day are
+    recorded in it, and removed from it once they succeed. The tasks of a
+    job that failed or was skipped as a whole are recorded as failed too,
+    without a ledger their users are listed in JobsFailed.unrecorded_users.
+
+    The timings, manifest, profiles and failures recorded until then are
+    saved even when a job fails, and JobsFailed is raised afterwards.
+    '''
+    graph = build_dependency_graph(feature_list)
+    order = topological_order(feature_list, graph)
+    jobs = plan_jobs(order, graph, fused)
+    cost_model = TaskCostModel(timings_file)
+    manifest = None
+    if manifest_file:
+        manifest = Manifest(manifest_file, get_cerebralcortex(cc_config_path))
+    record_inputs = manifest is not None
+    report = None
+    if profile_report:
+        report = ProfileReport(profile_report)
+    profile = report is not None
+    ledger = None
+    if failure_ledger:
+        ledger = FailureLedger(failure_ledger)
+    if user_days is None:
+        user_days = {user: all_days for user in all_users}
+    if user_level_days is None:
+        user_level_days = user_days
+    # the manifest, ledger and report are shared by the concurrent jobs
+    record_lock = threading.Lock()
+    # the tasks of every job and the ones with a recorded outcome
+    planned = {}
+    recorded = set()
+
+    def job_user_days(job):
+        return user_level_days if job.user_level else user_days
+
+    def job_tasks(job):
+        tasks = plan_job_tasks(job)
+        with record_lock:
+            planned[job] = tasks
+        return tasks
+
+    def plan_job_tasks(job):
+        tasks = build_tasks(job, job_user_days(job))
+        if manifest is None or job.user_level:
+            return tasks
+        # a user-day is recomputed when one of the features it depends on
+        # rewrote its output in this run, or its own inputs changed
+        upstream = set().union(*[graph[m] for m in job.modules])
+        upstream.difference_update(job.modules)
+        with record_lock:
+            pending = [(user, days) for user, days in tasks
+                       if any(manifest.is_updated(u, user, days[0])
+                              for u in upstream) or
+                       not all(manifest.is_up_to_date(m, user, days[0])
+                               for m in job.modules)]
+        print('MODULE', job.modules, 'skipping', len(tasks) - len(pending),
+              'unchanged user-days')
+        return pending
+
+    def record(user, days, modules, outcome):
+        with record_lock:
+            recorded.add((tuple(modules), user, tuple(days)))
+            record_results(cost_model, manifest, report, ledger, user, days,
+                           modules, outcome)
+
+    def record_failed_jobs(exp):
+        # the jobs skipped after a failure never planned their tasks
+        for job, job_error in exp.failures.items():
+            tasks = planned.get(job)
+            if tasks is None:
+                tasks = build_tasks(job, job_user_days(job))
+            for user, days in tasks:
+                if (tuple(job.modules), user, tuple(days)) in recorded:
+                    continue
+                if ledger is None:
+                    exp.unrecorded_users.add(user)
+                else:
+                    for module_name in job.modules:
+                        ledger.record_failure(module_name, user, days,
+                                              str(job_error))
+
+    own_executor = executor is None
+    failed = None
+    try:
+        if own_executor:
+            executor = open_executor(num_cores, backend, order)
+        if isinstance(executor, ProcessPoolBackend):
+            print('Driver: process pool jobs', jobs)
+            run_jobs(jobs, lambda job: run_process_job(executor, job,
+                                                       job_tasks(job),
+                                                       cost_model, record,
+                                                       record_inputs,
+                                                       profile))
+        elif executor is not None:
+            print('Driver: Spark jobs', jobs)
+            run_jobs(jobs, lambda job: run_spark_job(executor, job,
+                                                     job_tasks(job),
+                                                     num_cores *
+                                                     partitions_per_core,
+                                                     cost_model, record,
+                                                     record_inputs, profile))
         else:
             print('Driver: single threaded')
-            for user in all_users:
-                process_feature_on_user(user, module, all_days, cc_config_path)
+            for job in jobs:
+                if manifest is None:
+                    tasks = list(job_user_days(job).items())
+                else:
+                    tasks = job_tasks(job)
+                for user, days in tasks:
+                    outcome = process_features_on_user(user, job.modules,
+                                                       days, cc_config_path,
+                                                       record_inputs, profile)
+                    if job.user_level or len(days) == 1:
+                        record(user, days, job.modules, outcome)
+    except JobsFailed as exp:
+        failed = exp
+        record_failed_jobs(exp)
+    finally:
+        if own_executor:
+            close_executor(executor)
+        if manifest is not None:
+            release_cerebralcortex(cc_config_path)
+    cost_model.save()
+    if manifest is not None:
+        manifest.save()
+    if ledger is not None:
+        ledger.save()
+    if report is not None:
+        report.save()
+        report.print_summary()
+    if failed is not None:
+        raise failed
+
+def open_executor(num_cores, backend, feature_list):
+    '''
+    Returns the process pool or spark context used to run the tasks, None
+    for single threaded execution. The models of the features are loaded
+    before the pool workers are forked, so that they share them.
+    '''
+    if num_cores > 1 and backend == 'process':
+        try:
+            preload_models(get_feature_models(feature_list))
+        except Exception as e:
+            err=str(e) + "\n" + str(traceback.format_exc())
+            print(err)
+            syslog.openlog(ident="CerebralCortex-Driver")
+            syslog.syslog(LOG_ERR,err)
+            syslog.closelog()
+        return ProcessPoolBackend(num_cores,
+                                  initializer=import_feature_modules,
+                                  initargs=(feature_list,))
+    if num_cores > 1:
+        # pyspark is only imported when spark is used
+        from cerebralcortex.core.util.spark_helper import get_or_create_sc
+        return get_or_create_sc(type="sparkContext")
+    return None
+
+def close_executor(executor):
+    if isinstance(executor, ProcessPoolBackend):
+        executor.close()
+    elif executor is not None:
+        executor.stop()
+
+def process_continuously(feature_list, study_name, users, first_day,
+                         watermark_file=None, poll_interval=300,
+                         num_cores=1, backend='spark', last_day=None,
+                         **kwargs):
+    '''
+    Long running mode replacing the periodic re-runs of the whole date range.
+    Every poll_interval seconds the end times of the users' input streams
+    are compared against their watermarks, and only the user-days with new
+    data (and the features depending on them) are processed, reusing the
+    same executor across cycles. Features working on a range of days are
+    run on all the days from first_day to the latest day with new data of
+    these users, since their outputs cover the whole range.
+
+    The watermarks of a user advance once all the tasks of the user have an
+    outcome, failures included: failed user-days are left to the failure
+    ledger and --retry-failed instead of being reprocessed every cycle. Only
+    the users of failed jobs whose tasks could not be recorded, without a
+    failure ledger, are polled again from their old watermarks.
+
+    :param str first_day: YYYYMMDD, earlier days are never processed
+    :param str last_day: YYYYMMDD, later days are never processed
+    :param kwargs: further arguments of process_features
+    '''
+    watermarks = Watermarks(watermark_file)
+    order = generate_feature_processing_order(feature_list)
+    executor = open_executor(num_cores, backend, order)
+    try:
+        while True:
+            cycle_start = time.time()
+            try:
+                CC = get_cerebralcortex(cc_config_path)
+                try:
+                    all_users = get_users(CC, study_name, users)
+                    user_days, updates = watermarks.poll(CC, all_users,
+                                                         first_day, last_day)
+                finally:
+                    release_cerebralcortex(cc_config_path)
+                if user_days:
+                    print('Driver: new data for', len(user_days), 'users',
+                          sum(len(d) for d in user_days.values()),
+                          'user-days')
+                    user_level_days = {user: day_range(first_day, days[-1])
+                                       for user, days in user_days.items()}
+                    try:
+                        process_features(order, None, None, num_cores,
+                                         backend=backend, user_days=user_days,
+                                         executor=executor,
+                                         user_level_days=user_level_days,
+                                         **kwargs)
+                    except JobsFailed as exp:
+                        print('Driver:', str(exp))
+                        updates = {user: user_updates for user, user_updates
+                                   in updates.items()
+                                   if user not in exp.unrecorded_users}
+                watermarks.advance(updates)
+                watermarks.save()
+            except Exception as e:
+                err=str(e) + "\n" + str(traceback.format_exc())
+                print(err)
+                syslog.openlog(ident="CerebralCortex-Driver")
+                syslog.syslog(LOG_ERR,err)
+                syslog.closelog()
+            time.sleep(max(0, poll_interval - (time.time() - cycle_start)))
+    finally:
+        close_executor(executor)
+
+def day_range(first_day, last_day, date_format='%Y%m%d'):
+    '''
+    Returns the days from first_day to last_day included, in date_format.
+    '''
+    day = datetime.strptime(first_day, date_format)
+    end = datetime.strptime(last_day, date_format)
+    days = []
+    while day <= end:
+        days.append(day.strftime(date_format))
+        day += timedelta(days=1)
+    return days
+
+def retry_failed(feature_list, failure_ledger, num_cores=1, backend='spark',
+                 **kwargs):
+    '''
+    Recomputes only the user-days recorded as failed in the failure ledger,
+    for the features of feature_list. The features are run one after the
+    other in dependency order, each on its own failed user-days.
+
+    :param kwargs: further arguments of process_features
+    '''
+    ledger = FailureLedger(failure_ledger)
+    failed = [m for m in ledger.modules() if m in feature_list]
+    if not failed:
+        print('Driver: no failed user-days in', failure_ledger)
+        return
+    order = generate_feature_processing_order(failed)
+    executor = open_executor(num_cores, backend, order)
+    failures = {}
+    try:
+        for module_name in order:
+            user_days = ledger.user_days(module_name)
+            print('Driver: retrying', module_name, 'on',
+                  sum(len(d) for d in user_days.values()), 'user-days')
+            try:
+                process_features([module_name], None, None, num_cores,
+                                 backend=backend, user_days=user_days,
+                                 executor=executor,
+                                 failure_ledger=failure_ledger, **kwargs)
+            except JobsFailed as exp:
+                failures.update(exp.failures)
+    finally:
+        close_executor(executor)
+    if failures:
+        raise JobsFailed(failures)
+
+def run_process_job(pool, job, tasks, cost_model, record, record_inputs,
+                    profile=False):
+    '''
+    Runs the tasks of one FeatureJob on the process pool, longest tasks
+    first. Stragglers running far longer than their estimated cost are
+    speculatively re-executed.
+    '''
+    costs = [cost_model.estimate(job.modules, user, days)
+             for user, days in tasks]
+    tasks = longest_first(tasks, costs)
+    costs = sorted(costs, reverse=True)
+    outcomes = pool.map_tasks(process_features_on_user,
+                             [(user, job.modules, days, cc_config_path,
+                               record_inputs, profile,
+                               task_memory(job.modules, user, days,
+                                           cost_model))
+                              for user, days in tasks], costs)
+    for (user, days), outcome in zip(tasks, outcomes):
+        record(user, days, job.modules, outcome)
+
+def run_spark_job(spark_context, job, tasks, num_partitions, cost_model,
+                  record, record_inputs, profile=False):
+    '''
+    Runs the tasks of one FeatureJob as a spark job. User level features are
+    parallelized on users, pipelines of per-day features are parallelized on
+    user-days. The tasks are bin-packed into at most num_partitions
+    partitions of balanced estimated cost. The models of the features are
+    broadcast to the executors with the job. Straggling partitions are
+    re-executed by spark when spark.speculation is enabled.
+    '''
+    config_path = cc_config_path
+    modules = job.modules
+    if job.user_level:
+        print('-'*120)
+        print('MODULE parallelized on only users', modules)
+    else:
+        print('MODULE', modules)
+    if not tasks:
+        return
+    costs = [cost_model.estimate(modules, user, days) for user, days in tasks]
+    partitions = partition_tasks(tasks, costs, num_partitions)
+    partitions = [[(user, days, task_memory(modules, user, days, cost_model))
+                   for user, days in partition] for partition in partitions]
+    broadcasts = broadcast_models(spark_context, get_feature_models(modules))
+    rdd = spark_context.parallelize(partitions, len(partitions))
+    results = rdd.flatMap(
+        lambda partition: process_partition(partition, modules, config_path,
+                                            record_inputs, profile,
+                                            broadcasts))
+    for user, days, outcome in results.collect():
+        record(user, days, modules, outcome)
+
+def process_partition(partition, module_names, cc_config_path,
+                      record_inputs, profile, broadcasts):
+    '''
+    Runs the (user, days, memory) tasks of a spark partition.
+
+    :return: list of (user, days, results of process_features_on_user)
+    '''
+    use_broadcasts(broadcasts)
+    return [(user, days,
+             process_features_on_user(user, module_names, days,
+                                      cc_config_path, record_inputs, profile,
+                                      memory))
+            for user, days, memory in partition]
+
+def task_memory(module_names, user, days, cost_model):
+    '''
+    Returns the estimated memory footprint in bytes of a task, 0 without a
+    memory budget.
+    '''
+    if not memory_budget:
+        return 0
+    return estimate_task_memory(module_names, user, days, cost_model)
+
+def build_tasks(job, user_days):
+    '''
+    Returns the (user, [days]) tasks of a FeatureJob for a dict of
+    user -> days. User level features get one task per user with all the
+    days, per-day features one task per user-day.
+    '''
+    if job.user_level:
+        # FIXME # TODO features which work on a range of days are only
+        # parallelized on users.
+        return [(usr, days) for usr, days in user_days.items()]
+    parallelize_per_day = []
+    for usr, days in user_days.items():
+        for day in days:
+            parallelize_per_day.append((usr,[day]))
+    return parallelize_per_day
+
+def record_results(cost_model, manifest, report, ledger, user, days,
+                   module_names, outcome):
+    '''
+    Records the timings, manifest entries and profiles returned by a task,
+    and its failure in the ledger.
+    '''
+    if outcome is None:
+        # the task raised outside of the features, or killed its worker
+        outcome = ([], (module_names[0], 'Worker task failed'))
+    results, failure = outcome
+    if ledger is not None:
+        for module_name, _, _, _, _ in results:
+            ledger.record_success(module_name, user, days)
+        if failure is not None:
+            failed_module, error = failure
+            # the features after the failed one in the pipeline were skipped
+            for module_name in module_names[module_names.index(
+                    failed_module):]:
+                ledger.record_failure(module_name, user, days, error)
+    for module_name, seconds, entry, profile, points in results:
+        cost_model.record(module_name, user, days, seconds, points)
+        if report is not None and profile is not None:
+            report.add(profile)
+        if manifest is None:
+            continue
+        manifest.mark_updated(module_name, user, days)
+        if entry is not None:
+            manifest.record(module_name, user, days[0], entry)
+
+def process_features_on_user(user, module_names, all_days, cc_config_path,
+                             record_inputs=False, profile=False, memory=0):
+    '''
+    Runs a pipeline of features in order on the given user and days. A feature
+    is skipped when one of the features before it failed. The features share
+    one CerebralCortex object whose stream reads are cached, so every stream
+    is read only once for the whole pipeline. With disk_cache set, whole
+    historical days of the streams are also cached on local disk, and with
+    profile set its hits and misses for the task are printed.
+
+    With memory_budget set, the pipeline first reserves its estimated memory
+    footprint in bytes from the budget shared by the workers of the machine,
+    waiting for the running tasks to release it. A task larger than the
+    budget runs alone.
+
+    A feature failing on a lost storage connection is retried up to
+    MAX_RETRIES times with exponential backoff on a new CerebralCortex
+    object. The task holds one pooled CerebralCortex object at a time and
+    releases it exactly once, as broken after a connection error or a
+    timeout, which can interrupt a storage call midway.
+
+    :return: tuple (results, failure). results is the list of (module name,
+        wall clock seconds, manifest entry, profile, data points read) of the
+        features that completed successfully. Manifest entries are only
+        recorded with record_inputs set on single day tasks, profiles with
+        profile set, None otherwise. failure is None, or (module name, error
+        message) of the feature that failed.
+    '''
+    results = []
+    try:
+        cc = task_cerebralcortex(cc_config_path, module_names)
+    except Exception as e:
+        err=str(e) + "\n" + str(traceback.format_exc())
+        print(err)
+        syslog.openlog(ident="CerebralCortex-Driver")
+        syslog.syslog(LOG_ERR,err)
+        syslog.closelog()
+        return results, (module_names[0], error_message(e))
+    failure = None
+    try:
+        with MemoryBudget(memory_budget).reserve(memory):
+            for module_name in module_names:
+                for attempt in range(MAX_RETRIES + 1):
+                    if cc is None:
+                        try:
+                            cc = task_cerebralcortex(cc_config_path,
+                                                     module_names)
+                        except Exception as e:
+                            error = e
+                            break
+                    counter = PointCounter(cc)
+                    feature_cc = recorder = counter
+                    if record_inputs:
+                        feature_cc = recorder = InputRecorder(counter)
+                    profiler = Profiler() if profile else None
+                    start = time.time()
+                    if profiler is None:
+                        error = process_feature_on_user(user, module_name,
+                                                        all_days,
+                                                        cc_config_path,
+                                                        feature_cc)
+                    else:
+                        feature_cc = ProfilingCC(feature_cc, profiler)
+                        with profiling(profiler), profiler.measure(PROCESS):
+                            error = process_feature_on_user(user,
+                                                            module_name,
+                                                            all_days,
+                                                            cc_config_path,
+                                                            feature_cc)
+                    if error is not None and is_broken(error):
+                        # the held object is dropped, the next attempt gets
+                        # a new one
+                        release_cerebralcortex(cc_config_path, broken=True)
+                        cc = None
+                    if error is None or not is_connection_error(error) or \
+                            attempt == MAX_RETRIES:
+                        break
+                    delay = retry_delay(attempt)
+                    print('Retrying', module_name, 'for', user,
+                          'in %.0f s' % delay)
+                    time.sleep(delay)
+                if error is not None:
+                    failure = (module_name, error_message(error))
+                    break
+                entry = None
+                if record_inputs and len(all_days) == 1:
+                    entry = recorder.entry(all_days[0])
+                profile_record = None
+                if profiler is not None:
+                    profile_record = profiler.record(module_name, user,
+                                                     all_days)
+                results.append((module_name, time.time() - start, entry,
+                                profile_record, counter.points))
+    finally:
+        if cc is not None:
+            if profile and disk_cache is not None:
+                print('Disk cache', user, cc.stats())
+            release_cerebralcortex(cc_config_path)
+    return results, failure
+
+def task_cerebralcortex(cc_config_path, module_names):
+    '''
+    Returns the CerebralCortex object of a task: the pooled one, behind the
+    local disk cache when disk_cache is set, and behind a StreamCache for a
+    pipeline of several features. With memory_budget set, the StreamCache
+    holds at most the DataPoints fitting in the budget.
+    '''
+    cc = get_cerebralcortex(cc_config_path)
+    if disk_cache is not None:
+        cc = DiskStreamCache(cc, **disk_cache)
+    if len(module_names) > 1:
+        max_points = MAX_CACHED_POINTS
+        if memory_budget:
+            max_points = min(max_points, memory_budget // DATAPOINT_BYTES)
+        cc = StreamCache(cc, max_points)
+    return cc
+
+def is_broken(exp):
+    '''
+    Returns True if the storage connections of the CerebralCortex object
+    used by a feature can no longer be trusted after the feature raised exp:
+    after a connection error, or a TaskTimeout interrupting a storage call.
+    '''
+    return isinstance(exp, TaskTimeout) or is_connection_error(exp)
 
-def process_feature_on_user(user, module_name, all_days, cc_config_path):
+def error_message(exp):
+    '''
+    Returns the one line description of an exception kept in the failure
+    ledger.
+    '''
+    return '%s: %s' % (type(exp).__name__, str(exp))
+
+def process_feature_on_user(user, module_name, all_days, cc_config_path,
+                            cc=None):
+    '''
+    Runs a feature on the given user and days. With write_behind set, the
+    streams stored by the feature are saved in the background and the feature
+    only succeeds once all of them are saved. The feature is interrupted
+    after its feature_timeout, or task_timeout, seconds.
+
+    Without cc, a pooled CerebralCortex object is used and released at the
+    end, as broken after a connection error or a timeout. A given cc is left
+    to its caller.
+
+    :return: None on success, the exception raised by the feature otherwise
+    '''
+    writer = None
+    error = None
+    own_cc = False
     try:
-        cc = CerebralCortex(cc_config_path)
+        if cc is None:
+            cc = get_cerebralcortex(cc_config_path)
+            own_cc = True
         module = importlib.import_module(module_name)
         feature_class_name = getattr(module,'feature_class_name')
         feature_class = getattr(module,feature_class_name)
@@ -100,54 +653,56 @@ def process_feature_on_user(user, module_name, all_days, cc_config_path):
         
         if gps_key is not None:
             feature_class_instance.gps_api_key = gps_key
+        if write_behind:
+            writer = StreamWriter(cc)
+            feature_class_instance.writer = writer
 
         f = feature_class_instance.process
-        f(user,all_days)
-    except Exception as e:
+        with time_limit(get_feature_timeout(module, task_timeout)):
+            f(user,all_days)
+            if writer is not None:
+                writer.close()
+        return None
+    except (Exception, TaskTimeout) as e:
         err=str(e) + "\n" + str(traceback.format_exc())
         print(err)
         syslog.openlog(ident="CerebralCortex-Driver")
         syslog.syslog(LOG_ERR,err)
         syslog.closelog()
+        error = e
+        return e
+    finally:
+        if writer is not None:
+            writer.close(raise_errors=False)
+        if own_cc:
+            release_cerebralcortex(cc_config_path,
+                                   broken=error is not None and
+                                   is_broken(error))
 
 def discover_features(feature_list):
     '''
-    This method discovers all the features that are present.
+    This method returns the modules of the given features, or of all the
+    features, as listed in the feature registry.
     '''
-    feature_dir = os.path.join(utils.config.FEATURES_DIR_NAME)
     found_features = []
     if feature_list:
         feature_subdirs = feature_list
     else:
-        feature_subdirs = os.listdir(feature_dir)
-    
+        feature_subdirs = FEATURES
+
     for subdir in feature_subdirs:
-        feature = os.path.join(feature_dir,subdir)
-        if not os.path.exists(feature):
+        if subdir not in FEATURES:
             syslog.openlog(ident="CerebralCortex-Driver")
             syslog.syslog(LOG_ERR,'Feature not found %s.' % subdir)
             syslog.closelog()
             continue
-        if os.path.isdir(feature):
-            mod_file_path = os.path.join(feature,subdir) + '.py'
+        feature = os.path.join(utils.config.FEATURES_DIR_NAME, subdir)
+        sys.path.append(feature)
+        found_features.append(feature_module(subdir))
+        syslog.openlog(ident="CerebralCortex-Driver")
+        syslog.syslog('Added feature %s for importing' % feature)
+        syslog.closelog()
 
-            if not os.path.exists(mod_file_path):
-                continue
-            sys.path.append(feature)
-            try:
-                module_name = mod_file_path[:-3] # strip '.py'
-                module_name_dotted = module_name.replace('/','.')
-                found_features.append(module_name_dotted)
-                syslog.openlog(ident="CerebralCortex-Driver")
-                syslog.syslog('Added feature %s for importing' % feature)
-                syslog.closelog()
-            except Exception as exp:
-                err = str(exp) + '\n' + str(traceback.format_exc())
-                print(err)
-                syslog.openlog(ident="CerebralCortex-Driver")
-                syslog.syslog(LOG_ERR, str(exp) + err)
-                syslog.closelog()
-    
     return found_features
     
 
@@ -156,13 +711,32 @@ def generate_feature_processing_order(feature_list):
     This method returns the execution order of processing the features 
     after resolving the inter dependencies.
     '''
-    return feature_list
+    graph = build_dependency_graph(feature_list)
+    return topological_order(feature_list, graph)
+
+
+def get_users(CC, study_name, users=None):
+    '''
+    Returns the given user identifiers, or all the users of the study when
+    none are given.
+    '''
+    if users:
+        return users
+    users = CC.get_all_users(study_name)
+    if not users:
+        print('No users found')
+        return []
+    return [usr['identifier'] for usr in users]
 
 
 def main():
     global cc_config_path
     global metadata_dir
     global gps_key
+    global write_behind
+    global memory_budget
+    global task_timeout
+    global disk_cache
     # Get the list of the features to process
     parser = argparse.ArgumentParser(description='CerebralCortex '
                                      'Feature Processing Driver')
@@ -179,10 +753,69 @@ def main():
     parser.add_argument("-ed", "--end-date", help="End date in " 
                          "YYYYMMDD Format", required=True)
     parser.add_argument("-p", "--num-cores", type=int, help="Set a number "
-                        "greater than 1 to enable spark "
+                        "greater than 1 to enable spark or process pool "
                         "parallel execution ", required=False)
     parser.add_argument("-k", "--gps-key", help="GPS API " 
                          "key", required=False)
+    parser.add_argument("-b", "--backend", choices=['spark', 'process'],
+                        default='spark', help="Parallel execution backend "
+                        "used when --num-cores is greater than 1: spark or a "
+                        "local process pool", required=False)
+    parser.add_argument("-t", "--timings-file", help="JSON file with the "
+                        "task timings of previous runs, used to balance the "
+                        "partitions and updated at the end of the run",
+                        required=False)
+    parser.add_argument("-m", "--manifest-file", help="JSON manifest of the "
+                        "computed user-days. When given, user-days whose "
+                        "inputs did not change since the last run are "
+                        "skipped", required=False)
+    parser.add_argument("--continuous", action="store_true", help="Keep "
+                        "running and process only the user-days which "
+                        "received new data between the start and end dates",
+                        required=False)
+    parser.add_argument("--poll-interval", type=int, default=300,
+                        help="Seconds between two polls for new data in "
+                        "continuous mode", required=False)
+    parser.add_argument("-w", "--watermark-file", help="JSON file keeping "
+                        "the end time of the data processed per user and "
+                        "stream in continuous mode", required=False)
+    parser.add_argument("--profile-report", help="Write the wall time, CPU "
+                        "time, peak RSS and data read and written of every "
+                        "feature and user-day to this JSON (or .csv) file",
+                        required=False)
+    parser.add_argument("--write-behind", action="store_true", help="Save "
+                        "the streams computed by a feature in the background "
+                        "while it keeps computing", required=False)
+    parser.add_argument("--memory-budget", type=int, help="Memory in MB "
+                        "available to the feature tasks on each worker node. "
+                        "Tasks of features declaring a memory footprint wait "
+                        "for it to be available, tasks larger than the "
+                        "budget run alone", required=False)
+    parser.add_argument("--task-timeout", type=int, help="Seconds after "
+                        "which a feature running on a user-day is "
+                        "interrupted, for the features which do not declare "
+                        "their own feature_timeout", required=False)
+    parser.add_argument("--failure-ledger", help="JSON file recording the "
+                        "features which failed on a user-day", required=False)
+    parser.add_argument("--retry-failed", action="store_true", help="Only "
+                        "recompute the user-days recorded in the failure "
+                        "ledger", required=False)
+    parser.add_argument("--disk-cache", help="Local directory caching the "
+                        "historical days of the raw streams read from "
+                        "CerebralCortex, shared by the workers of a node",
+                        required=False)
+    parser.add_argument("--disk-cache-size", type=float, default=50,
+                        help="Size in GB of the disk cache, the least "
+                        "recently used days are evicted beyond it",
+                        required=False)
+    parser.add_argument("--disk-cache-version", default='1', help="Data "
+                        "version tag of the disk cache, change it to stop "
+                        "using the days cached before, e.g. after data was "
+                        "backfilled into already cached days",
+                        required=False)
+    parser.add_argument("--fused", action="store_true", help="Compute all "
+                        "per-day features in a single pass per user-day, "
+                        "reading each stream only once", required=False)
     
     args = vars(parser.parse_args())
     feature_list = None
@@ -192,6 +825,20 @@ def main():
     end_date = None
     date_format = '%Y%m%d'
     num_cores = 1 # default single threaded
+    fused = args['fused']
+    backend = args['backend']
+    timings_file = args['timings_file']
+    manifest_file = args['manifest_file']
+    profile_report = args['profile_report']
+    write_behind = args['write_behind']
+    task_timeout = args['task_timeout']
+    if args['disk_cache']:
+        disk_cache = {'cache_dir': args['disk_cache'],
+                      'max_bytes': int(args['disk_cache_size'] * 2**30),
+                      'version': args['disk_cache_version']}
+    failure_ledger = args['failure_ledger']
+    if args['memory_budget']:
+        memory_budget = args['memory_budget'] * 2**20
     
     if args['feature_list']:
         feature_list = args['feature_list'].split(',')
@@ -216,21 +863,33 @@ def main():
         start_date += timedelta(days = 1)
         if start_date > end_date : break
 
-    CC = None
+    found_features = discover_features(feature_list)
+    if args['retry_failed']:
+        if not failure_ledger:
+            print('--retry-failed requires a --failure-ledger')
+            return
+        retry_failed(found_features, failure_ledger, num_cores, backend,
+                     fused=fused, timings_file=timings_file,
+                     manifest_file=manifest_file,
+                     profile_report=profile_report)
+        return
+    if args['continuous']:
+        process_continuously(found_features, study_name, users,
+                             all_days[0], args['watermark_file'],
+                             args['poll_interval'], num_cores, backend,
+                             all_days[-1], fused=fused, timings_file=timings_file,
+                             manifest_file=manifest_file,
+                             profile_report=profile_report,
+                             failure_ledger=failure_ledger)
+        return
+
     all_users = None
     try:
-        CC = CerebralCortex(cc_config_path)
-        if not users:
-            users = CC.get_all_users(study_name)
-            if not users:
-                print('No users found')
-                return
-            if not len(users):
-                print('No users found')
-                return # no point continuing
-            all_users = [usr['identifier'] for usr in users]
-        else:
-            all_users = users
+        CC = get_cerebralcortex(cc_config_path)
+        try:
+            all_users = get_users(CC, study_name, users)
+        finally:
+            release_cerebralcortex(cc_config_path)
     except Exception as e:
         print(str(e))
         print( str(traceback.format_exc()))
@@ -238,10 +897,17 @@ def main():
         print('No users found for the study',study_name)
         return
 
-    found_features = discover_features(feature_list)
     feature_to_process = generate_feature_processing_order(found_features)
-    process_features(feature_to_process, all_users, all_days, num_cores)
+    process_features(feature_to_process, all_users, all_days, num_cores,
+                     fused, backend, timings_file,
+                     manifest_file=manifest_file,
+                     profile_report=profile_report,
+                     failure_ledger=failure_ledger)
     
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    except JobsFailed as exp:
+        print('Driver:', str(exp))
+        sys.exit(1)
 
@@ -24,7 +24,8 @@
 
 
 from core.computefeature import ComputeFeatureBase
-from core.feature.DataQualityPPG.utils import get_features,get_model
+from core.feature.DataQualityPPG.utils import get_features,get_model, \
+    MODEL_FILENAME
 import numpy as np
 from datetime import datetime
 from cerebralcortex.core.datatypes.datapoint import DataPoint
@@ -36,6 +37,11 @@ from copy import deepcopy
 from collections import Counter
 
 feature_class_name = 'DataQualityPPG'
+feature_models = [MODEL_FILENAME]
+
+# the day of raw packets is decoded into a float64 PPG matrix next to the
+# DataPoints read
+feature_memory_per_point = 600
 
 
 class DataQualityPPG(ComputeFeatureBase):
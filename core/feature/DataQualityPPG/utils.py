@@ -1,9 +1,8 @@
 import numpy as np
 import math
 from scipy.stats import skew,kurtosis
-import pickle
 from sklearn.ensemble import RandomForestClassifier
-from core.computefeature import get_resource_contents
+from core.utils import model_registry
 MODEL_FILENAME = 'core/resources/models/dataquality/classifier.p'
 
 def get_model() -> RandomForestClassifier:
@@ -13,9 +12,7 @@ def get_model() -> RandomForestClassifier:
     :param bool is_gravity:
     :return:
     """
-    model_file_contents = get_resource_contents(MODEL_FILENAME)
-    clf = pickle.loads(model_file_contents)
-    return clf
+    return model_registry.get_model(MODEL_FILENAME)
 
 
 
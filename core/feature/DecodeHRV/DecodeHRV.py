@@ -25,12 +25,17 @@
 
 from core.computefeature import ComputeFeatureBase
 from core.feature.DecodeHRV.util_raw_byte_decode import Preprc
+from core.signalprocessing.timeseries import TimeSeries
 import numpy as np
 from datetime import datetime
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from typing import List
 feature_class_name = 'DecodeHRV'
 
+# the day of raw packets is decoded into float64 matrices of 22 columns next
+# to the DataPoints read
+feature_memory_per_point = 800
+
 
 class DecodeHRV(ComputeFeatureBase):
     """
@@ -139,34 +144,19 @@ class DecodeHRV(ComputeFeatureBase):
             return []
         return sample_final[1:, :]
 
-    def admission_control(self,data):
+    def return_numpy_array_from_datastream_raw(self,raw):
         """
-
-        :rtype: list
-        :param list data:
-        :return:
+        :param TimeSeries raw: raw packets of 20 byte values
+        :return: matrix of the time in milliseconds, offset and signed byte
+            values of every packet
         """
-        final_data = []
-        for dp in data:
-            if isinstance(dp.sample, str) and len(dp.sample.split(',')) == 20:
-                final_data.append(dp)
-            if isinstance(dp.sample, list) and len(dp.sample) == 20:
-                final_data.append(dp)
-        return final_data
-
-    def return_numpy_array_from_datastream_raw(self,data):
-        if len(data)==0:
+        if len(raw)==0:
             return np.array([])
-        final_data = np.zeros((len(data),20+2))
-        for i,dp in enumerate(data):
-            final_data[i,:2] = [dp.start_time.timestamp()*1000,dp.offset]
-            if isinstance(dp.sample, str):
-                str_sample = str(dp.sample)
-                str_sample_list = str_sample.split(',')
-                Vals = [np.int8(np.float(val)) for val in str_sample_list]
-            elif isinstance(dp.sample, list):
-                Vals = [np.int8(val) for val in dp.sample]
-            final_data[i,2:] = Vals
+        final_data = np.zeros((len(raw),20+2))
+        final_data[:,0] = raw.timestamps/1000
+        if raw.offsets is not None:
+            final_data[:,1] = raw.offsets
+        final_data[:,2:] = raw.samples.astype(np.int64).astype(np.int8)
         return final_data
 
     def get_datastream_raw(self,
@@ -213,23 +203,16 @@ class DecodeHRV(ComputeFeatureBase):
         """
 
         for day in all_days:
-            motionsense_raw = []
-            for s in stream_identifiers:
-                motionsense_raw.extend(self.get_datastream_raw(s,day,user_id,localtime=localtime))
-            if len(motionsense_raw)<100:
-                continue
-            print(motionsense_raw[0],'first datapoint')
-            print(len(motionsense_raw)," Size of extracted raw byte data")
-            tzinfo = motionsense_raw[0].start_time.tzinfo
-            motionsense_raw = self.admission_control(motionsense_raw)
+            # admission control: only the packets of 20 byte values are kept
+            motionsense_raw = TimeSeries.concatenate(
+                [self.load_day_array(user_id,s,day,width=20,localtime=localtime)
+                 for s in stream_identifiers]).sort()
             print(len(motionsense_raw)," Size after admission control")
             if len(motionsense_raw)<100:
                 continue
+            tzinfo = motionsense_raw.tz
             motionsense_raw_data = self.return_numpy_array_from_datastream_raw(motionsense_raw)
-            if len(motionsense_raw_data)<100:
-                continue
             offset = motionsense_raw_data[0,1]
-            motionsense_raw_data = motionsense_raw_data[motionsense_raw_data[:,0].argsort()]
             decoded_data = self.get_decoded_matrix(motionsense_raw_data)
             print(len(decoded_data)," Size of decoded matrix")
             if not list(decoded_data):
@@ -30,9 +30,12 @@ from cerebralcortex.core.datatypes.datapoint import DataPoint
 from typing import List
 from scipy.stats import skew,kurtosis
 from core.feature.PPGHourYield.utils import get_model
+from core.utils.profiling import INFERENCE, profile_section
 
 
 feature_class_name = 'PPGHourYield'
+# clf_motion.p is not shipped with the repository
+feature_models = []
 
 
 class PPGHourYield(ComputeFeatureBase):
@@ -106,7 +109,9 @@ class PPGHourYield(ComputeFeatureBase):
             acl_window = tmp[:,index_window]
             feature_acl = self.get_features(acl_window)
             acl_features.append(feature_acl)
-        motion_indicator = clf.predict(np.array(acl_features)).reshape(-1)
+        with profile_section(INFERENCE) as counts:
+            motion_indicator = clf.predict(np.array(acl_features)).reshape(-1)
+            counts['points'] = len(acl_features)
         for i,index in enumerate(index_col):
             tmp = data[index]
             window_likelihood = tmp[:,2]
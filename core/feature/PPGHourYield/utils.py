@@ -23,8 +23,7 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 from sklearn.ensemble import RandomForestClassifier
-from core.computefeature import get_resource_contents
-import pickle
+from core.utils import model_registry
 MODEL_FILENAME = 'core/resources/models/motion/clf_motion.p'
 
 def get_model() -> RandomForestClassifier:
@@ -34,6 +33,4 @@ def get_model() -> RandomForestClassifier:
     :param bool is_gravity:
     :return:
     """
-    model_file_contents = get_resource_contents(MODEL_FILENAME)
-    clf = pickle.loads(model_file_contents)
-    return clf
\ No newline at end of file
+    return model_registry.get_model(MODEL_FILENAME)
\ No newline at end of file
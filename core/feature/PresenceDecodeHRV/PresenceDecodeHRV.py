@@ -30,6 +30,10 @@ from cerebralcortex.core.datatypes.datapoint import DataPoint
 from typing import List
 feature_class_name = 'PresenceDecodeHRV'
 
+# the day of raw packets is decoded into float64 matrices of 22 columns next
+# to the DataPoints read
+feature_memory_per_point = 800
+
 
 class PresenceDecodeHRV(ComputeFeatureBase):
     """
@@ -35,6 +35,8 @@ from core.feature.activity.admission_control import *
 from core.computefeature import ComputeFeatureBase
 
 feature_class_name = 'ActivityMarker'
+# the accelerometer only models are not shipped with the repository
+feature_models = [POSTURE_MODEL_FILENAME, ACTIVITY_MODEL_FILENAME]
 
 
 class ActivityMarker(ComputeFeatureBase):
@@ -26,6 +26,7 @@
 from cerebralcortex.core.datatypes.datastream import DataPoint
 from core.feature.activity.import_model_files import get_posture_model, \
     get_activity_model
+from core.utils.profiling import INFERENCE, profile_section
 from typing import List
 
 
@@ -44,7 +45,9 @@ def classify_posture(features: List[DataPoint], is_gravity: bool) -> List[DataPo
     labels = []
 
     prediction_values = [dp.sample for dp in features]
-    preds = clf.predict(prediction_values)
+    with profile_section(INFERENCE) as counts:
+        preds = clf.predict(prediction_values)
+        counts['points'] = len(prediction_values)
     for i, dp in enumerate(features):
         labels.append(DataPoint(start_time=dp.start_time, end_time=dp.end_time,
                                 offset=dp.offset, sample=str(preds[i])))
@@ -67,7 +70,9 @@ def classify_activity(features: List[DataPoint], is_gravity) -> List[DataPoint]:
     labels = []
 
     prediction_values = [dp.sample for dp in features]
-    preds = clf.predict(prediction_values)
+    with profile_section(INFERENCE) as counts:
+        preds = clf.predict(prediction_values)
+        counts['points'] = len(prediction_values)
     for i, dp in enumerate(features):
         labels.append(DataPoint(start_time=dp.start_time, end_time=dp.end_time,
                                 offset=dp.offset, sample=str(preds[i])))
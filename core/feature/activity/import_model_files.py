@@ -23,11 +23,9 @@
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
-import pickle
 from sklearn.ensemble import RandomForestClassifier
 from core.feature.activity.utils import *
-from core.computefeature import get_resource_contents
-import os
+from core.utils.model_registry import get_model
 
 
 def get_posture_model(is_gravity: bool) -> RandomForestClassifier:
@@ -38,12 +36,8 @@ def get_posture_model(is_gravity: bool) -> RandomForestClassifier:
     :return:
     """
     if is_gravity:
-        model_file_contents = get_resource_contents(POSTURE_MODEL_FILENAME)
-    else:
-        model_file_contents = get_resource_contents(POSTURE_ACCEL_ONLY_MODEL_FILENAME)
-
-    clf = pickle.loads(model_file_contents)
-    return clf
+        return get_model(POSTURE_MODEL_FILENAME)
+    return get_model(POSTURE_ACCEL_ONLY_MODEL_FILENAME)
 
 
 def get_activity_model(is_gravity: bool):
@@ -54,9 +48,5 @@ def get_activity_model(is_gravity: bool):
     :return:
     """
     if is_gravity:
-        model_file_contents = get_resource_contents(ACTIVITY_MODEL_FILENAME)
-    else:
-        model_file_contents = get_resource_contents(ACTIVITY_ACCEL_ONLY_MODEL_FILENAME)
-
-    clf = pickle.loads(model_file_contents)
-    return clf
+        return get_model(ACTIVITY_MODEL_FILENAME)
+    return get_model(ACTIVITY_ACCEL_ONLY_MODEL_FILENAME)
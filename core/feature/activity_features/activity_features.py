@@ -31,6 +31,7 @@ from typing import List
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 
 feature_class_name = 'ActivityFeature'
+feature_dependencies = ['activity']
 
 
 class ActivityFeature(ComputeFeatureBase):
@@ -39,6 +39,7 @@ from collections import defaultdict
 from typing import List
 
 feature_class_name = 'AudioFeatures'
+feature_dependencies = ['office_time']
 
 
 class AudioFeatures(ComputeFeatureBase):
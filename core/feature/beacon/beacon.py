@@ -29,11 +29,14 @@ import datetime
 import json
 import uuid
 import traceback
+from itertools import chain
 from cerebralcortex.core.util.data_types import DataPoint
 from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
 from core.computefeature import ComputeFeatureBase
 from core.signalprocessing.window import window
 from core.signalprocessing.window import merge_consective_windows
+from core.signalprocessing.window import merge_window_stream
+from core.signalprocessing.window import window_stream
 
 feature_class_name = 'BeaconFeatures'
 
@@ -89,16 +92,12 @@ class BeaconFeatures(ComputeFeatureBase):
             beacon_stream_id = streams[stream_name]["identifier"]
             beacon_stream_name = streams[stream_name]["name"]
 
-            stream = self.CC.get_stream(
-                beacon_stream_id, user_id=user_id, day=day,localtime = True)
-            
-            data =self.get_day_data(stream_name,user_id,day)
-            if (len(data) > 0):
-                if (stream_name ==
-                        'BEACON--org.md2k.beacon--BEACON--HOME'):
-                    self.home_beacon_context(
-                        data, beacon_stream_id, beacon_stream_name,
-                        user_id)
+            if (stream_name ==
+                    'BEACON--org.md2k.beacon--BEACON--HOME'):
+                chunks = self.iter_stream_chunks(user_id, stream_name, [day])
+                self.home_beacon_context(
+                    chunks, beacon_stream_id, beacon_stream_name,
+                    user_id)
 
 
 
@@ -154,7 +153,7 @@ class BeaconFeatures(ComputeFeatureBase):
 
 
 
-    def home_beacon_context(self, beaconhomestream:list, beacon_stream_id:str,
+    def home_beacon_context(self, beaconhomestream, beacon_stream_id:str,
                             beacon_stream_name:str, user_id:str):
         """
         produces datapoint sample as 1 if around home beacon else 0
@@ -166,7 +165,8 @@ class BeaconFeatures(ComputeFeatureBase):
             else
                 not around beacon:0
 
-        :param List(Datapoint) beaconhomestream : Input list
+        :param beaconhomestream: lists of DataPoints in time order, e.g.
+                                 from iter_stream_chunks
         :param str beacon_stream_id: stream name representing workbeacon1
         :param str beacon_stream_name: stream name representing workbeacon2
         :param str user_id: id of user
@@ -178,25 +178,21 @@ class BeaconFeatures(ComputeFeatureBase):
         input_streams.append(
             {"identifier": beacon_stream_id, "name": beacon_stream_name})
         
-        if (len(beaconhomestream) > 0):
-            beaconstream = beaconhomestream
-            windowed_data = window(beaconstream, self.window_size, True)
+        chunks = iter(beaconhomestream)
+        first = next((chunk for chunk in chunks if chunk), None)
+        if first is not None:
+            windowed_data = window_stream(chain([first], chunks),
+                                          self.window_size, self.window_size,
+                                          True)
+            windowed_data = ((key, 1 if len(data) > 0 else 0)
+                             for key, data in windowed_data)
             new_data = []
 
-            for i, j in windowed_data:
-                if (len(windowed_data[i, j]) > 0):
-                    windowed_data[i, j] = 1
-
-                else:
-                    windowed_data[i, j] = 0
-
-            data = merge_consective_windows(windowed_data)
-            print(data)
-            for items in data:
+            for items in merge_window_stream(windowed_data):
                 if items.sample is not None and items.sample!="":
                     new_data.append(DataPoint(start_time=items.start_time,
                                               end_time=items.end_time,
-                                              offset=beaconhomestream[0].offset,
+                                              offset=first[0].offset,
                                               sample=items.sample))
 
             try:
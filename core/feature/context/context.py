@@ -28,11 +28,13 @@ from datetime import timedelta
 
 from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
 from core.computefeature import ComputeFeatureBase
+from core.signalprocessing.intervals import IntervalIndex
 from core.feature.context.context_activity_engaged import ContextActivityEngaged
 from core.feature.context.context_interaction import ContextInteraction
 from core.feature.context.context_where import ContextWhere
 
 feature_class_name = 'Context'
+feature_dependencies = ['activity', 'gps', 'phone_features']
 
 
 class Context(ComputeFeatureBase, ContextInteraction, ContextWhere, ContextActivityEngaged):
@@ -42,7 +44,7 @@ class Context(ComputeFeatureBase, ContextInteraction, ContextWhere, ContextActiv
 
     def get_day_data(self, user_id, stream_name, day):
         """
-        get list of DataPoint for the stream name
+        get list of DataPoint for the stream name, with their IntervalIndex
 
         :param string stream_name: Name of the stream
         :param string user_id: UID of the user
@@ -61,7 +63,8 @@ class Context(ComputeFeatureBase, ContextInteraction, ContextWhere, ContextActiv
                 day_data.extend(data_stream.data)
 
         day_data.sort(key=lambda x: x.start_time)
-        return {"data": day_data, "stream_name": stream_name, "stream_ids": stream_ids}
+        return {"data": day_data, "stream_name": stream_name, "stream_ids": stream_ids,
+                "index": IntervalIndex.from_datapoints(day_data)}
 
     def get_time_window_before_survey(self, user_id: uuid, day: str) -> dict:
         """
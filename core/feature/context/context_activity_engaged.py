@@ -64,10 +64,13 @@ class ContextActivityEngaged():
         end_data_time = before_survey_time.get("end_time", None)
         offset = before_survey_time.get("offset", None)
 
-        location_data = get_home_work_location(location_from_model.get("data", []), start_data_time, end_data_time)
-        places_data = get_places(places.get("data", []), start_data_time, end_data_time)
+        location_data = get_home_work_location(location_from_model.get("data", []), start_data_time, end_data_time,
+                                               index=location_from_model.get("index"))
+        places_data = get_places(places.get("data", []), start_data_time, end_data_time,
+                                 index=places.get("index"))
         phone_physical_activity_val = get_phone_physical_activity_data(phone_physical_activity.get("data", []),
-                                                                       start_data_time, end_data_time)
+                                                                       start_data_time, end_data_time,
+                                                                       index=phone_physical_activity.get("index"))
 
         religious_place = 0
         educational_place = 0
@@ -76,11 +79,14 @@ class ContextActivityEngaged():
         restaurant_place = 0
         sample = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
 
-        on_sms = is_on_sms(sms.get("data", []), start_data_time, end_data_time)
+        on_sms = is_on_sms(sms.get("data", []), start_data_time, end_data_time,
+                           index=sms.get("index"))
         on_phone = is_on_phone(call_duration_cu.get("data", []), start_data_time, end_data_time)
-        on_social_app = is_on_social_app(phone_app_cat_usage.get("data", []), start_data_time, end_data_time)
+        on_social_app = is_on_social_app(phone_app_cat_usage.get("data", []), start_data_time, end_data_time,
+                                         index=phone_app_cat_usage.get("index"))
         activity_wrist_sensor = get_physical_activity_wrist_sensor(physical_activity_wrist_sensor.get("data", []),
-                                                                   start_data_time, end_data_time)
+                                                                   start_data_time, end_data_time,
+                                                                   index=physical_activity_wrist_sensor.get("index"))
         if len(places_data) > 0:
             for plc in places_data:
                 if plc[2] == "yes":
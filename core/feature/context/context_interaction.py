@@ -55,9 +55,11 @@ class ContextInteraction():
         end_data_time = before_survey_time.get("end_time", None)
         offset = before_survey_time.get("offset", None)
 
-        talking = is_talking(voice_feature.get("data", []), start_data_time, end_data_time)
+        talking = is_talking(voice_feature.get("data", []), start_data_time, end_data_time,
+                             index=voice_feature.get("index"))
         on_phone = is_on_phone(call_duration_cu.get("data", []), start_data_time, end_data_time)
-        on_social_app = is_on_social_app(phone_app_cat_usage.get("data", []), start_data_time, end_data_time)
+        on_social_app = is_on_social_app(phone_app_cat_usage.get("data", []), start_data_time, end_data_time,
+                                         index=phone_app_cat_usage.get("index"))
         sample = [0, 0, 0]
 
         if on_social_app:
@@ -56,10 +56,13 @@ class ContextWhere():
         offset = before_survey_time.get("offset", None)
         outdoor = 0
         indoor = 0
-        location_data = get_home_work_location(location_from_model.get("data", []), start_data_time, end_data_time)
-        places_data = get_places(places.get("data", []), start_data_time, end_data_time)
+        location_data = get_home_work_location(location_from_model.get("data", []), start_data_time, end_data_time,
+                                               index=location_from_model.get("index"))
+        places_data = get_places(places.get("data", []), start_data_time, end_data_time,
+                                 index=places.get("index"))
         phone_physical_activity_val = get_phone_physical_activity_data(phone_physical_activity.get("data", []),
-                                                                       start_data_time, end_data_time)
+                                                                       start_data_time, end_data_time,
+                                                                       index=phone_physical_activity.get("index"))
 
         sample = [0, 0, 0, 0, 0, 0]
 
@@ -25,92 +25,99 @@
 
 from datetime import datetime, timedelta
 
+from core.signalprocessing.intervals import IntervalIndex
 
-def filter_data(data: list, start_time: datetime, end_time: datetime) -> list:
+
+def filter_data(data: list, start_time: datetime, end_time: datetime,
+                index: IntervalIndex = None) -> list:
     """
     Filter data points based on start and end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     subset_data = []
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                subset_data.append(dp)
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            subset_data.append(dp)
     return subset_data
 
 
-def get_home_work_location(data: list, start_time: datetime, end_time: datetime) -> str:
+def get_home_work_location(data: list, start_time: datetime, end_time: datetime,
+                           index: IntervalIndex = None) -> str:
     """
     Get location (work/home) between start and end time duration
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     subset_data = []
     val = "undefined"
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                subset_data.append(dp.sample)
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            subset_data.append(dp.sample)
     if len(subset_data) > 0:
         val = max(set(subset_data), key=subset_data.count)
     return val
 
 
-def get_places(data: list, start_time: datetime, end_time: datetime) -> list:
+def get_places(data: list, start_time: datetime, end_time: datetime,
+               index: IntervalIndex = None) -> list:
     """
     Filter data points based on start and end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     subset_data = []
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                subset_data.append(dp.sample)
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            subset_data.append(dp.sample)
     return subset_data
 
 
-def get_phone_physical_activity_data(data: list, start_time: datetime, end_time: datetime) -> int:
+def get_phone_physical_activity_data(data: list, start_time: datetime, end_time: datetime,
+                                     index: IntervalIndex = None) -> int:
     """
     Get a user's physical activity between start and end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     sample_val = []
     val = 0
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                sample_val.append(dp.sample[0])
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            sample_val.append(dp.sample[0])
         if len(sample_val) > 0:
             val = round(sum(sample_val) / float(len(sample_val)))
 
     return val
 
 
-def is_talking(data: list, start_time: datetime, end_time: datetime) -> bool:
+def is_talking(data: list, start_time: datetime, end_time: datetime,
+               index: IntervalIndex = None) -> bool:
     """
     Get whether a user was talking between start/end time provided
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     sample_val = []
     val = 0
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                sample_val.append(dp.sample)
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            sample_val.append(dp.sample)
         if len(sample_val) > 0:
             val = round(sum(sample_val) / float(len(sample_val)))
         if val > 0:
@@ -120,18 +127,19 @@ def is_talking(data: list, start_time: datetime, end_time: datetime) -> bool:
     return False
 
 
-def is_on_sms(data: list, start_time: datetime, end_time: datetime) -> bool:
+def is_on_sms(data: list, start_time: datetime, end_time: datetime,
+              index: IntervalIndex = None) -> bool:
     """
     Get whether a user was busy with sms durting start/end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                return True
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            return True
     return False
 
 
@@ -160,41 +168,61 @@ def is_on_phone(data: list, start_time: datetime, end_time: datetime) -> bool:
     return False
 
 
-def is_on_social_app(data: list, start_time: datetime, end_time: datetime) -> bool:
+def is_on_social_app(data: list, start_time: datetime, end_time: datetime,
+                     index: IntervalIndex = None) -> bool:
     """
     Get whether a user was busy on social apps durting start/end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                if dp.sample == "Social":
-                    return True
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            if dp.sample == "Social":
+                return True
     return False
 
 
-def get_physical_activity_wrist_sensor(data: list, start_time: datetime, end_time: datetime) -> str:
+def get_physical_activity_wrist_sensor(data: list, start_time: datetime, end_time: datetime,
+                                       index: IntervalIndex = None) -> str:
     """
     Get a user's activity based on wrist sensor during start/end time
     :param data:
     :param start_time:
     :param end_time:
+    :param index: IntervalIndex of data
     :return:
     """
     subset_data = []
     val = 0
     if len(data) > 0:
-        for dp in data:
-            if in_time_range(dp.start_time, dp.end_time, start_time, end_time):
-                subset_data.append((str(dp.sample).lower()))
+        for dp in data_in_time_range(data, start_time, end_time, index):
+            subset_data.append((str(dp.sample).lower()))
         if len(subset_data) > 0:
             val = max(set(subset_data), key=subset_data.count)
     return val
 
 
+def data_in_time_range(data: list, start_time: datetime, end_time: datetime,
+                       index: IntervalIndex = None) -> list:
+    """
+    Data points for which in_time_range holds, in list order. With the
+    IntervalIndex of data, found with binary searches instead of a scan.
+    :param data:
+    :param start_time:
+    :param end_time:
+    :param index: IntervalIndex of data
+    :return:
+    """
+    if index is None:
+        return [dp for dp in data if in_time_range(dp.start_time, dp.end_time, start_time, end_time)]
+    if start_time is None or end_time is None:
+        return []
+    return [data[i] for i in index.touching(start_time, end_time) if data[i].end_time is not None]
+
+
 def in_time_range(dp_start_time: datetime, dp_end_time: datetime, start_time: datetime, end_time: datetime) -> bool:
     """
     Check whether datapoint's start/end time is in range of qualtrics start/end time
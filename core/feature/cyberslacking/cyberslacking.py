@@ -35,6 +35,7 @@ import numpy as np
 from typing import List, Callable, Any
 
 feature_class_name = 'Cyberslacking'
+feature_dependencies = ['phone_features', 'sleep_time']
 
 stream_names = {
   'sleep': "org.md2k.data_analysis.feature.sleep",
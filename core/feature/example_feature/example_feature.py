@@ -31,6 +31,25 @@ syslog.openlog(ident="CerebralCortex-ExampleFeature")
 # This variable must match the class name
 feature_class_name = 'ExampleFeature'
 
+# Names of the features whose output streams this feature reads. The driver
+# schedules this feature after them.
+feature_dependencies = []
+
+# Model files under core/resources/models used by this feature. The driver
+# ships them to the executors once per job, get them with
+# core.utils.model_registry.get_model.
+feature_models = []
+
+# Estimated peak memory in bytes per data point read by this feature. The
+# driver admits the tasks of features declaring it against the memory budget
+# of the worker (--memory-budget), leave it out for features of small
+# footprint.
+# feature_memory_per_point = 600
+
+# Seconds after which a run of this feature on a user's days is interrupted
+# and recorded as failed, overriding the --task-timeout of the driver.
+# feature_timeout = 3600
+
 
 class ExampleFeature(ComputeFeatureBase):
     """
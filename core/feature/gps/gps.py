@@ -13,14 +13,9 @@ import time
 import numpy as np, pandas as pd
 import time, os
 from math import radians, cos, sin, asin, sqrt
-from sklearn.cluster import DBSCAN
-from geopy.distance import great_circle
-from shapely.geometry.multipoint import MultiPoint
 from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from core.computefeature import ComputeFeatureBase
-from googleplaces import GooglePlaces, types, lang
-import googleplaces
 from core.computefeature import get_resource_contents
 
 feature_class_name = 'GPSClusteringEpochComputation'
@@ -251,6 +246,7 @@ class GPSClusteringEpochComputation(ComputeFeatureBase):
                                                            a_place))))
                     '''
                     try:
+                        from googleplaces import GooglePlaces
                         google_places = GooglePlaces(api_key)
                         query_res = google_places.nearby_search(
                             lat_lng={'lat': latitude, 'lng': longitude},
@@ -441,6 +437,8 @@ class GPSClusteringEpochComputation(ComputeFeatureBase):
         :return:
         :rtype: object
         """
+        from geopy.distance import great_circle
+        from shapely.geometry.multipoint import MultiPoint
         centroid = (
             MultiPoint(cluster).centroid.x, MultiPoint(cluster).centroid.y)
         centermost_point = min(cluster, key=lambda point: great_circle(point,
@@ -472,6 +470,7 @@ class GPSClusteringEpochComputation(ComputeFeatureBase):
         coords = dataframe.as_matrix(columns=['Latitude', 'Longitude'])
         epsilon = geo_fence_distance / (
                 self.EPSILON_CONSTANT * self.KM_PER_RADIAN)
+        from sklearn.cluster import DBSCAN
         db = DBSCAN(eps=epsilon, min_samples=min_points_in_cluster,
                     algorithm='ball_tree', metric='haversine').fit(
             np.radians(coords))
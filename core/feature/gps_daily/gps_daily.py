@@ -42,6 +42,7 @@ import uuid
 import json
 
 feature_class_name = 'GPSDaily'
+feature_dependencies = ['gps']
 
 
 class GPSDaily(ComputeFeatureBase):
@@ -40,6 +40,7 @@ import json
 import traceback
 
 feature_class_name = 'GpsLocationDaywise'
+feature_dependencies = ['gps']
 GPS_EPISODES_AND_SEMANTIC_lOCATION_STREAM = "org.md2k.data_analysis.gps_episodes_and_semantic_location_from_model"
 
 
@@ -42,6 +42,7 @@ import uuid
 import json
 
 feature_class_name = 'GPSFeatures'
+feature_dependencies = ['gps_daily']
 stream_name_gps_cluster = "org.md2k.data_analysis.gps_clustering_episode_generation_daily"
 stream_name_semantic_location = "org.md2k.data_analysis.gps_episodes_and_semantic_location_daily"
 stream_name_semantic_location_places = \
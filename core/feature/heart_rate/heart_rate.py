@@ -29,6 +29,7 @@ from datetime import timedelta
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 
 feature_class_name = 'heart_rate'
+feature_dependencies = ['rr_interval']
 
 
 class heart_rate(ComputeFeatureBase):
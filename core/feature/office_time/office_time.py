@@ -50,6 +50,7 @@ import traceback
 
 # TODO: Define constants
 feature_class_name = 'WorkingDays'
+feature_dependencies = ['beacon', 'gps']
 GPS_EPISODES_AND_SEMANTIC_lOCATION_STREAM = "org.md2k.data_analysis.gps_episodes_and_semantic_location_from_model"
 
 
@@ -162,30 +163,30 @@ class WorkingDays(ComputeFeatureBase):
             self.CC.logging.log("Processing Working Days")
             self.listing_all_work_days(user_id, all_days)
 
-            arrival_data_feature = ArrivalTimes(self.CC)
+            arrival_data_feature = self.sub_feature(ArrivalTimes)
             arrival_data_feature.process(user_id, all_days)
 
-            expected_arrival_data_feature = ExpectedArrivalTimes(self.CC)
+            expected_arrival_data_feature = self.sub_feature(ExpectedArrivalTimes)
             expected_arrival_data_feature.process(user_id, all_days)
 
-            staying_time_data_feature = StayingTimes(self.CC)
+            staying_time_data_feature = self.sub_feature(StayingTimes)
             staying_time_data_feature.process(user_id, all_days)
 
-            expected_staying_time_data_feature = ExpectedStayingTimes(self.CC)
+            expected_staying_time_data_feature = self.sub_feature(ExpectedStayingTimes)
             expected_staying_time_data_feature.process(user_id, all_days)
 
             # Office Time Calculation from Beacon
-            working_days_from_beacon_feature = WorkingDaysFromBeacon(self.CC)
+            working_days_from_beacon_feature = self.sub_feature(WorkingDaysFromBeacon)
             working_days_from_beacon_feature.process(user_id, all_days)
 
-            arrival_data_from_beacon_feature = ArrivalTimesFromBeacon(self.CC)
+            arrival_data_from_beacon_feature = self.sub_feature(ArrivalTimesFromBeacon)
             arrival_data_from_beacon_feature.process(user_id, all_days)
 
-            expected_arrival_data_from_beacon_feature = ExpectedArrivalTimesFromBeacon(self.CC)
+            expected_arrival_data_from_beacon_feature = self.sub_feature(ExpectedArrivalTimesFromBeacon)
             expected_arrival_data_from_beacon_feature.process(user_id, all_days)
 
-            staying_time_data_from_beacon_feature = StayingTimesFromBeacon(self.CC)
+            staying_time_data_from_beacon_feature = self.sub_feature(StayingTimesFromBeacon)
             staying_time_data_from_beacon_feature.process(user_id, all_days)
 
-            expected_staying_time_data_from_beacon_feature = ExpectedStayingTimesFromBeacon(self.CC)
+            expected_staying_time_data_from_beacon_feature = self.sub_feature(ExpectedStayingTimesFromBeacon)
             expected_staying_time_data_from_beacon_feature.process(user_id, all_days)
@@ -33,6 +33,7 @@ import uuid
 from typing import List
 
 feature_class_name = 'PhoneAppusageFeatures'
+feature_dependencies = ['phone_features']
 
 app_usage_all_context_per_hour = 'org.md2k.data_analysis.feature.phone.app_usage.all_context.per_hour'
 app_usage_all_context_total =\
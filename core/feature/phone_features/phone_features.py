@@ -29,8 +29,6 @@ from cerebralcortex.core.datatypes.datastream import DataPoint
 from cerebralcortex.core.datatypes.stream_types import StreamTypes
 from core.computefeature import ComputeFeatureBase
 
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
 import datetime
 import numpy as np
 from datetime import timedelta
@@ -42,10 +40,10 @@ import math
 import base64
 import pickle
 
-from sklearn.mixture import GaussianMixture
 from typing import List, Callable, Any
 
 feature_class_name = 'PhoneFeatures'
+feature_dependencies = ['gps_location_daywise']
 
 # Constants
 IN_VEHICLE = 6.0
@@ -1374,7 +1372,8 @@ class PhoneFeatures(ComputeFeatureBase):
             try:
                 time.sleep(2.0)
                 self.CC.logging.log('%s not found in cache.' % (appid))
-                response = urlopen(url)
+                from urllib.request import urlopen
+                response = urlopen(url, timeout=30)
             except Exception:
                 toreturn = [appid, None, None, None]
                 objstr = base64.b64encode(pickle.dumps(toreturn))
@@ -1383,6 +1382,8 @@ class PhoneFeatures(ComputeFeatureBase):
         else:
             return pickle.loads(base64.decodebytes(cached_response.encode()))
 
+        # only needed for uncached apps, bs4 is imported here
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response, 'html.parser')
         text = soup.find('a', itemprop='genre')
 
@@ -28,6 +28,8 @@ from cerebralcortex.core.datatypes.datastream import DataStream
 from cerebralcortex.core.datatypes.datastream import DataPoint
 from cerebralcortex.core.datatypes.stream_types import StreamTypes
 from core.computefeature import ComputeFeatureBase
+from core.signalprocessing.intervals import IntervalIndex
+from core.signalprocessing.timeseries import to_microseconds
 import numpy as np
 from datetime import timedelta
 import datetime
@@ -39,6 +41,7 @@ from typing import List, Callable, Any
 from core.feature.phone_screen_touch_features.phone_screen_touch_features_all_app import PhoneScreenTouchFeaturesAllApp
 
 feature_class_name = 'PhoneScreenTouchFeatures'
+feature_dependencies = ['phone_features']
 
 
 class PhoneScreenTouchFeatures(ComputeFeatureBase):
@@ -311,6 +314,27 @@ class PhoneScreenTouchFeatures(ComputeFeatureBase):
 
         return appusage
 
+    def appusage_ranges(self, data: List[DataPoint], appusage: List) -> List[tuple]:
+        """
+        Helper function to find the screen touches of every app usage duration with binary searches. A screen
+        touch belongs to the first app usage duration containing it only.
+
+        :param List(DataPoint) data: Phone screen touch data stream sorted by start time
+        :param List appusage: list of app usage duration of specific app categories of the form
+                                [start_time, end_time, category]
+        :return: One (first, last) index range of data per app usage duration
+        :rtype: List(tuple)
+        """
+        index = IntervalIndex([to_microseconds(dp.start_time) for dp in data])
+        first, last = index.starting_ranges([a[0] for a in appusage], [a[1] for a in appusage])
+        ranges = []
+        i = 0
+        for f, l in zip(first, last):
+            f = max(i, int(f))
+            i = max(f, int(l))
+            ranges.append((f, i))
+        return ranges
+
     def appusage_interval_list(self, data: List[DataPoint], appusage: List) -> List[int]:
         """
         Helper function to get screen touch gap for specific app categories
@@ -321,17 +345,12 @@ class PhoneScreenTouchFeatures(ComputeFeatureBase):
         :return: A list of integers containing screen touch gap as in touch screen timestamp unit (milliseconds)
         :rtype: List(int)
         """
+        samples = np.array([dp.sample for dp in data], dtype=np.float64)
         ret = []
-        i = 0
-        for a in appusage:
-            while i<len(data) and data[i].start_time<a[0]:
-                i += 1
-            last = 0
-            while i<len(data) and data[i].start_time <= a[1]:
-                if last > 0:
-                    ret.append(int(data[i].sample - last))
-                last = data[i].sample
-                i += 1
+        for first, last in self.appusage_ranges(data, appusage):
+            touches = samples[first:last]
+            gaps = (touches[1:] - touches[:-1])[touches[:-1] > 0]
+            ret.extend(int(gap) for gap in gaps)
         return ret
 
     def label_appusage_intervals(self, data: List[DataPoint], appusage: List, intervals: List,
@@ -348,12 +367,9 @@ class PhoneScreenTouchFeatures(ComputeFeatureBase):
         :rtype: List(DataPoint)
         """
         ret = []
-        i = 0
-        for a in appusage:
-            while i<len(data) and data[i].start_time<a[0]:
-                i += 1
+        for first, end in self.appusage_ranges(data, appusage):
             last = None
-            while i<len(data) and data[i].start_time <= a[1]:
+            for i in range(first, end):
                 if last:
                     diff = (data[i].start_time - last).total_seconds()
                     for j in range(len(interval_label)):
@@ -373,7 +389,6 @@ class PhoneScreenTouchFeatures(ComputeFeatureBase):
                                                      offset = data[i].offset, sample=interval_label[j]))
                             break;
                 last = data[i].start_time
-                i += 1
         return ret
 
     def process_phonescreen_all_day_data(self, user_id: str, all_days: List[str],
@@ -635,5 +650,5 @@ class PhoneScreenTouchFeatures(ComputeFeatureBase):
             self.process_data(user_id, streams, all_days)
 
             # feature calculation without app categories
-            features_all_app = PhoneScreenTouchFeaturesAllApp(self.CC)
+            features_all_app = self.sub_feature(PhoneScreenTouchFeaturesAllApp)
             features_all_app.process(user_id, all_days)
\ No newline at end of file
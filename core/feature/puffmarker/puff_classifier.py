@@ -1,19 +1,19 @@
-import pickle
-
 from sklearn.ensemble import RandomForestClassifier
 from core.feature.puffmarker.utils import *
-from core.computefeature import get_resource_contents
+from core.utils.model_registry import get_model
+from core.utils.profiling import INFERENCE, profile_section
 
 
 def get_posture_model() -> RandomForestClassifier:
-    clf = pickle.loads(get_resource_contents(PUFFMARKER_MODEL_FILENAME))
-    return clf
+    return get_model(PUFFMARKER_MODEL_FILENAME)
 
 
 def classify_puffs(features):
     clf = get_posture_model()
     X = [dp.sample for dp in features]
-    predicted_labels = clf.predict(X)
+    with profile_section(INFERENCE) as counts:
+        predicted_labels = clf.predict(X)
+        counts['points'] = len(X)
     labels = [DataPoint(start_time=dp.start_time,
                         offset=dp.offset,
                         end_time=dp.end_time,
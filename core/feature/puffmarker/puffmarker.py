@@ -35,6 +35,7 @@ from core.feature.puffmarker.wrist_features import compute_wrist_features
 from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
 
 feature_class_name = 'PuffMarker'
+feature_models = [PUFFMARKER_MODEL_FILENAME]
 
 
 class PuffMarker(ComputeFeatureBase):
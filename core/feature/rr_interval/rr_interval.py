@@ -24,10 +24,15 @@
 
 from core.computefeature import ComputeFeatureBase
 from core.feature.rr_interval.utils.util_helper_functions import *
+from core.signalprocessing.timeseries import TimeSeries
 from datetime import timedelta
 
 feature_class_name = 'rr_interval'
 
+# the day of raw packets is decoded into a float64 PPG matrix next to the
+# DataPoints read
+feature_memory_per_point = 600
+
 
 class rr_interval(ComputeFeatureBase):
     """
@@ -118,36 +123,30 @@ class rr_interval(ComputeFeatureBase):
                     if presence[0].sample:
                         continue
 
-            left_data = []
-            right_data = []
+            # admission control: only the packets of 20 byte values are kept
+            left_data = TimeSeries.empty(20)
+            right_data = TimeSeries.empty(20)
 
             if motionsense_hrv_left_raw in all_streams:
-                left_data = get_datastream(self.CC,motionsense_hrv_left_raw,day,user_id,False)
+                left_data = self.load_day_array(user_id,motionsense_hrv_left_raw,day,width=20,localtime=False)
 
 
-            if not left_data:
+            if not len(left_data):
                 if motionsense_hrv_left_raw_cat in all_streams:
-                    left_data = get_datastream(self.CC,motionsense_hrv_left_raw_cat,day,user_id,False)
+                    left_data = self.load_day_array(user_id,motionsense_hrv_left_raw_cat,day,width=20,localtime=False)
 
 
 
             if motionsense_hrv_right_raw in all_streams:
-                right_data = get_datastream(self.CC,motionsense_hrv_right_raw,day,user_id,False)
+                right_data = self.load_day_array(user_id,motionsense_hrv_right_raw,day,width=20,localtime=False)
 
-            if not right_data:
+            if not len(right_data):
                 if motionsense_hrv_right_raw_cat in all_streams:
-                    right_data = get_datastream(self.CC,motionsense_hrv_right_raw_cat,day,user_id,False)
-
-
-            if not left_data and not right_data:
-                continue
-
-            left_data = admission_control(left_data)
-            right_data = admission_control(right_data)
+                    right_data = self.load_day_array(user_id,motionsense_hrv_right_raw_cat,day,width=20,localtime=False)
 
             print('-'*20,len(left_data),'-'*20,len(right_data),'-'*20,' after admission control length')
 
-            if not left_data and not right_data:
+            if not len(left_data) and not len(right_data):
                 print('-'*20," No data after admission control ",'-'*20)
                 continue
 
@@ -162,8 +161,8 @@ class rr_interval(ComputeFeatureBase):
             #     print('-'*20," No data before 120 minutes of stress survey ",'-'*20)
             #     continue
 
-            left_decoded_data = decode_only(left_data)
-            right_decoded_data = decode_only(right_data)
+            left_decoded_data = decode_array(left_data)
+            right_decoded_data = decode_array(right_data)
             print('-'*20,len(left_decoded_data),'-'*20,len(right_decoded_data),'-'*20,' decoded length')
 
 
@@ -0,0 +1,43 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.feature.rr_interval.utils.util_helper_functions import \
+    decode_array, decode_only
+from core.signalprocessing.timeseries import TimeSeries
+
+
+class TestDecodeArray(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        rng = random.Random(18)
+        start = datetime(2018, 1, 1, tzinfo=pytz.utc)
+        self.data = [DataPoint(start_time=start + timedelta(milliseconds=40 * i),
+                               offset=-21600000,
+                               sample=[rng.randint(-128, 127)
+                                       for _ in range(20)])
+                     for i in range(2000)]
+
+    def test_decode_array_matches_decode_only(self):
+        expected = decode_only(self.data)
+        decoded = decode_array(TimeSeries.from_datapoints(self.data, width=20))
+        self.assertEqual(len(expected), len(decoded))
+        for e, d in zip(expected, decoded):
+            self.assertEqual(e.start_time, d.start_time)
+            np.testing.assert_array_equal(e.sample, d.sample)
+
+    def test_decode_array_keeps_the_high_led_bits(self):
+        decoded = decode_array(TimeSeries.from_datapoints(self.data, width=20))
+        self.assertGreater(max(dp.sample[2] for dp in decoded), 255)
+
+    def test_decode_array_empty(self):
+        self.assertEqual(decode_array(TimeSeries.empty(20)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,6 +34,7 @@ from core.feature.rr_interval.utils.JU_code import Bayesian_IP_memphis
 from sklearn.preprocessing import normalize
 from copy import deepcopy
 import pytz
+from core.signalprocessing.timeseries import TimeSeries
 
 from cerebralcortex.cerebralcortex import CerebralCortex
 # TODO: Comment and describe constants
@@ -217,6 +218,38 @@ def decode_only(data: object) -> object:
     return final_data
 
 
+def decode_array(raw: TimeSeries) -> List[DataPoint]:
+    """
+    decode_only of the raw packets of a day loaded as a TimeSeries of 20 byte
+    values, decoding all the packets at once
+
+    :rtype: List[DataPoint]
+    :param TimeSeries raw: raw packets of 20 byte values
+    :return: DataPoints of the time in milliseconds and the four decoded
+        values of every packet
+    """
+    if len(raw) == 0:
+        return []
+    # unsigned byte values, widened so that the shifts do not wrap
+    Vals = raw.samples.astype(np.int64).astype(np.int8).view(np.uint8) \
+        .astype(np.int64)
+    samples = np.zeros((len(raw), 5), dtype=np.int64)
+    samples[:, 0] = raw.timestamps // 1000
+    samples[:, 1] = ((Vals[:, 18] & int('00000011', 2)) << 8) | Vals[:, 19]
+    samples[:, 2] = (Vals[:, 12] << 10) | (Vals[:, 13] << 2) | \
+                    ((Vals[:, 14] & int('11000000', 2)) >> 6)
+    samples[:, 3] = ((Vals[:, 14] & int('00111111', 2)) << 12) | \
+                    (Vals[:, 15] << 4) | \
+                    ((Vals[:, 16] & int('11110000', 2)) >> 4)
+    samples[:, 4] = ((Vals[:, 16] & int('00001111', 2)) << 14) | \
+                    (Vals[:, 17] << 6) | \
+                    ((Vals[:, 18] & int('11111100', 2)) >> 2)
+    final_data = raw.to_datapoints()
+    for dp, sample in zip(final_data, samples):
+        dp.sample = sample
+    return final_data
+
+
 def preProcessing(X0: object, Fs: object, fil_type: object) -> object:
     """
 
@@ -42,6 +42,7 @@ import math
 
 # TODO: Comment and describe constants
 feature_class_name = 'SleepDurationAnalysis'
+feature_dependencies = ['sleep_duration']
 Sleep_Durations_STREAM = 'org.md2k.data_analysis.feature.sleep_durations'
 MEDIAN_ABSOLUTE_DEVIATION_MULTIPLIER = 1.4826
 OUTLIER_DETECTION_MULTIPLIER = 3
@@ -58,6 +58,7 @@ gps_key = None
 
 
 feature_class_name = 'SocialJetlag'
+feature_dependencies = ['office_time', 'sleep_time']
 WORKDAY_STREAM="org.md2k.data_analysis.feature.working_days"
 SLEEP_STREAM="org.md2k.data_analysis.feature.sleep"
 
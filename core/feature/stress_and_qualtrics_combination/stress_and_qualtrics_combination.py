@@ -29,6 +29,7 @@ from datetime import timedelta
 from core.feature.stress_and_qualtrics_combination.util import *
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 feature_class_name = 'stress_and_qualtrics_combination'
+feature_dependencies = ['stress_from_wrist']
 
 
 
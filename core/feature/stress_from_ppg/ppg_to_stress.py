@@ -5,7 +5,6 @@ import matplotlib.pyplot as plt
 from joblib import Parallel, delayed
 from scipy import signal
 from scipy.signal import find_peaks
-import pickle
 from sklearn.metrics import mean_squared_error
 from sklearn.preprocessing import StandardScaler,MinMaxScaler,RobustScaler
 from sklearn.neighbors import LocalOutlierFactor
@@ -20,6 +19,8 @@ from scipy import interpolate
 from datetime import datetime
 
 from core.computefeature import get_resource_contents
+from core.utils.model_registry import get_model
+from core.utils.profiling import INFERENCE, profile_section
 warnings.filterwarnings('ignore')
 
 STRESS_MODEL_PATH = 'core/resources/models/stress_from_ppg/stress_clf.p'
@@ -189,14 +190,16 @@ def combine_data_sobc(window_col,ts_col,clf):
         ts_col_final.append(ts_col[i])
     if len(feature_matrix)>0:
         feature_matrix = np.array(feature_matrix).reshape(len(feature_matrix),11)
-        stress_probs = clf.predict_proba(feature_matrix)
+        with profile_section(INFERENCE) as counts:
+            stress_probs = clf.predict_proba(feature_matrix)
+            counts['points'] = len(feature_matrix)
         stress_probs[:,0] = ts_col_final
         return stress_probs
     else:
         return np.zeros((0,2))
 
 def get_stress_time_series(data):
-    clf = pickle.load(open(STRESS_MODEL_PATH,'rb'))
+    clf = get_model(STRESS_MODEL_PATH)
     # clf = get_resource_contents(STRESS_MODEL_PATH)
     data[:,0] = data[:,0]*1000
     data = data[:300000,:]
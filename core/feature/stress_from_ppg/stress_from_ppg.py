@@ -40,11 +40,13 @@ import time as tm
 # from ppg_to_stress import get_stress_time_series
 # from decode import Preprc
 from core.feature.stress_from_ppg.filtering import get_realigned_data
-from core.feature.stress_from_ppg.ppg_to_stress import get_stress_time_series
+from core.feature.stress_from_ppg.ppg_to_stress import get_stress_time_series, \
+    STRESS_MODEL_PATH
 import core.feature.stress_from_ppg.utils as utils
 
 
 feature_class_name = 'StressFromPPG'
+feature_models = [STRESS_MODEL_PATH]
 
 class StressFromPPG(ComputeFeatureBase):
 
@@ -25,6 +25,9 @@
 from core.computefeature import ComputeFeatureBase
 from core.feature.stress_from_wrist.utils.util import *
 from core.feature.stress_from_wrist.utils.ecg_feature_computation import ecg_feature_computation
+from core.signalprocessing.labels import LabelStream
+from core.signalprocessing.timeseries import to_microseconds
+from core.utils.profiling import INFERENCE, profile_section
 import math
 import numpy as np
 from scipy.stats import iqr
@@ -35,6 +38,8 @@ from datetime import datetime,timedelta
 import pytz
 
 feature_class_name = 'stress_from_wrist'
+feature_dependencies = ['activity', 'rr_interval']
+feature_models = [MODEL_FILENAME, SCALER_FILENAME]
 
 
 class stress_from_wrist(ComputeFeatureBase):
@@ -174,15 +179,17 @@ class stress_from_wrist(ComputeFeatureBase):
         if not rr_interval_data:
             return
 
-        ts_arr = [i.start_time for i in activity_data]
-        sample_arr = [i.sample for i in activity_data]
+        # activity windows starting within every rr interval window
+        activity = LabelStream.from_datapoints(activity_data)
+        starts = [to_microseconds(dp.start_time) for dp in rr_interval_data]
+        ends = [to_microseconds(dp.end_time) for dp in rr_interval_data]
+        activity_count = activity.count(starts,ends)
+        active_count = activity.count(starts,ends,['WALKING','MOD','HIGH'])
 
         feature_matrix = []
         st_et_offset_array = []
-        for dp in rr_interval_data:
-            ind = np.array([sample_arr[i] for i,item in enumerate(ts_arr) if ts_arr[i]>=dp.start_time and ts_arr[i]<= dp.end_time])
-
-            if list(ind).count('WALKING')+list(ind).count('MOD')+list(ind).count('HIGH')  >= len(ind)*.33:
+        for i,dp in enumerate(rr_interval_data):
+            if active_count[i] >= activity_count[i]*.33:
                 continue
 
             if math.isnan(dp.sample[1]):
@@ -201,7 +208,9 @@ class stress_from_wrist(ComputeFeatureBase):
         feature_matrix = np.array(feature_matrix).reshape(len(feature_matrix),no_of_feature)
         normalized_feature_matrix = StandardScaler().fit_transform(feature_matrix)
         transformed_feature_matrix = scaler.transform(normalized_feature_matrix)
-        stress_value = model.predict(transformed_feature_matrix)
+        with profile_section(INFERENCE) as counts:
+            stress_value = model.predict(transformed_feature_matrix)
+            counts['points'] = len(transformed_feature_matrix)
         final_binary_data = []
         for i,dp in enumerate(st_et_offset_array):
             final_binary_data.append(DataPoint.from_tuple(start_time=dp[0],end_time=dp[-1],
@@ -210,7 +219,9 @@ class stress_from_wrist(ComputeFeatureBase):
         print('-'*20,' got stress data ',len(final_binary_data),'-'*20)
         self.store_stream(json_path[0],[streams[stream_identifier]],user_id,final_binary_data,localtime=False)
 
-        stress_likelihood_value = model.predict_proba(transformed_feature_matrix)
+        with profile_section(INFERENCE) as counts:
+            stress_likelihood_value = model.predict_proba(transformed_feature_matrix)
+            counts['points'] = len(transformed_feature_matrix)
         final_likelihood_data = []
         for i,dp in enumerate(st_et_offset_array):
             final_likelihood_data.append(DataPoint.from_tuple(start_time=dp[0],end_time=dp[-1],
@@ -21,8 +21,7 @@
 # CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
 # OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
-import pickle
-import core.computefeature
+from core.utils import model_registry
 from cerebralcortex.cerebralcortex import CerebralCortex
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from typing import List
@@ -35,6 +34,10 @@ window_offset = 60 #sliding window offset
 
 path_to_model_files = 'core/resources/models/stress_wrist/' #path of storage
 
+MODEL_FILENAME = path_to_model_files + 'stress_model_final_final.model'
+
+SCALER_FILENAME = path_to_model_files + 'stress_scaler_final_final.scaler'
+
 rr_interval_identifier = "org.md2k.data_analysis.feature.rr_interval.v1" #identifier for rr_interval stream
 
 activity_identifier = "org.md2k.data_analysis.feature.activity.wrist.accel_only.10_seconds" #identifier for activity
@@ -64,8 +67,6 @@ def get_model():
     :return: Model and Scalar
     :rtype: objects
     """
-    model = pickle.loads(core.computefeature.get_resource_contents(
-        path_to_model_files+'stress_model_final_final.model'))
-    scaler = pickle.loads(core.computefeature.get_resource_contents(
-        path_to_model_files + 'stress_scaler_final_final.scaler'))
+    model = model_registry.get_model(MODEL_FILENAME)
+    scaler = model_registry.get_model(SCALER_FILENAME)
     return model, scaler
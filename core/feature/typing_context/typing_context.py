@@ -30,6 +30,7 @@ from cerebralcortex.core.datatypes.datapoint import DataPoint
 from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
 
 feature_class_name = 'TypingContext'
+feature_dependencies = ['beacon', 'gps', 'typing']
 
 
 class TypingContext(ComputeFeatureBase):
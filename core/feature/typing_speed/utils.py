@@ -27,16 +27,9 @@ from cerebralcortex.cerebralcortex import CerebralCortex
 from pprint import pprint
 from datetime import timedelta, datetime
 from cerebralcortex.core.util.data_types import DataPoint
-from sklearn import ensemble
 from collections import Counter
-from keras.models import Sequential
-from keras.layers import Conv2D, MaxPooling2D, LSTM, Dense, Dropout, Flatten
-from keras.layers.core import Permute, Reshape
-from keras import backend as K
-from keras.models import load_model
 from typing import List
 
-import scipy.io
 import pandas as pd
 import numpy as np
 import numbers
@@ -108,6 +101,8 @@ def typing_episodes(dataset: pd.DataFrame, offset: int) -> List[DataPoint]:
 
     tmpfile = tempfile.NamedTemporaryFile(delete=True)
     tmpfile.write(get_resource_contents(TYPING_MODEL_FILENAME))
+    # keras is imported here, it takes seconds to load
+    from keras.models import load_model
     model = load_model(os.path.realpath(tmpfile.name))
     tmpfile.close()
 
@@ -156,6 +151,7 @@ def typing_episodes(dataset: pd.DataFrame, offset: int) -> List[DataPoint]:
 
         tmpfile = tempfile.NamedTemporaryFile(delete=True)
         tmpfile.write(get_resource_contents(TYPINGSPEED_MODEL_FILENAME))
+        from keras.models import load_model
         model = load_model(os.path.realpath(tmpfile.name))
         tmpfile.close()
         
@@ -28,6 +28,7 @@ from enum import Enum
 import numpy as np
 from scipy.stats import iqr
 
+from core.signalprocessing.timeseries import TimeSeries, from_microseconds
 from core.signalprocessing.window import window
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from cerebralcortex.core.datatypes.datastream import DataStream
@@ -51,41 +52,66 @@ def outlier_computation(valid_rr_interval_time: list,
 
     yields: The quality of each data point in the RR interval array
     """
-    standard_rr_interval_sample = valid_rr_interval_sample[0]
-    previous_rr_interval_quality = Quality.ACCEPTABLE
-
-    for i in range(1, len(valid_rr_interval_sample) - 1):
+    qualities = outlier_qualities(valid_rr_interval_sample, criterion_beat_difference)
+    for i, quality in enumerate(qualities, 1):
+        yield DataPoint.from_tuple(valid_rr_interval_time[i], quality, valid_rr_interval_time[i])
 
-        rr_interval_diff_with_last_good = abs(standard_rr_interval_sample - valid_rr_interval_sample[i])
-        rr_interval_diff_with_prev_sample = abs(valid_rr_interval_sample[i - 1] - valid_rr_interval_sample[i])
-        rr_interval_diff_with_next_sample = abs(valid_rr_interval_sample[i] - valid_rr_interval_sample[i + 1])
 
-        if previous_rr_interval_quality == Quality.UNACCEPTABLE and rr_interval_diff_with_last_good < criterion_beat_difference:
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.ACCEPTABLE, valid_rr_interval_time[i])
-            previous_rr_interval_quality = Quality.ACCEPTABLE
-            standard_rr_interval_sample = valid_rr_interval_sample[i]
+def outlier_qualities(valid_rr_interval_sample: list,
+                      criterion_beat_difference: float) -> list:
+    """
+    The qualities outlier_computation assigns to the rr intervals, without building DataPoints. The differences
+    with the previous and next samples are computed for all the samples at once, only the comparison with the last
+    good sample depends on the previous decisions.
 
-        elif previous_rr_interval_quality == Quality.UNACCEPTABLE and rr_interval_diff_with_last_good > criterion_beat_difference >= rr_interval_diff_with_prev_sample and rr_interval_diff_with_next_sample <= criterion_beat_difference:
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.ACCEPTABLE, valid_rr_interval_time[i])
-            previous_rr_interval_quality = Quality.ACCEPTABLE
-            standard_rr_interval_sample = valid_rr_interval_sample[i]
+    :param valid_rr_interval_sample: A python array of rr interval samples
+    :param criterion_beat_difference: A threshold calculated from the RR interval data passed
 
-        elif previous_rr_interval_quality == Quality.UNACCEPTABLE and rr_interval_diff_with_last_good > criterion_beat_difference and (
-                        rr_interval_diff_with_prev_sample > criterion_beat_difference or rr_interval_diff_with_next_sample > criterion_beat_difference):
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.UNACCEPTABLE, valid_rr_interval_time[i])
-            previous_rr_interval_quality = Quality.UNACCEPTABLE
+    :return: The quality of the rr intervals from the second to the one before last
+    """
+    samples = np.asarray(valid_rr_interval_sample, dtype=np.float64)
+    if len(samples) < 3:
+        return []
+    diff_with_prev_sample = np.abs(samples[:-2] - samples[1:-1]).tolist()
+    diff_with_next_sample = np.abs(samples[1:-1] - samples[2:]).tolist()
+    samples = samples.tolist()
+
+    qualities = []
+    standard_rr_interval_sample = samples[0]
+    previous_rr_interval_quality = Quality.ACCEPTABLE
 
-        elif previous_rr_interval_quality == Quality.ACCEPTABLE and rr_interval_diff_with_prev_sample <= criterion_beat_difference:
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.ACCEPTABLE, valid_rr_interval_time[i])
-            previous_rr_interval_quality = Quality.ACCEPTABLE
-            standard_rr_interval_sample = valid_rr_interval_sample[i]
+    for i in range(1, len(samples) - 1):
 
-        elif previous_rr_interval_quality == Quality.ACCEPTABLE and rr_interval_diff_with_prev_sample > criterion_beat_difference:
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.UNACCEPTABLE, valid_rr_interval_time[i])
-            previous_rr_interval_quality = Quality.UNACCEPTABLE
+        rr_interval_diff_with_prev_sample = diff_with_prev_sample[i - 1]
+        rr_interval_diff_with_next_sample = diff_with_next_sample[i - 1]
 
+        if previous_rr_interval_quality == Quality.ACCEPTABLE:
+            if rr_interval_diff_with_prev_sample <= criterion_beat_difference:
+                quality = Quality.ACCEPTABLE
+                standard_rr_interval_sample = samples[i]
+            elif rr_interval_diff_with_prev_sample > criterion_beat_difference:
+                quality = Quality.UNACCEPTABLE
+            else:
+                qualities.append(Quality.UNACCEPTABLE)
+                continue
         else:
-            yield DataPoint.from_tuple(valid_rr_interval_time[i], Quality.UNACCEPTABLE, valid_rr_interval_time[i])
+            rr_interval_diff_with_last_good = abs(standard_rr_interval_sample - samples[i])
+            if rr_interval_diff_with_last_good < criterion_beat_difference:
+                quality = Quality.ACCEPTABLE
+                standard_rr_interval_sample = samples[i]
+            elif rr_interval_diff_with_last_good > criterion_beat_difference >= rr_interval_diff_with_prev_sample and rr_interval_diff_with_next_sample <= criterion_beat_difference:
+                quality = Quality.ACCEPTABLE
+                standard_rr_interval_sample = samples[i]
+            elif rr_interval_diff_with_last_good > criterion_beat_difference and (
+                        rr_interval_diff_with_prev_sample > criterion_beat_difference or rr_interval_diff_with_next_sample > criterion_beat_difference):
+                quality = Quality.UNACCEPTABLE
+            else:
+                qualities.append(Quality.UNACCEPTABLE)
+                continue
+        qualities.append(quality)
+        previous_rr_interval_quality = quality
+
+    return qualities
 
 
 def compute_outlier_ecg(ecg_rr: DataStream) -> DataStream:
@@ -120,15 +146,15 @@ def compute_outlier_ecg(ecg_rr: DataStream) -> DataStream:
     if criterion_beat_difference < .2:
         criterion_beat_difference = .2
 
-    ecg_rr_quality_array = [
-        DataPoint.from_tuple(valid_rr_interval_time[0], Quality.ACCEPTABLE, valid_rr_interval_time[0])]
-
-    for data in outlier_computation(valid_rr_interval_time, valid_rr_interval_sample, criterion_beat_difference):
-        if ecg_rr_quality_array[-1].sample == data.sample:
-            new_point = DataPoint.from_tuple(ecg_rr_quality_array[-1].start_time, data.sample, data.start_time)
-            ecg_rr_quality_array[-1] = new_point
-        else:
-            ecg_rr_quality_array.append(data)
+    # runs of rr intervals of the same quality, starting with the first rr interval as acceptable
+    qualities = [Quality.ACCEPTABLE] + outlier_qualities(valid_rr_interval_sample, criterion_beat_difference)
+    ecg_rr_quality_array = []
+    run_start = 0
+    for i in range(1, len(qualities) + 1):
+        if i == len(qualities) or qualities[i] != qualities[run_start]:
+            ecg_rr_quality_array.append(DataPoint.from_tuple(valid_rr_interval_time[run_start], qualities[run_start],
+                                                             valid_rr_interval_time[i - 1]))
+            run_start = i
 
     ecg_rr_outlier_stream.data = ecg_rr_quality_array
     return ecg_rr_outlier_stream
@@ -156,30 +182,60 @@ def classify_data_points(data: list,
     min_value: The minimum non-outlier sample value in the window
     """
 
-    no_of_outliers = 0
-    max_value = data[0].sample
-    min_value = data[0].sample
-
-    for i, item in enumerate(data):
-        previous_index = (len(data) - 1) if i == 0 else i - 1
-        next_index = 0 if (i == len(data) - 1) else i + 1
-        stuck = (item.sample == data[previous_index].sample) and (item.sample == data[next_index].sample)
-        flip = abs(item.sample - data[previous_index].sample) > outlier_threshold_high * adc_range or abs(
-            item.sample - data[next_index].sample) > outlier_threshold_high * adc_range
-        if signal_type:
-            disc = abs(item.sample - data[previous_index].sample) > threshold_slope * adc_range and abs(
-                item.sample - data[next_index].sample) > threshold_slope * adc_range
-        else:
-            disc = abs(item.sample - data[previous_index].sample) > threshold_slope * adc_range or abs(
-                item.sample - data[next_index].sample) > threshold_slope * adc_range
+    no_of_outliers, max_value, min_value = classify_windows([i.sample for i in data], [len(data)], signal_type,
+                                                           threshold_slope, outlier_threshold_high,
+                                                           outlier_threshold_low, adc_range)
+    return int(no_of_outliers[0]), float(max_value[0]), float(min_value[0])
 
-        if disc or stuck or flip or item.sample >= outlier_threshold_high * adc_range or item.sample <= outlier_threshold_low * adc_range:
-            no_of_outliers += 1
-        else:
-            if item.sample > max_value:
-                max_value = item.sample
-            if item.sample < min_value:
-                min_value = item.sample
+
+def classify_windows(samples: list,
+                     window_lengths: list,
+                     signal_type: bool,
+                     threshold_slope: float,
+                     outlier_threshold_high: float = .9769,
+                     outlier_threshold_low: float = .004884,
+                     adc_range: int = 4095) -> [np.ndarray, np.ndarray, np.ndarray]:
+    """
+    classify_data_points of consecutive windows at once: the stuck, flip and discontinuity checks are comparisons
+    of the samples with their shifted neighbours, the counts and ranges per window are np.add.reduceat,
+    np.maximum.reduceat and np.minimum.reduceat. As in classify_data_points the neighbours wrap around inside a
+    window.
+
+    :param samples: The samples of the windows, one window after the other
+    :param window_lengths: The number of samples of every window, none is empty
+    :param signal_type: The check for if the signal passed is respiration or ECG. True for ECG, False for Respiration
+    :param threshold_slope: The Slope threshold of ECG/Respiration signal
+    :param outlier_threshold_high: The percentage of ADC range above which any value is considered an outlier
+    :param outlier_threshold_low: The percentage of ADC range below which any value is considered an outlier
+    :param adc_range:  Maximum possible ADC value
+
+    :return: no_of_outliers, max_value and min_value arrays of one value per window
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    ends = np.cumsum(np.asarray(window_lengths, dtype=np.int64))
+    starts = ends - window_lengths
+
+    previous_sample = np.roll(samples, 1)
+    previous_sample[starts] = samples[ends - 1]
+    next_sample = np.roll(samples, -1)
+    next_sample[ends - 1] = samples[starts]
+    diff_with_previous = np.abs(samples - previous_sample)
+    diff_with_next = np.abs(samples - next_sample)
+
+    stuck = (samples == previous_sample) & (samples == next_sample)
+    flip = (diff_with_previous > outlier_threshold_high * adc_range) | (
+        diff_with_next > outlier_threshold_high * adc_range)
+    if signal_type:
+        disc = (diff_with_previous > threshold_slope * adc_range) & (diff_with_next > threshold_slope * adc_range)
+    else:
+        disc = (diff_with_previous > threshold_slope * adc_range) | (diff_with_next > threshold_slope * adc_range)
+    outlier = disc | stuck | flip | (samples >= outlier_threshold_high * adc_range) | (
+        samples <= outlier_threshold_low * adc_range)
+
+    no_of_outliers = np.add.reduceat(outlier.astype(np.int64), starts)
+    # the first sample of a window counts in its range even when it is an outlier
+    max_value = np.maximum(np.maximum.reduceat(np.where(outlier, -np.inf, samples), starts), samples[starts])
+    min_value = np.minimum(np.minimum.reduceat(np.where(outlier, np.inf, samples), starts), samples[starts])
     return no_of_outliers, max_value, min_value
 
 
@@ -267,6 +323,105 @@ def compute_data_quality(data: list,
         return Quality.ACCEPTABLE
 
 
+def compute_windows_data_quality(samples: list,
+                                 window_lengths: list,
+                                 signal_type: bool,
+                                 threshold_band_loose: float,
+                                 threshold_slope: float,
+                                 acceptable_outlier_percent: float = .34,
+                                 outlier_threshold_high: float = .9769,
+                                 outlier_threshold_low: float = .004884,
+                                 buffer_length: int = 3,
+                                 adc_range: int = 4095) -> list:
+    """
+    compute_data_quality of consecutive windows at once, the rolling buffer of the last buffer_length window
+    ranges is a difference of cumulative counts
+
+    :param samples: The samples of the windows, one window after the other
+    :param window_lengths: The number of samples of every window, none is empty
+    :param signal_type: The check for if the signal passed is respiration or ECG
+    :param threshold_band_loose: The Band Loose Threshold for ECG/Respiration signal expressed in the percentage of ADC range
+    :param threshold_slope: The Slope threshold of ECG/Respiration signal
+    :param acceptable_outlier_percent: The acceptable outlier percentage in a window default is 34 percent
+    :param outlier_threshold_high: The percentage of ADC range above which any value is considered an outlier
+    :param outlier_threshold_low: The percentage of ADC range below which any value is considered an outlier
+    :param buffer_length: The number of past windows having a role to decide the quality of the current window
+    :param adc_range: The maximum ADC value possible in the system
+
+    :return: The data quality of every window
+    """
+    if len(window_lengths) == 0:
+        return []
+    window_lengths = np.asarray(window_lengths, dtype=np.int64)
+    no_of_outliers, max_value, min_value = classify_windows(samples, window_lengths, signal_type, threshold_slope,
+                                                            outlier_threshold_high, outlier_threshold_low,
+                                                            adc_range)
+    range_values = max_value - min_value
+
+    # classify_segment
+    segment_unacceptable = no_of_outliers > (acceptable_outlier_percent * window_lengths).astype(np.int64)
+
+    # classify_buffer over the ranges of the last buffer_length windows, none before buffer_length windows
+    small_count = np.concatenate([[0], np.cumsum(range_values < threshold_band_loose * adc_range)])
+    window_index = np.arange(len(range_values))
+    if buffer_length > 0:
+        buffer_start = np.maximum(window_index + 1 - buffer_length, 0)
+    else:
+        buffer_start = np.zeros(len(range_values), dtype=np.int64)
+    amplitude_small = np.where(window_index + 1 < buffer_length, 0,
+                               small_count[window_index + 1] - small_count[buffer_start])
+
+    acceptable = ~segment_unacceptable & ~(2 * amplitude_small > buffer_length) & ~(
+        range_values <= threshold_band_loose * adc_range)
+    return [Quality.ACCEPTABLE if item else Quality.UNACCEPTABLE for item in acceptable.tolist()]
+
+
+def data_quality_stream(datastream: DataStream,
+                        window_size: float,
+                        signal_type: bool,
+                        threshold_band_loose: float,
+                        threshold_slope: float,
+                        acceptable_outlier_percent: float,
+                        outlier_threshold_high: float,
+                        outlier_threshold_low: float,
+                        buffer_length: int) -> DataStream:
+    """
+    Data quality of the windows of an ECG/Respiration datastream, merged into time ranges of the same quality
+
+    :param datastream: DataStream or TimeSeries
+    :return: An Annotated Datastream of Data quality
+    """
+    if isinstance(datastream, TimeSeries):
+        quality_stream = DataStream()
+        windows = [data for data in window(datastream, window_size=window_size).values() if len(data) > 0]
+        samples = np.concatenate([data.values for data in windows]) if windows else []
+        bounds = [(from_microseconds(data.timestamps[0], data.tz), from_microseconds(data.timestamps[-1], data.tz))
+                  for data in windows]
+    else:
+        quality_stream = DataStream.from_datastream(input_streams=[datastream])
+        windows = [data for data in window(datastream.data, window_size=window_size).values() if len(data) > 0]
+        samples = [i.sample for data in windows for i in data]
+        bounds = [(data[0].start_time, data[-1].start_time) for data in windows]
+
+    results = compute_windows_data_quality(samples, [len(data) for data in windows], signal_type,
+                                           threshold_band_loose, threshold_slope, acceptable_outlier_percent,
+                                           outlier_threshold_high, outlier_threshold_low, buffer_length)
+
+    quality = []
+    for (start_time, end_time), result in zip(bounds, results):
+        if not quality:
+            quality.append(DataPoint.from_tuple(start_time, result, end_time))
+        else:
+            if quality[-1].sample == result:
+                new_point = DataPoint.from_tuple(quality[-1].start_time, result, end_time)
+                quality[-1] = new_point
+            else:
+                quality.append(DataPoint.from_tuple(start_time, result, end_time))
+
+    quality_stream.data = quality
+    return quality_stream
+
+
 def ecg_data_quality(datastream: DataStream,
                      window_size: float = 2.0,
                      acceptable_outlier_percent: float = .34,
@@ -277,7 +432,7 @@ def ecg_data_quality(datastream: DataStream,
                      buffer_length: int = 3) -> DataStream:
     """
 
-    :param datastream: Input ECG datastream
+    :param datastream: Input ECG datastream, or TimeSeries
     :param window_size: Window size specifying the number of seconds the datastream is divided to check for data quality
     :param acceptable_outlier_percent: The acceptable outlier percentage in a window default is 34 percent
     :param outlier_threshold_high: The percentage of ADC range above which any value is considered an outlier
@@ -291,28 +446,9 @@ def ecg_data_quality(datastream: DataStream,
     :return: An Annotated Datastream of ECG Data quality specifying the time ranges when data quality was acceptable/non-acceptable
     """
 
-    ecg_quality_stream = DataStream.from_datastream(input_streams=[datastream])
-    window_data = window(datastream.data, window_size=window_size)
-
-    ecg_quality = []
-    ecg_range = []
-    for key, data in window_data.items():
-        if len(data) > 0:
-            result = compute_data_quality(data, ecg_range, True, ecg_threshold_band_loose, ecg_threshold_slope,
-                                          acceptable_outlier_percent, outlier_threshold_high, outlier_threshold_low,
-                                          buffer_length)
-            if not ecg_quality:
-                ecg_quality.append(DataPoint.from_tuple(data[0].start_time, result, data[-1].start_time))
-            else:
-                if ecg_quality[-1].sample == result:
-                    new_point = DataPoint.from_tuple(ecg_quality[-1].start_time, result, data[-1].start_time)
-                    ecg_quality[-1] = new_point
-                else:
-                    ecg_quality.append(DataPoint.from_tuple(data[0].start_time, result, data[-1].start_time))
-
-    ecg_quality_stream.data = ecg_quality
-
-    return ecg_quality_stream
+    return data_quality_stream(datastream, window_size, True, ecg_threshold_band_loose, ecg_threshold_slope,
+                               acceptable_outlier_percent, outlier_threshold_high, outlier_threshold_low,
+                               buffer_length)
 
 
 def rip_data_quality(datastream: DataStream,
@@ -325,7 +461,7 @@ def rip_data_quality(datastream: DataStream,
                      buffer_length: int = 3) -> DataStream:
     """
 
-    :param datastream: Input Respiration datastream
+    :param datastream: Input Respiration datastream, or TimeSeries
     :param window_size: Window size specifying the number of seconds the datastream is divided to check for data quality
     :param acceptable_outlier_percent: The acceptable outlier percentage in a window default is 34 percent
     :param outlier_threshold_high: The percentage of ADC range above which any value is considered an outlier
@@ -338,25 +474,6 @@ def rip_data_quality(datastream: DataStream,
 
     :return: An Annotated Datastream of Respiration Data quality specifying the time ranges when data quality was acceptable/non-acceptable
     """
-    rip_quality_stream = DataStream.from_datastream(input_streams=[datastream])
-    window_data = window(datastream.data, window_size=window_size)
-
-    rip_quality = []
-    rip_range = []
-    for key, data in window_data.items():
-        if len(data) > 0:
-            result = compute_data_quality(data, rip_range, False, rip_threshold_band_loose, rip_threshold_slope,
-                                          acceptable_outlier_percent, outlier_threshold_high, outlier_threshold_low,
-                                          buffer_length)
-            if not rip_quality:
-                rip_quality.append(DataPoint.from_tuple(data[0].start_time, result, data[-1].start_time))
-            else:
-                if rip_quality[-1].sample == result:
-                    new_point = DataPoint.from_tuple(rip_quality[-1].start_time, result, data[-1].start_time)
-                    rip_quality[-1] = new_point
-                else:
-                    rip_quality.append(DataPoint.from_tuple(data[0].start_time, result, data[-1].start_time))
-
-    rip_quality_stream.data = rip_quality
-
-    return rip_quality_stream
+    return data_quality_stream(datastream, window_size, False, rip_threshold_band_loose, rip_threshold_slope,
+                               acceptable_outlier_percent, outlier_threshold_high, outlier_threshold_low,
+                               buffer_length)
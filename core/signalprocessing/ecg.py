@@ -27,6 +27,7 @@ import numpy as np
 from scipy import signal
 
 from core.signalprocessing.dataquality import Quality
+from core.signalprocessing.timeseries import TimeSeries
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from cerebralcortex.core.datatypes.datastream import DataStream
 
@@ -89,8 +90,11 @@ def rr_interval_update(rpeak_temp1: List[DataPoint],
    :param rr_ave: previous rr-interval average
    :return: the new rr-interval average of the previously detected 8 R peak locations
    """
-    peak_interval = np.diff([0] + rpeak_temp1)  # TODO: rpeak_temp1 is a datapoint, what should this be converted to?
-    return rr_ave if len(peak_interval) < min_size else np.sum(peak_interval[-min_size:]) / min_size
+    # the last min_size intervals of [0] + rpeak_temp1 sum up to the distance between their end points
+    if len(rpeak_temp1) < min_size:
+        return rr_ave
+    first = rpeak_temp1[-min_size - 1] if len(rpeak_temp1) > min_size else 0
+    return (rpeak_temp1[-1] - first) / min_size
 
 
 def compute_moving_window_int(sample: np.ndarray,
@@ -170,6 +174,25 @@ def check_peak(data: List[DataPoint]) -> bool:
     return True
 
 
+def find_simple_peaks(y: np.ndarray) -> np.ndarray:
+    """
+    Locations i in [2, len(y) - 2] where check_peak(y[i - 2:i + 3]) holds, with array comparisons: y strictly rises
+    over the two samples before i and strictly falls over the (up to) two samples after it
+    :param y: signal array
+    :return: int64 array of the peak locations
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) < 4:
+        return np.empty(0, dtype=np.int64)
+    rising = y[:-1] < y[1:]
+    falling = y[:-1] > y[1:]
+    # candidates i = 2 .. len(y) - 2
+    peak = rising[:-2] & rising[1:-1] & falling[2:]
+    # the falling check of i + 1, the window of the last candidate stops at len(y)
+    peak[:-1] &= falling[3:]
+    return np.flatnonzero(peak) + 2
+
+
 # TODO: CODE_REVIEW: Justify in the method documentation string the justification of the default values
 # TODO: CODE_REVIEW: Make hard-coded constants default method parameter
 def compute_r_peaks(threshold_1: float,
@@ -190,8 +213,11 @@ def compute_r_peaks(threshold_1: float,
 
     """
 
-    peak_location_in_signal_array = [i[0] for i in peak_tuple_array]  # location of the simple peaks in signal array
-    amplitude_in_peak_locations = [i[1] for i in peak_tuple_array]  # simple peak's amplitude in signal array
+    peak_location_in_signal_array = [int(i[0]) for i in peak_tuple_array]  # location of the simple peaks in signal array
+    amplitude_in_peak_locations = np.array([i[1] for i in peak_tuple_array],
+                                           dtype=np.float64)  # simple peak's amplitude in signal array
+    # the moving window integration at the peaks, read once instead of indexing the signal per step
+    peak_signal = np.asarray(mov_win_int_signal)[peak_location_in_signal_array].tolist()
 
     threshold_2 = 0.5 * threshold_1  # any signal value between threshold_2 and threshold_1 is a noise peak
     sig_lev = 4 * threshold_1  # current signal level -any signal above thrice the signal level is discarded as a spurious value
@@ -206,22 +232,18 @@ def compute_r_peaks(threshold_1: float,
         if len(rpeak_array_indices) >= 1 and peak_location_in_signal_array[ind_rpeak] - peak_location_in_signal_array[
             rpeak_inds_in_peak_array[-1]] > 1.66 * rr_ave and ind_rpeak - rpeak_inds_in_peak_array[-1] > 1:
 
-            # values and indexes of previous peaks discarded as not an R peak whose magnitude is above threshold_2
-            searchback_array = [(k - rpeak_inds_in_peak_array[-1], amplitude_in_peak_locations[k]) for k in
-                                range(rpeak_inds_in_peak_array[-1] + 1, ind_rpeak) if
-                                3 * sig_lev > amplitude_in_peak_locations[k] > threshold_2]
+            # previous peaks discarded as not an R peak whose magnitude is above threshold_2
+            searchback_start = rpeak_inds_in_peak_array[-1] + 1
+            searchback_values = amplitude_in_peak_locations[searchback_start:ind_rpeak]
+            in_range = (3 * sig_lev > searchback_values) & (searchback_values > threshold_2)
 
-            if len(searchback_array) > 0:
+            if in_range.any():
                 # maximum inside the range calculated beforehand is taken as R peak
-                searchback_array_inrange_values = [x[1] for x in searchback_array]
-                searchback_max_index = np.argmax(searchback_array_inrange_values)
-                rpeak_array_indices.append(peak_location_in_signal_array[
-                                               rpeak_inds_in_peak_array[-1] + searchback_array[searchback_max_index][
-                                                   0]])
-                rpeak_inds_in_peak_array.append(
-                    rpeak_inds_in_peak_array[-1] + searchback_array[searchback_max_index][0])
-                sig_lev = ewma(sig_lev, mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]],
-                               .125)  # update the current signal level
+                searchback_max_index = searchback_start + int(
+                    np.argmax(np.where(in_range, searchback_values, -np.inf)))
+                rpeak_array_indices.append(peak_location_in_signal_array[searchback_max_index])
+                rpeak_inds_in_peak_array.append(searchback_max_index)
+                sig_lev = ewma(sig_lev, peak_signal[ind_rpeak], .125)  # update the current signal level
                 threshold_1 = noise_lev + 0.25 * (sig_lev - noise_lev)
                 threshold_2 = 0.5 * threshold_1
                 rr_ave = rr_interval_update(rpeak_array_indices, rr_ave)
@@ -232,15 +254,13 @@ def compute_r_peaks(threshold_1: float,
                 ind_rpeak += 1
         else:
             # R peak checking
-            if threshold_1 <= mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]] < 3 * sig_lev:
+            if threshold_1 <= peak_signal[ind_rpeak] < 3 * sig_lev:
                 rpeak_array_indices.append(peak_location_in_signal_array[ind_rpeak])
                 rpeak_inds_in_peak_array.append(ind_rpeak)
-                sig_lev = ewma(sig_lev, mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]],
-                               .125)  # update the signal level
+                sig_lev = ewma(sig_lev, peak_signal[ind_rpeak], .125)  # update the signal level
             # noise peak checking
-            elif threshold_1 > mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]] > threshold_2:
-                noise_lev = ewma(noise_lev, mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]],
-                                 .125)  # update the noise level
+            elif threshold_1 > peak_signal[ind_rpeak] > threshold_2:
+                noise_lev = ewma(noise_lev, peak_signal[ind_rpeak], .125)  # update the noise level
             threshold_1 = noise_lev + 0.25 * (sig_lev - noise_lev)
             threshold_2 = 0.5 * threshold_1
             ind_rpeak += 1
@@ -276,25 +296,18 @@ def remove_close_peaks(rpeak_temp1: list,
     :return: R peak array with no close R peaks
 
     """
-    difference = 0
-    rpeak_temp2 = rpeak_temp1
-    while difference != 1:
-        length_rpeak_temp2 = len(rpeak_temp2)
-        temp = np.diff(rpeak_temp2)
-        comp_index1 = [rpeak_temp2[i] for i in range(len(temp)) if temp[i] < min_range * fs]
-        comp_index2 = [rpeak_temp2[i + 1] for i in range(len(temp)) if temp[i] < min_range * fs]
-        comp1 = sample[comp_index1]
-        comp2 = sample[comp_index2]
-        checkmin = np.matrix([comp1, comp2])
-        temp_ind1 = [i for i in range(len(temp)) if temp[i] < min_range * fs]
-        temp_ind2 = np.argmin(np.array(checkmin), axis=0)
-        temp_ind = temp_ind1 + temp_ind2
-        temp_ind = np.unique(temp_ind)
-        count = 0
-        for i in temp_ind:
-            rpeak_temp2.remove(rpeak_temp2[i - count])
-            count = count + 1
-        difference = length_rpeak_temp2 - len(rpeak_temp2) + 1
+    rpeak_temp2 = np.asarray(rpeak_temp1, dtype=np.int64)
+    while len(rpeak_temp2) > 1:
+        # of every pair of consecutive peaks closer than min_range the one with the smaller sample is removed,
+        # all pairs at once, until no peaks are close
+        close = np.flatnonzero(np.diff(rpeak_temp2) < min_range * fs)
+        if len(close) == 0:
+            break
+        smaller = close + (sample[rpeak_temp2[close + 1]] < sample[rpeak_temp2[close]])
+        keep = np.ones(len(rpeak_temp2), dtype=bool)
+        keep[smaller] = False
+        rpeak_temp2 = rpeak_temp2[keep]
+    rpeak_temp2 = rpeak_temp2.tolist()
     return rpeak_temp2
 
 
@@ -315,15 +328,26 @@ def confirm_peaks(rpeak_temp1: list,
     :return: final R peak array
 
     """
-    for i in range(1, len(rpeak_temp1) - 1):
-        start_index = int(rpeak_temp1[i] - np.ceil(range_for_checking * fs))
-        end_index = int(rpeak_temp1[i] + np.ceil(range_for_checking * fs) + 1)
+    rpeak = np.array(rpeak_temp1, dtype=np.int64)
+    half_range = int(np.ceil(range_for_checking * fs))
+    inner = np.arange(1, len(rpeak) - 1)
+    # maxima of the ranges lying inside the sample array as rows of a strided view, the others one at a time
+    in_sample = (rpeak[inner] - half_range >= 0) & (rpeak[inner] + half_range + 1 <= len(sample))
+    sample = np.asarray(sample)
+    if in_sample.any() and len(sample) >= 2 * half_range + 1:
+        ranges = np.lib.stride_tricks.as_strided(sample, (len(sample) - 2 * half_range, 2 * half_range + 1),
+                                                 (sample.strides[0], sample.strides[0]), writeable=False)
+        peaks = inner[in_sample]
+        rpeak[peaks] = rpeak[peaks] - half_range + np.argmax(ranges[rpeak[peaks] - half_range], axis=1)
+    for i in inner[~in_sample]:
+        start_index = int(rpeak[i] - np.ceil(range_for_checking * fs))
+        end_index = int(rpeak[i] + np.ceil(range_for_checking * fs) + 1)
 
         index = np.argmax(sample[start_index:end_index])
 
-        rpeak_temp1[i] = rpeak_temp1[i] - np.ceil(range_for_checking * fs) + index
+        rpeak[i] = rpeak[i] - np.ceil(range_for_checking * fs) + index
 
-    return np.array(rpeak_temp1).astype(np.int64)
+    return rpeak
 
 
 # TODO: CODE_REVIEW: Make hard-coded constants default method parameter
@@ -344,36 +368,47 @@ def detect_rpeak(ecg: DataStream,
     3. adaptive thresholding with dynamic signal and noise thresholds applied to filter out the R peak locations
     4. confirm the R peaks through differentiation from the nearby peaks and remove the false peaks
 
-    :param ecg: ecg array of tuples (timestamp,value)
+    :param ecg: ecg array of tuples (timestamp,value), or TimeSeries
     :param fs: sampling frequency
     :param threshold: initial threshold to detect the R peak in a signal normalized by the 90th percentile. .5 is default.
     :param blackman_win_len_range : the range to calculate blackman window length
 
-    :return: R peak array of tuples (timestamp, Rpeak interval)
+    :return: R peak array of tuples (timestamp, Rpeak interval), TimeSeries of the Rpeak intervals for a TimeSeries
     """
 
-    data = ecg.data
-    result = DataStream.from_datastream([ecg])
-    if len(data) == 0:
-        result.data = []
-        return result
-    sample = np.array([i.sample for i in data])
-    timestamp = np.array([i.start_time for i in data])
+    if isinstance(ecg, TimeSeries):
+        if len(ecg) == 0:
+            return ecg
+        sample = ecg.values
+    else:
+        data = ecg.data
+        result = DataStream.from_datastream([ecg])
+        if len(data) == 0:
+            result.data = []
+            return result
+        sample = np.array([i.sample for i in data])
+        timestamp = np.array([i.start_time for i in data])
 
     # computes the moving window integration of the signal
     blackman_win_len = np.ceil(fs * blackman_win_len_range)
     y = compute_moving_window_int(sample, fs, blackman_win_len)
 
-    peak_location_values = [(i, y[i]) for i in range(2, len(y) - 1) if check_peak(y[i - 2:i + 3])]
+    peak_location = find_simple_peaks(y)
+    peak_location_values = list(zip(peak_location.tolist(), y[peak_location].tolist()))
 
     # initial RR interval average
-    peak_location = [i[0] for i in peak_location_values]
     running_rr_avg = sum(np.diff(peak_location)) / (len(peak_location) - 1)
 
     rpeak_temp1 = compute_r_peaks(threshold, running_rr_avg, y, peak_location_values)
     rpeak_temp2 = remove_close_peaks(rpeak_temp1, sample, fs)
     index = confirm_peaks(rpeak_temp2, sample, fs)
 
+    if isinstance(ecg, TimeSeries):
+        # same seconds as the timedelta path
+        rpeak_value = np.diff(ecg.timestamps[index])
+        return TimeSeries(ecg.timestamps[index][1:], rpeak_value // 1000000 % 86400 + rpeak_value % 1000000 / 1e6,
+                          tz=ecg.tz)
+
     rpeak_timestamp = timestamp[index]
     rpeak_value = np.diff(rpeak_timestamp)
     rpeak_timestamp = rpeak_timestamp[1:]
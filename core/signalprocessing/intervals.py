@@ -0,0 +1,195 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.signalprocessing.timeseries import to_microseconds
+
+
+def _as_microseconds(times) -> np.ndarray:
+    """
+    int64 epoch microseconds of a datetime, a microsecond count or a
+    sequence of either
+    """
+    if isinstance(times, datetime):
+        return np.int64(to_microseconds(times))
+    if isinstance(times, (list, tuple)):
+        return np.array([to_microseconds(t) if isinstance(t, datetime) else t
+                         for t in times], dtype=np.int64)
+    return np.asarray(times, dtype=np.int64)
+
+
+class IntervalIndex(object):
+    """
+    Index of the closed intervals [start, end] of a list of items, kept as
+    start sorted int64 epoch microseconds, answering the time range queries
+    of the feature code with np.searchsorted instead of scans of the list:
+
+    * starting_within: items starting in a time range
+    * containing: items whose interval contains a time
+    * touching: items containing the start or the end of a time range
+    * overlapping: items whose interval overlaps a time range
+    * count_starting_within and sum_starting_within: per range aggregates
+      of a batch of time ranges
+
+    Candidate intervals for containing and touching are bounded by the
+    longest interval, so a query over a day of short windows costs a binary
+    search and a look at the few intervals near the time.
+
+    Results are positions in the indexed list, in list order.
+    """
+
+    def __init__(self, starts, ends=None):
+        """
+        :param starts: epoch microseconds of the starts of the intervals
+        :param ends: epoch microseconds of the ends of the intervals, the
+                     starts when the items are points
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = starts if ends is None else np.asarray(ends, dtype=np.int64)
+        # stable, items with equal starts stay in list order
+        self.order = np.argsort(starts, kind='mergesort')
+        self.starts = starts[self.order]
+        self.ends = ends[self.order]
+        self.max_duration = int((self.ends - self.starts).max()) \
+            if len(self.starts) else 0
+
+    @classmethod
+    def from_datapoints(cls, data: List[DataPoint], end_times: list = None):
+        """
+        Index of the [start_time, end_time] intervals of DataPoints. Points
+        without end time are indexed as points; points without start time
+        are left out, they match no query.
+
+        :param List(DataPoint) data:
+        :param list end_times: end times to index instead of the end times
+                               of the points
+        :return: IntervalIndex with positions in data
+        """
+        if end_times is None:
+            end_times = [dp.end_time for dp in data]
+        positions = []
+        starts = []
+        ends = []
+        for i, dp in enumerate(data):
+            if dp.start_time is None:
+                continue
+            start = to_microseconds(dp.start_time)
+            end = end_times[i]
+            positions.append(i)
+            starts.append(start)
+            ends.append(start if end is None else to_microseconds(end))
+        index = cls(starts, ends)
+        index.order = np.asarray(positions, dtype=np.int64)[index.order]
+        return index
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _positions(self, sorted_positions) -> np.ndarray:
+        """
+        list positions of sorted positions, in list order
+        """
+        return np.sort(self.order[sorted_positions])
+
+    def starting_ranges(self, starts, ends) -> tuple:
+        """
+        Slices of the sorted intervals starting within the time ranges
+
+        :param starts: start of the ranges, included
+        :param ends: end of the ranges, included
+        :return: arrays of the first and past the last sorted position of
+                 every range
+        """
+        first = np.searchsorted(self.starts, _as_microseconds(starts), 'left')
+        last = np.searchsorted(self.starts, _as_microseconds(ends), 'right')
+        return first, np.maximum(first, last)
+
+    def starting_within(self, start, end) -> np.ndarray:
+        """
+        :return: positions of the items starting in [start, end]
+        """
+        first, last = self.starting_ranges(start, end)
+        return self._positions(np.arange(first, last))
+
+    def count_starting_within(self, starts, ends) -> np.ndarray:
+        """
+        :return: number of items starting in every [start, end] range
+        """
+        first, last = self.starting_ranges(starts, ends)
+        return last - first
+
+    def sum_starting_within(self, values, starts, ends) -> np.ndarray:
+        """
+        Sum of the values of the items starting in every [start, end] range
+
+        :param values: one value per indexed item, in list order
+        :return: float array of one sum per range
+        """
+        values = np.asarray(values, dtype=np.float64)[self.order]
+        prefix = np.concatenate([[0.0], np.cumsum(values)])
+        first, last = self.starting_ranges(starts, ends)
+        return prefix[last] - prefix[first]
+
+    def _containing(self, time: np.int64) -> np.ndarray:
+        """
+        sorted positions of the intervals containing time
+        """
+        first = np.searchsorted(self.starts, time - self.max_duration, 'left')
+        last = np.searchsorted(self.starts, time, 'right')
+        return first + np.flatnonzero(self.ends[first:last] >= time)
+
+    def containing(self, time) -> np.ndarray:
+        """
+        :return: positions of the items with start <= time <= end
+        """
+        return self._positions(self._containing(_as_microseconds(time)))
+
+    def touching(self, start, end) -> np.ndarray:
+        """
+        Items containing the start or the end of a range, the matches of
+        context.util.in_time_range; items lying strictly inside the range
+        do not match.
+
+        :return: positions of the items
+        """
+        return self._positions(np.union1d(
+            self._containing(_as_microseconds(start)),
+            self._containing(_as_microseconds(end))).astype(np.int64))
+
+    def overlapping(self, start, end) -> np.ndarray:
+        """
+        :return: positions of the items with start <= range end and
+                 end >= range start
+        """
+        start = _as_microseconds(start)
+        end = _as_microseconds(end)
+        first = np.searchsorted(self.starts, start - self.max_duration,
+                                'left')
+        last = np.searchsorted(self.starts, end, 'right')
+        return self._positions(
+            first + np.flatnonzero(self.ends[first:last] >= start))
@@ -0,0 +1,235 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from typing import List
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.signalprocessing.timeseries import from_microseconds, \
+    to_microseconds
+
+# duration of the runs of points without end time
+NO_DURATION = -1
+
+
+class LabelStream(object):
+    """
+    Run-length encoded stream of labels, e.g. the 10 second activity or
+    posture windows: runs of consecutive points with the same label, offset
+    and duration, evenly spaced, are kept as one run of
+
+    * codes: uint8 index of the label in labels
+    * starts: int64 epoch microseconds of the start of the first point
+    * steps: microseconds between the starts of two points of the run
+    * counts: number of points of the run
+    * durations: microseconds from the start to the end of every point,
+      NO_DURATION for points without end time
+    * offsets: offset of the points
+
+    A day of 10 second windows shrinks to a few hundred runs, and counts or
+    time fractions of labels over time ranges are answered with binary
+    searches instead of scans of the DataPoints.
+    """
+
+    def __init__(self, labels: list, codes, starts, steps, counts,
+                 durations, offsets, tz=None):
+        self.labels = list(labels)
+        self.codes = np.asarray(codes, dtype=np.uint8)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.steps = np.asarray(steps, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.durations = np.asarray(durations, dtype=np.int64)
+        self.offsets = list(offsets)
+        self.tz = tz
+        self._code_of = {label: code for code, label in enumerate(labels)}
+        # points, and covered microseconds, before every run, per label
+        point_counts = np.zeros((len(self.labels), len(self.codes)))
+        lengths = np.zeros((len(self.labels), len(self.codes)))
+        point_counts[self.codes, np.arange(len(self.codes))] = self.counts
+        lengths[self.codes, np.arange(len(self.codes))] = \
+            self.counts * np.maximum(self.durations, 0)
+        self._points_before = np.hstack((np.zeros((len(self.labels), 1)),
+                                         np.cumsum(point_counts, axis=1)))
+        self._time_before = np.hstack((np.zeros((len(self.labels), 1)),
+                                       np.cumsum(lengths, axis=1)))
+
+    @classmethod
+    def from_datapoints(cls, data: List[DataPoint],
+                        labels: list = None) -> 'LabelStream':
+        """
+        :param list labels: label vocabulary, extended with the labels of
+            data not in it. Defaults to the labels of data in order of
+            appearance.
+        """
+        labels = list(labels or [])
+        code_of = {label: code for code, label in enumerate(labels)}
+        codes, starts, steps, counts, durations, offsets = \
+            [], [], [], [], [], []
+        tz = None
+        if data:
+            data = sorted(data, key=lambda dp: dp.start_time)
+            tz = data[0].start_time.tzinfo
+        for dp in data:
+            code = code_of.get(dp.sample)
+            if code is None:
+                code = code_of[dp.sample] = len(labels)
+                labels.append(dp.sample)
+            start = to_microseconds(dp.start_time)
+            duration = NO_DURATION if dp.end_time is None else \
+                to_microseconds(dp.end_time) - start
+            if codes and codes[-1] == code and \
+                    durations[-1] == duration and offsets[-1] == dp.offset:
+                step = start - (starts[-1] + (counts[-1] - 1) * steps[-1])
+                if counts[-1] == 1 and step > 0:
+                    steps[-1] = step
+                    counts[-1] = 2
+                    continue
+                if counts[-1] > 1 and step == steps[-1]:
+                    counts[-1] += 1
+                    continue
+            codes.append(code)
+            starts.append(start)
+            steps.append(0)
+            counts.append(1)
+            durations.append(duration)
+            offsets.append(dp.offset)
+        if len(labels) > 256:
+            raise ValueError('More than 256 labels')
+        return cls(labels, codes, starts, steps, counts, durations, offsets,
+                   tz)
+
+    def __len__(self):
+        """
+        :return: number of points
+        """
+        return int(self.counts.sum())
+
+    def _within(self, runs, timestamps):
+        # index of the last point of every run starting at or before the
+        # timestamp, and microseconds of the run covered before it
+        relative = np.maximum(timestamps - self.starts[runs], 0)
+        steps = np.maximum(self.steps[runs], 1)
+        points = np.minimum(relative // steps, self.counts[runs] - 1)
+        durations = np.maximum(self.durations[runs], 0)
+        covered = points * durations + \
+            np.clip(relative - points * steps, 0, durations)
+        return points, covered
+
+    def to_datapoints(self) -> List[DataPoint]:
+        data = []
+        for code, start, step, count, duration, offset in zip(
+                self.codes.tolist(), self.starts.tolist(),
+                self.steps.tolist(), self.counts.tolist(),
+                self.durations.tolist(), self.offsets):
+            label = self.labels[code]
+            for k in range(count):
+                point_start = start + k * step
+                end_time = None
+                if duration != NO_DURATION:
+                    end_time = from_microseconds(point_start + duration,
+                                                 self.tz)
+                data.append(DataPoint(start_time=from_microseconds(
+                    point_start, self.tz), end_time=end_time, offset=offset,
+                    sample=label))
+        return data
+
+    def label_at(self, timestamps) -> list:
+        """
+        :param timestamps: epoch microseconds
+        :return: label of the point covering every timestamp, None where no
+            point covers it
+        """
+        timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.int64))
+        if not len(self.codes):
+            return [None] * len(timestamps)
+        runs = np.searchsorted(self.starts, timestamps, 'right') - 1
+        valid = runs >= 0
+        runs = np.maximum(runs, 0)
+        points, _ = self._within(runs, timestamps)
+        point_starts = self.starts[runs] + points * self.steps[runs]
+        valid &= timestamps < point_starts + \
+            np.maximum(self.durations[runs], 0)
+        return [self.labels[self.codes[run]] if ok else None
+                for run, ok in zip(runs.tolist(), valid.tolist())]
+
+    def _codes(self, labels) -> list:
+        if labels is None:
+            return list(range(len(self.labels)))
+        if isinstance(labels, str):
+            labels = [labels]
+        return [self._code_of[label] for label in labels
+                if label in self._code_of]
+
+    def _points_upto(self, timestamps, codes) -> np.ndarray:
+        # points of the given labels starting at or before every timestamp
+        runs = np.searchsorted(self.starts, timestamps, 'right') - 1
+        before = np.maximum(runs, 0)
+        points, _ = self._within(before, timestamps)
+        partial = points + 1
+        partial = np.where(np.isin(self.codes[before], codes), partial, 0)
+        total = self._points_before[codes][:, before].sum(axis=0) + partial
+        return np.where(runs >= 0, total, 0)
+
+    def count(self, starts, ends, labels=None) -> np.ndarray:
+        """
+        :param starts: epoch microseconds of the start of every range
+        :param ends: epoch microseconds of the end of every range
+        :param labels: label or list of labels, all labels by default
+        :return: number of points of the labels starting within every
+            [start, end] range, bounds included
+        """
+        codes = self._codes(labels)
+        starts = np.atleast_1d(np.asarray(starts, dtype=np.int64))
+        ends = np.atleast_1d(np.asarray(ends, dtype=np.int64))
+        if not codes or not len(self.codes):
+            return np.zeros(len(starts), dtype=np.int64)
+        return (self._points_upto(ends, codes) -
+                self._points_upto(starts - 1, codes)).astype(np.int64)
+
+    def _time_upto(self, timestamps, codes) -> np.ndarray:
+        # microseconds covered by the given labels before every timestamp
+        runs = np.searchsorted(self.starts, timestamps, 'right') - 1
+        before = np.maximum(runs, 0)
+        _, partial = self._within(before, timestamps)
+        partial = np.where(np.isin(self.codes[before], codes), partial, 0)
+        total = self._time_before[codes][:, before].sum(axis=0) + partial
+        return np.where(runs >= 0, total, 0)
+
+    def fraction(self, starts, ends, labels) -> np.ndarray:
+        """
+        Fraction of every [start, end] range covered by points of the
+        labels. Points are assumed not to overlap.
+
+        :param starts: epoch microseconds of the start of every range
+        :param ends: epoch microseconds of the end of every range
+        :param labels: label or list of labels
+        """
+        codes = self._codes(labels)
+        starts = np.atleast_1d(np.asarray(starts, dtype=np.int64))
+        ends = np.atleast_1d(np.asarray(ends, dtype=np.int64))
+        if not codes or not len(self.codes):
+            return np.zeros(len(starts))
+        covered = self._time_upto(ends, codes) - \
+            self._time_upto(starts, codes)
+        return covered / np.maximum(ends - starts, 1)
@@ -0,0 +1,121 @@
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datastream import DataStream
+from core.signalprocessing.dataquality import classify_windows, \
+    compute_data_quality, compute_windows_data_quality, ecg_data_quality, \
+    rip_data_quality
+from core.signalprocessing.timeseries import TimeSeries
+from test_suite.benchmark.synthetic import ecg, rip
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+
+def reference_classify_data_points(samples, signal_type, threshold_slope,
+                                   outlier_threshold_high=.9769,
+                                   outlier_threshold_low=.004884,
+                                   adc_range=4095):
+    """
+    classify_data_points as a loop over the samples of a window, before it
+    was vectorized
+    """
+    no_of_outliers = 0
+    max_value = samples[0]
+    min_value = samples[0]
+    for i, sample in enumerate(samples):
+        previous = samples[(len(samples) - 1) if i == 0 else i - 1]
+        following = samples[0 if (i == len(samples) - 1) else i + 1]
+        stuck = (sample == previous) and (sample == following)
+        flip = abs(sample - previous) > outlier_threshold_high * adc_range or \
+            abs(sample - following) > outlier_threshold_high * adc_range
+        if signal_type:
+            disc = abs(sample - previous) > threshold_slope * adc_range and \
+                abs(sample - following) > threshold_slope * adc_range
+        else:
+            disc = abs(sample - previous) > threshold_slope * adc_range or \
+                abs(sample - following) > threshold_slope * adc_range
+        if disc or stuck or flip or \
+                sample >= outlier_threshold_high * adc_range or \
+                sample <= outlier_threshold_low * adc_range:
+            no_of_outliers += 1
+        else:
+            max_value = max(max_value, sample)
+            min_value = min(min_value, sample)
+    return no_of_outliers, max_value, min_value
+
+
+def noisy_windows(count=400, seed=24):
+    """
+    Windows of ADC samples, some flat, stuck, clipped or spiky
+    """
+    rng = np.random.RandomState(seed)
+    windows = []
+    for _ in range(count):
+        length = int(rng.randint(1, 130))
+        kind = rng.randint(5)
+        if kind == 0:
+            window = np.full(length, float(rng.randint(0, 4096)))
+        elif kind == 1:
+            window = rng.randint(0, 4096, length).astype(float)
+        elif kind == 2:
+            window = np.clip(2000 + rng.normal(0, 800, length), 0, 4095)
+        else:
+            window = 2000 + 500 * np.sin(np.arange(length) / 5.0)
+            window[rng.randint(0, length, 3)] = rng.choice([0, 4095, 3000])
+        windows.append(window.round().tolist())
+    return windows
+
+
+class TestDataQuality(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.windows = noisy_windows()
+        self.samples = [s for window in self.windows for s in window]
+        self.lengths = [len(window) for window in self.windows]
+
+    def test_classify_windows_matches_loop(self):
+        for signal_type, threshold_slope in [(True, .02443), (False, .0733)]:
+            no_of_outliers, max_value, min_value = classify_windows(
+                self.samples, self.lengths, signal_type, threshold_slope)
+            for i, window in enumerate(self.windows):
+                self.assertEqual(
+                    reference_classify_data_points(window, signal_type,
+                                                   threshold_slope),
+                    (no_of_outliers[i], max_value[i], min_value[i]))
+
+    def test_windows_quality_matches_sequential_quality(self):
+        for signal_type, band, slope in [(True, .01148, .02443),
+                                         (False, .0428, .0733)]:
+            range_memory = []
+            expected = []
+            for window in self.windows:
+                data = TimeSeries(np.arange(len(window)), window)
+                expected.append(compute_data_quality(
+                    data.to_datapoints(), range_memory, signal_type, band,
+                    slope))
+            self.assertEqual(expected, compute_windows_data_quality(
+                self.samples, self.lengths, signal_type, band, slope))
+
+    def test_timeseries_quality_matches_datastream_quality(self):
+        for quality, generate in [(ecg_data_quality, ecg),
+                                  (rip_data_quality, rip)]:
+            data = generate(START, 0.5)
+            for dp in data[2000:2600]:
+                dp.sample = 4095.0
+            datastream = DataStream(identifier=uuid.uuid4(),
+                                    owner=uuid.uuid4())
+            datastream.data = data
+            expected = quality(datastream).data
+            result = quality(TimeSeries.from_datapoints(data)).data
+            self.assertGreater(len(expected), 1)
+            self.assertEqual(
+                [(dp.start_time, dp.end_time, dp.sample) for dp in expected],
+                [(dp.start_time, dp.end_time, dp.sample) for dp in result])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datastream import DataStream
+from core.signalprocessing import ecg
+from core.signalprocessing.timeseries import TimeSeries
+from test_suite.benchmark.rpeak import REFERENCE, VECTORIZED, run_stages
+from test_suite.benchmark.synthetic import ECG_FREQUENCY
+from test_suite.benchmark.synthetic import ecg as synthetic_ecg
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+
+class TestRPeaks(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.data = synthetic_ecg(START, 0.25)
+        self.sample = np.array([dp.sample for dp in self.data])
+
+    def assertSameStages(self, sample):
+        y = ecg.compute_moving_window_int(sample, ECG_FREQUENCY,
+                                          np.ceil(ECG_FREQUENCY * 0.2))
+        _, expected = run_stages(sample, y, ECG_FREQUENCY, REFERENCE)
+        _, index = run_stages(sample, y, ECG_FREQUENCY, VECTORIZED)
+        self.assertGreater(len(expected), 0)
+        np.testing.assert_array_equal(expected, index)
+
+    def test_stages_match_loops(self):
+        self.assertSameStages(self.sample)
+
+    def test_stages_match_loops_on_spiky_signal(self):
+        rng = np.random.RandomState(25)
+        sample = self.sample.copy()
+        spikes = rng.randint(0, len(sample), 200)
+        sample[spikes] += rng.choice([-1500, 800, 3000], len(spikes))
+        sample[5000:5400] = sample[5000]
+        self.assertSameStages(sample)
+
+    def test_timeseries_rpeaks_match_datastream_rpeaks(self):
+        datastream = DataStream(identifier=uuid.uuid4(), owner=uuid.uuid4())
+        datastream.data = self.data
+        expected = ecg.detect_rpeak(datastream, ECG_FREQUENCY).data
+        result = ecg.detect_rpeak(TimeSeries.from_datapoints(self.data),
+                                  ECG_FREQUENCY).to_datapoints()
+        # about 70 beats per minute
+        self.assertGreater(len(expected), 0.25 * 60 * 60)
+        self.assertEqual([dp.start_time for dp in expected],
+                         [dp.start_time for dp in result])
+        np.testing.assert_allclose([dp.sample for dp in expected],
+                                   [dp.sample for dp in result])
+
+
+if __name__ == '__main__':
+    unittest.main()
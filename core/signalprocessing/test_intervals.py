@@ -0,0 +1,93 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.feature.context.util import data_in_time_range, in_time_range
+from core.signalprocessing.intervals import IntervalIndex
+from core.signalprocessing.timeseries import to_microseconds
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+
+def app_usages(count=500, seed=21):
+    """
+    Unsorted, possibly overlapping intervals of various lengths, some
+    without end time
+    """
+    rng = np.random.RandomState(seed)
+    data = []
+    for _ in range(count):
+        start = START + timedelta(seconds=int(rng.randint(0, 86400)))
+        end = None
+        if rng.uniform() > 0.05:
+            end = start + timedelta(seconds=int(rng.exponential(300)))
+        data.append(DataPoint(start_time=start, end_time=end,
+                              sample=int(rng.randint(1, 100))))
+    return data
+
+
+def random_ranges(count, seed=22):
+    rng = np.random.RandomState(seed)
+    ranges = []
+    for _ in range(count):
+        start = START + timedelta(seconds=int(rng.randint(-600, 87000)))
+        ranges.append((start,
+                       start + timedelta(seconds=int(rng.randint(0, 3600)))))
+    return ranges
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.data = app_usages()
+        self.index = IntervalIndex.from_datapoints(self.data)
+        self.ranges = random_ranges(300)
+
+    def test_touching_matches_in_time_range(self):
+        for start, end in self.ranges:
+            expected = [dp for dp in self.data
+                        if in_time_range(dp.start_time, dp.end_time, start,
+                                         end)]
+            self.assertEqual(expected, data_in_time_range(self.data, start,
+                                                          end, self.index))
+
+    def test_starting_within_matches_scan(self):
+        for start, end in self.ranges:
+            expected = [i for i, dp in enumerate(self.data)
+                        if start <= dp.start_time <= end]
+            self.assertEqual(expected,
+                             self.index.starting_within(start, end).tolist())
+
+    def test_overlapping_matches_scan(self):
+        for start, end in self.ranges:
+            expected = [i for i, dp in enumerate(self.data)
+                        if dp.start_time <= end and
+                        (dp.end_time or dp.start_time) >= start]
+            self.assertEqual(expected,
+                             self.index.overlapping(start, end).tolist())
+
+    def test_containing_matches_scan(self):
+        for time, _ in self.ranges:
+            expected = [i for i, dp in enumerate(self.data)
+                        if dp.start_time <= time <=
+                        (dp.end_time or dp.start_time)]
+            self.assertEqual(expected, self.index.containing(time).tolist())
+
+    def test_range_aggregates_match_scan(self):
+        starts = [to_microseconds(start) for start, _ in self.ranges]
+        ends = [to_microseconds(end) for _, end in self.ranges]
+        counts = self.index.count_starting_within(starts, ends)
+        sums = self.index.sum_starting_within([dp.sample for dp in self.data],
+                                              starts, ends)
+        for (start, end), count, total in zip(self.ranges, counts, sums):
+            inside = [dp.sample for dp in self.data
+                      if start <= dp.start_time <= end]
+            self.assertEqual(len(inside), count)
+            self.assertEqual(sum(inside), total)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.signalprocessing.labels import LabelStream
+from core.signalprocessing.timeseries import to_microseconds
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+LABELS = ['STATIONARY', 'WALKING', 'MOD', 'HIGH']
+
+
+def activity_windows(count=2000, seed=20):
+    """
+    10 second activity windows in bouts of the same label, with a few gaps
+    and an irregular window
+    """
+    rng = np.random.RandomState(seed)
+    data = []
+    start = START
+    label = 'STATIONARY'
+    for i in range(count):
+        if rng.uniform() < 0.1:
+            label = LABELS[rng.randint(len(LABELS))]
+        if rng.uniform() < 0.02:
+            start += timedelta(seconds=int(rng.randint(1, 600)))
+        duration = timedelta(seconds=10 if rng.uniform() > 0.01 else 7)
+        data.append(DataPoint(start_time=start, end_time=start + duration,
+                              offset=-18000000, sample=label))
+        start += duration
+    return data
+
+
+def random_ranges(data, count, seed=21):
+    rng = np.random.RandomState(seed)
+    first = to_microseconds(data[0].start_time) - 60000000
+    last = to_microseconds(data[-1].end_time) + 60000000
+    starts = rng.randint(first, last, count).astype(np.int64)
+    ends = starts + rng.randint(0, 3600000000, count)
+    return starts, ends
+
+
+class TestLabelStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.data = activity_windows()
+        self.labels = LabelStream.from_datapoints(self.data)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.data), len(self.labels))
+        self.assertLess(len(self.labels.codes), len(self.data))
+        for expected, dp in zip(self.data, self.labels.to_datapoints()):
+            self.assertEqual(expected.start_time, dp.start_time)
+            self.assertEqual(expected.end_time, dp.end_time)
+            self.assertEqual(expected.offset, dp.offset)
+            self.assertEqual(expected.sample, dp.sample)
+
+    def test_count_matches_scan(self):
+        starts, ends = random_ranges(self.data, 300)
+        for labels in [None, 'WALKING', ['WALKING', 'MOD', 'HIGH'], 'RUN']:
+            counts = self.labels.count(starts, ends, labels)
+            for start, end, count in zip(starts, ends, counts):
+                expected = [dp.sample for dp in self.data
+                            if start <= to_microseconds(dp.start_time) <= end]
+                if labels is not None:
+                    wanted = [labels] if isinstance(labels, str) else labels
+                    expected = [s for s in expected if s in wanted]
+                self.assertEqual(len(expected), count)
+
+    def test_fraction_matches_scan(self):
+        starts, ends = random_ranges(self.data, 200)
+        fractions = self.labels.fraction(starts, ends, 'WALKING')
+        for start, end, fraction in zip(starts, ends, fractions):
+            covered = 0
+            for dp in self.data:
+                if dp.sample != 'WALKING':
+                    continue
+                lo = max(start, to_microseconds(dp.start_time))
+                hi = min(end, to_microseconds(dp.end_time))
+                covered += max(hi - lo, 0)
+            self.assertAlmostEqual(covered / max(end - start, 1), fraction)
+
+    def test_label_at_matches_scan(self):
+        starts, _ = random_ranges(self.data, 300)
+        for time, label in zip(starts, self.labels.label_at(starts)):
+            expected = [dp.sample for dp in self.data
+                        if to_microseconds(dp.start_time) <= time <
+                        to_microseconds(dp.end_time)]
+            self.assertEqual(expected[0] if expected else None, label)
+
+    def test_empty(self):
+        labels = LabelStream.from_datapoints([])
+        self.assertEqual(0, len(labels))
+        self.assertEqual([0], labels.count([0], [1]).tolist())
+        self.assertEqual([None], labels.label_at([0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.signalprocessing.timeseries import TimeSeries, from_microseconds, \
+    parse_samples, to_microseconds
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+
+def datapoints(count, step_ms=40, width=None, end_ms=None):
+    rng = np.random.RandomState(17)
+    data = []
+    for i in range(count):
+        start_time = START + timedelta(milliseconds=step_ms * i,
+                                       microseconds=int(rng.randint(0, 1000)))
+        end_time = None
+        if end_ms is not None and i % 3:
+            end_time = start_time + timedelta(milliseconds=end_ms)
+        sample = rng.uniform(0, 4095) if width is None else \
+            rng.uniform(-1, 1, width).tolist()
+        data.append(DataPoint(start_time=start_time, end_time=end_time,
+                              offset=-18000000, sample=sample))
+    return data
+
+
+class TestTimeSeries(unittest.TestCase):
+
+    def test_microseconds_round_trip(self):
+        for dp in datapoints(100):
+            us = to_microseconds(dp.start_time)
+            self.assertEqual(dp.start_time, from_microseconds(us, timezone.utc))
+
+    def test_microseconds_of_local_and_naive_times(self):
+        local = timezone(timedelta(hours=-5))
+        for dp in datapoints(100):
+            expected = int(dp.start_time.replace(microsecond=0).timestamp()) \
+                * 1000000 + dp.start_time.microsecond
+            naive = dp.start_time.astimezone().replace(tzinfo=None)
+            self.assertEqual(expected,
+                             to_microseconds(dp.start_time.astimezone(local)))
+            self.assertEqual(expected, to_microseconds(naive))
+            self.assertEqual(naive, from_microseconds(expected))
+
+    def test_scalar_round_trip(self):
+        data = datapoints(500, end_ms=30)
+        ts = TimeSeries.from_datapoints(data)
+        self.assertEqual(len(data), len(ts))
+        self.assertTrue(ts.scalar)
+        for expected, dp in zip(data, ts.to_datapoints()):
+            self.assertEqual(expected.start_time, dp.start_time)
+            self.assertEqual(expected.end_time, dp.end_time)
+            self.assertEqual(expected.offset, dp.offset)
+            self.assertEqual(expected.sample, dp.sample)
+
+    def test_vector_round_trip(self):
+        data = datapoints(200, width=3)
+        ts = TimeSeries.from_datapoints(data)
+        self.assertFalse(ts.scalar)
+        self.assertEqual((200, 3), ts.values.shape)
+        for expected, dp in zip(data, ts.to_datapoints()):
+            self.assertEqual(expected.sample, dp.sample)
+
+    def test_slices_are_views(self):
+        ts = TimeSeries.from_datapoints(datapoints(100))
+        view = ts[10:20]
+        self.assertEqual(10, len(view))
+        self.assertTrue(np.shares_memory(view.samples, ts.samples))
+        self.assertTrue(np.shares_memory(view.timestamps, ts.timestamps))
+
+    def test_slice_time_matches_scan(self):
+        data = datapoints(300)
+        ts = TimeSeries.from_datapoints(data)
+        start = to_microseconds(data[50].start_time)
+        end = to_microseconds(data[120].start_time) + 1
+        expected = [dp.sample for dp in data
+                    if start <= to_microseconds(dp.start_time) <= end]
+        self.assertEqual(expected, ts.slice_time(start, end).values.tolist())
+
+    def test_concatenate_and_sort(self):
+        data = datapoints(100)
+        ts = TimeSeries.concatenate([TimeSeries.from_datapoints(data[50:]),
+                                     TimeSeries.from_datapoints(data[:50])])
+        self.assertEqual([dp.sample for dp in data],
+                         ts.sort().values.tolist())
+
+    def test_parse_samples_drops_malformed_samples(self):
+        samples = ['1,2,3', [4, 5, 6], '7,8', 'a,b,c', (9, 10, 11), 12]
+        matrix, kept = parse_samples(samples, 3)
+        self.assertEqual([0, 1, 4], kept)
+        self.assertEqual([[1, 2, 3], [4, 5, 6], [9, 10, 11]], matrix.tolist())
+
+    def test_from_datapoints_with_width(self):
+        data = datapoints(10, width=20)
+        data[3].sample = data[3].sample[:19]
+        data[5].sample = ','.join(str(v) for v in data[5].sample)
+        ts = TimeSeries.from_datapoints(data, width=20)
+        self.assertEqual(9, len(ts))
+        np.testing.assert_allclose(
+            [float(v) for v in data[5].sample.split(',')], ts.samples[4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.signalprocessing.timeseries import TimeSeries, to_microseconds
+from core.signalprocessing.window import epoch_align, epoch_align_us, \
+    merge_consective_windows, merge_window_stream, window_sliding, \
+    window_stream
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+# (window_size, window_offset) pairs, including offsets not representable
+# exactly as floats
+WINDOWS = [(10, 10), (3, 1), (2.1, 0.7), (1, 1 / 3), (60, 60)]
+
+
+def irregular_datapoints(count=3000, seed=22):
+    """
+    25 Hz points with jitter and a few gaps
+    """
+    rng = np.random.RandomState(seed)
+    data = []
+    start = to_microseconds(START)
+    for _ in range(count):
+        start += 40000 + int(rng.randint(0, 3000))
+        if rng.uniform() < 0.005:
+            start += int(rng.randint(1, 120)) * 1000000
+        data.append(DataPoint(start_time=START + timedelta(
+            microseconds=start - to_microseconds(START)),
+            offset=-18000000, sample=float(rng.uniform(0, 4095))))
+    return data
+
+
+def reference_merge_consective_windows(data: OrderedDict) -> list:
+    """
+    merge_consective_windows before it became a wrapper of
+    merge_window_stream
+    """
+    merged_windows = []
+    element = None
+    start = None
+    end = None
+    val = None
+    if data:
+        for key, val in data.items():
+            if element is None:
+                element = val
+                start = key[0]
+                end = key[1]
+            elif element == val and (end == key[0]):
+                element = val
+                end = key[1]
+            else:
+                merged_windows.append(DataPoint(start_time=start, end_time=end,
+                                                sample=element))
+                element = val
+                start = key[0]
+                end = key[1]
+        if val is not None:
+            merged_windows.append(DataPoint(start_time=start, end_time=end,
+                                            sample=val))
+    return merged_windows
+
+
+class TestWindow(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.data = irregular_datapoints()
+        self.timeseries = TimeSeries.from_datapoints(self.data)
+
+    def assertSameWindows(self, expected, windows):
+        self.assertEqual(list(expected.keys()), list(windows.keys()))
+        for key, data in expected.items():
+            self.assertEqual([dp.sample for dp in data],
+                             [dp.sample for dp in windows[key]])
+
+    def test_epoch_align_us_matches_epoch_align(self):
+        for _, offset in WINDOWS:
+            for dp in self.data[::7]:
+                self.assertEqual(
+                    to_microseconds(epoch_align(dp.start_time, offset)),
+                    epoch_align_us(to_microseconds(dp.start_time), offset))
+
+    def test_timeseries_windows_match_list_windows(self):
+        for window_size, window_offset in WINDOWS:
+            for all_windows in [False, True]:
+                expected = window_sliding(self.data, window_size,
+                                          window_offset, all_windows)
+                windows = window_sliding(self.timeseries, window_size,
+                                         window_offset, all_windows)
+                self.assertSameWindows(expected, OrderedDict(
+                    (key, data.to_datapoints())
+                    for key, data in windows.items()))
+
+    def test_window_stream_matches_window_sliding(self):
+        chunks = [self.data[i:i + 257] for i in range(0, len(self.data), 257)]
+        for window_size, window_offset in WINDOWS:
+            for all_windows in [False, True]:
+                expected = window_sliding(self.data, window_size,
+                                          window_offset, all_windows)
+                windows = OrderedDict(window_stream(iter(chunks), window_size,
+                                                    window_offset,
+                                                    all_windows))
+                self.assertSameWindows(expected, windows)
+
+    def test_window_stream_rejects_size_below_offset(self):
+        with self.assertRaises(ValueError):
+            list(window_stream([self.data], 1, 2))
+
+    def test_merge_matches_reference(self):
+        windows = window_sliding(self.data, 10, 10, all_windows=True)
+        labels = OrderedDict((key, 'LOW' if not data or
+                              np.mean([dp.sample for dp in data]) < 2048
+                              else 'HIGH')
+                             for key, data in windows.items())
+        expected = reference_merge_consective_windows(labels)
+        for merged in [merge_consective_windows(labels),
+                       list(merge_window_stream(iter(labels.items())))]:
+            self.assertEqual(
+                [(dp.start_time, dp.end_time, dp.sample) for dp in expected],
+                [(dp.start_time, dp.end_time, dp.sample) for dp in merged])
+
+
+if __name__ == '__main__':
+    unittest.main()
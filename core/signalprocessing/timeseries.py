@@ -0,0 +1,315 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from cerebralcortex.core.datatypes.datastream import DataStream
+
+# end_timestamps entry of the points without an end time
+NO_END_TIME = np.iinfo(np.int64).min
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_microseconds(ts: datetime) -> int:
+    """
+    Exact epoch microseconds of a datetime. Naive datetimes are taken in
+    local time, as datetime.timestamp does.
+    """
+    if ts.tzinfo is None:
+        # a float timestamp is within a fraction of a microsecond until 2255
+        return int(round(ts.timestamp() * 1e6))
+    return (ts - _EPOCH) // _MICROSECOND
+
+
+def from_microseconds(us: int, tz=None) -> datetime:
+    """
+    Inverse of to_microseconds: a datetime in timezone tz, naive local time
+    without tz.
+    """
+    us = int(us)
+    if tz is None:
+        return datetime.fromtimestamp(us // 1000000).replace(
+            microsecond=us % 1000000)
+    return (_EPOCH + timedelta(microseconds=us)).astimezone(tz)
+
+
+class TimeSeries(object):
+    """
+    Columnar time series, the array counterpart of List[DataPoint]:
+
+    * timestamps: int64 epoch microseconds of the start times
+    * samples: contiguous float matrix of one row per point
+    * offsets: int64 offsets of the points, None when they have none
+    * end_timestamps: int64 epoch microseconds of the end times,
+      NO_END_TIME for points without one, None when no point has one
+
+    Slicing a TimeSeries with a slice returns a view sharing its columns.
+    The signalprocessing functions accepting a TimeSeries return one, so a
+    stream is converted from and to DataPoints only once at the ends of a
+    pipeline.
+    """
+
+    def __init__(self, timestamps, samples, offsets=None,
+                 end_timestamps=None, scalar: bool = None, tz=None):
+        """
+        :param timestamps: epoch microseconds, sorted
+        :param samples: one sample (scalar) or sample row (vector) per point
+        :param bool scalar: samples are scalars rather than rows, defaults to
+            True for one dimensional samples
+        :param tz: tzinfo of the datetimes returned by to_datapoints
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        samples = np.asarray(samples)
+        if scalar is None:
+            scalar = samples.ndim == 1
+        if samples.ndim == 1:
+            samples = samples.reshape(-1, 1)
+        if samples.dtype.kind not in 'fc':
+            samples = samples.astype(np.float64)
+        self.samples = np.ascontiguousarray(samples)
+        self.offsets = None if offsets is None else \
+            np.asarray(offsets, dtype=np.int64)
+        self.end_timestamps = None if end_timestamps is None else \
+            np.asarray(end_timestamps, dtype=np.int64)
+        self.scalar = scalar
+        self.tz = tz
+        if len(self.samples) != len(self.timestamps):
+            raise ValueError('%d samples for %d timestamps' %
+                             (len(self.samples), len(self.timestamps)))
+
+    @classmethod
+    def from_datapoints(cls, data: List[DataPoint], dtype=np.float64,
+                        width: int = None) -> 'TimeSeries':
+        """
+        :param dtype: float type of the samples, float32 halves the memory of
+            the sample matrix
+        :param int width: number of values of the samples. Samples can be
+            numbers, lists or comma separated strings of numbers, the points
+            whose samples do not have width values are dropped.
+        :raises ValueError: without width, when the samples are not numbers
+            or rows of the same length
+        """
+        if width is not None:
+            samples, kept = parse_samples([dp.sample for dp in data], width,
+                                          dtype)
+            if kept is not None:
+                data = [data[i] for i in kept]
+        if not data:
+            return cls.empty(width or 1)
+        timestamps = np.fromiter((to_microseconds(dp.start_time)
+                                  for dp in data), np.int64, len(data))
+        if width is None:
+            samples = np.array([dp.sample for dp in data], dtype=dtype)
+        offsets = None
+        if any(dp.offset is not None for dp in data):
+            offsets = np.fromiter((int(dp.offset or 0) for dp in data),
+                                  np.int64, len(data))
+        end_timestamps = None
+        if any(dp.end_time is not None for dp in data):
+            end_timestamps = np.fromiter(
+                (NO_END_TIME if dp.end_time is None else
+                 to_microseconds(dp.end_time) for dp in data),
+                np.int64, len(data))
+        return cls(timestamps, samples, offsets, end_timestamps,
+                   tz=data[0].start_time.tzinfo)
+
+    @classmethod
+    def from_datastream(cls, datastream: DataStream,
+                        dtype=np.float64) -> 'TimeSeries':
+        if isinstance(datastream.data, TimeSeries):
+            return datastream.data
+        return cls.from_datapoints(datastream.data, dtype)
+
+    @classmethod
+    def empty(cls, columns: int = 1) -> 'TimeSeries':
+        return cls(np.empty(0, np.int64), np.empty((0, columns)),
+                   scalar=columns == 1)
+
+    @classmethod
+    def concatenate(cls, series: List['TimeSeries']) -> 'TimeSeries':
+        """
+        :return: the points of all the series, in the given order
+        """
+        series = [ts for ts in series if len(ts)]
+        if not series:
+            return cls.empty()
+        if len(series) == 1:
+            return series[0]
+        offsets = None
+        if any(ts.offsets is not None for ts in series):
+            offsets = np.concatenate([np.zeros(len(ts), np.int64)
+                                      if ts.offsets is None else ts.offsets
+                                      for ts in series])
+        end_timestamps = None
+        if any(ts.end_timestamps is not None for ts in series):
+            end_timestamps = np.concatenate(
+                [np.full(len(ts), NO_END_TIME, np.int64)
+                 if ts.end_timestamps is None else ts.end_timestamps
+                 for ts in series])
+        return cls(np.concatenate([ts.timestamps for ts in series]),
+                   np.concatenate([ts.samples for ts in series]), offsets,
+                   end_timestamps, series[0].scalar, series[0].tz)
+
+    def sort(self) -> 'TimeSeries':
+        """
+        :return: the points sorted by start time, self when they already are
+        """
+        if len(self) < 2 or np.all(np.diff(self.timestamps) >= 0):
+            return self
+        return self._select(np.argsort(self.timestamps, kind='mergesort'))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index) -> 'TimeSeries':
+        """
+        :param index: slice (a view), boolean mask or integer index array,
+            or an integer for the one point TimeSeries at that index
+        :raises IndexError: for an integer index out of range
+        """
+        if isinstance(index, (int, np.integer)):
+            if not -len(self) <= index < len(self):
+                raise IndexError('TimeSeries index %d out of range for %d '
+                                 'points' % (index, len(self)))
+            index = index % len(self)
+            index = slice(index, index + 1)
+        return self._select(index)
+
+    def __iter__(self):
+        """
+        Iterates over the points as DataPoints.
+        """
+        return iter(self.to_datapoints())
+
+    def _select(self, index) -> 'TimeSeries':
+        return TimeSeries(self.timestamps[index], self.samples[index],
+                          None if self.offsets is None else
+                          self.offsets[index],
+                          None if self.end_timestamps is None else
+                          self.end_timestamps[index],
+                          self.scalar, self.tz)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        Samples as a vector for scalar samples, as the sample matrix
+        otherwise.
+        """
+        return self.samples[:, 0] if self.scalar else self.samples
+
+    def with_samples(self, samples, scalar: bool = None) -> 'TimeSeries':
+        """
+        :return: a TimeSeries of the same points with other samples
+        """
+        return TimeSeries(self.timestamps, samples, self.offsets,
+                          self.end_timestamps, scalar, self.tz)
+
+    def slice_time(self, start_us: int, end_us: int) -> 'TimeSeries':
+        """
+        :return: view of the points with start_us <= timestamp <= end_us
+        """
+        lo = np.searchsorted(self.timestamps, start_us, 'left')
+        hi = np.searchsorted(self.timestamps, end_us, 'right')
+        return self[lo:hi]
+
+    def start_times(self) -> List[datetime]:
+        return [from_microseconds(us, self.tz) for us in self.timestamps]
+
+    def to_datapoints(self) -> List[DataPoint]:
+        samples = self.values.tolist()
+        offsets = [None] * len(self) if self.offsets is None else \
+            self.offsets.tolist()
+        end_times = [None] * len(self)
+        if self.end_timestamps is not None:
+            end_times = [None if us == NO_END_TIME else
+                         from_microseconds(us, self.tz)
+                         for us in self.end_timestamps.tolist()]
+        return [DataPoint(start_time=start_time, end_time=end_time,
+                          offset=offset, sample=sample)
+                for start_time, end_time, offset, sample in
+                zip(self.start_times(), end_times, offsets, samples)]
+
+    def to_datastream(self,
+                      input_streams: List[DataStream] = None) -> DataStream:
+        """
+        :return: DataStream of the points, derived from input_streams when
+            given
+        """
+        if input_streams:
+            result = DataStream.from_datastream(input_streams=input_streams)
+        else:
+            result = DataStream()
+        result.data = self.to_datapoints()
+        return result
+
+
+def parse_samples(samples: list, width: int, dtype=np.float64):
+    """
+    Converts samples made of width numbers, given as lists or comma separated
+    strings, to a matrix.
+
+    :return: (matrix of one row per kept sample, indices of the kept samples
+        or None when all were kept)
+    """
+    try:
+        matrix = np.array(samples, dtype=dtype)
+        if matrix.ndim == 1 and width == 1:
+            return matrix.reshape(-1, 1), None
+        if matrix.ndim == 2 and matrix.shape[1] == width:
+            return matrix, None
+    except (TypeError, ValueError):
+        pass
+    rows = []
+    kept = []
+    for index, sample in enumerate(samples):
+        if isinstance(sample, str):
+            sample = sample.split(',')
+        elif not isinstance(sample, (list, tuple, np.ndarray)):
+            sample = [sample]
+        if len(sample) != width:
+            continue
+        try:
+            rows.append(np.array(sample, dtype=dtype))
+        except (TypeError, ValueError):
+            continue
+        kept.append(index)
+    if not rows:
+        return np.empty((0, width), dtype), kept
+    return np.vstack(rows), kept
+
+
+def as_timeseries(data, dtype=np.float64) -> TimeSeries:
+    """
+    :param data: TimeSeries, DataStream or List[DataPoint]
+    """
+    if isinstance(data, TimeSeries):
+        return data
+    if isinstance(data, DataStream):
+        return TimeSeries.from_datastream(data, dtype)
+    return TimeSeries.from_datapoints(data, dtype)
@@ -30,14 +30,22 @@ from sklearn import preprocessing
 
 from cerebralcortex.core.datatypes.datapoint import DataPoint
 from cerebralcortex.core.datatypes.datastream import DataStream
+from core.signalprocessing.timeseries import TimeSeries
 
 
 def normalize(datastream: DataStream) -> DataStream:
     """
 
-    :param datastream:
-    :return:
+    :param datastream: DataStream or TimeSeries
+    :return: normalized DataStream, or TimeSeries for a TimeSeries
     """
+    if isinstance(datastream, TimeSeries):
+        if len(datastream) == 0:
+            return datastream
+        return datastream.with_samples(
+            preprocessing.normalize(datastream.samples, axis=0),
+            datastream.scalar)
+
     result = DataStream.from_datastream(input_streams=[datastream])
     if datastream.data is None or len(datastream.data) == 0:
         result.data = []
@@ -56,9 +64,12 @@ def normalize(datastream: DataStream) -> DataStream:
 def magnitude(datastream: DataStream) -> DataStream:
     """
 
-    :param datastream:
-    :return:
+    :param datastream: DataStream or TimeSeries
+    :return: DataStream of magnitudes, or TimeSeries for a TimeSeries
     """
+    if isinstance(datastream, TimeSeries):
+        return datastream.with_samples(norm(datastream.samples, axis=1))
+
     result = DataStream.from_datastream(input_streams=[datastream])
     if datastream.data is None or len(datastream.data) == 0:
         result.data = []
@@ -89,30 +100,38 @@ def smooth(data: List[DataPoint],
     http://stackoverflow.com/a/40443565
 
     :return: data_smooth
-    :param data:
+    :param data: List[DataPoint] or TimeSeries of scalar samples
     :param span:
     """
 
     if data is None or len(data) == 0:
-        return []
+        return [] if not isinstance(data, TimeSeries) else data
 
-    sample = [i.sample for i in data]
+    if isinstance(data, TimeSeries):
+        return data.with_samples(_smooth_samples(data.values, span))
+
+    sample_smooth = _smooth_samples([i.sample for i in data], span)
+
+    data_smooth = []
+
+    for i, item in enumerate(data):
+        dp = DataPoint.from_tuple(sample=sample_smooth[i], start_time=item.start_time, end_time=item.end_time)
+        data_smooth.append(dp)
+
+    return data_smooth
+
+
+def _smooth_samples(sample, span: int) -> np.ndarray:
     sample_middle = np.convolve(sample, np.ones(span, dtype=int), 'valid') / span
     divisor = np.arange(1, span - 1, 2)
     sample_start = np.cumsum(sample[:span - 1])[::2] / divisor
     sample_end = (np.cumsum(sample[:-span:-1])[::2] / divisor)[::-1]
     sample_smooth = np.concatenate((sample_start, sample_middle, sample_end))
 
-    data_smooth = []
-
-    if len(sample_smooth) == len(data):
-        for i, item in enumerate(data):
-            dp = DataPoint.from_tuple(sample=sample_smooth[i], start_time=item.start_time, end_time=item.end_time)
-            data_smooth.append(dp)
-    else:
+    if len(sample_smooth) != len(sample):
         raise Exception("Smoothed data length does not match with original data length.")
 
-    return data_smooth
+    return sample_smooth
 
 
 def moving_average_curve(data: List[DataPoint],
@@ -121,11 +140,21 @@ def moving_average_curve(data: List[DataPoint],
     Moving average curve from filtered (using moving average) samples.
 
     :return: mac
-    :param data:
+    :param data: List[DataPoint] or TimeSeries of scalar samples
     :param window_length:
     """
     if data is None or len(data) == 0:
-        return []
+        return [] if not isinstance(data, TimeSeries) else data
+
+    if isinstance(data, TimeSeries):
+        end = len(data) - (window_length + 1)
+        if end <= window_length:
+            return data[:0]
+        span = 2 * window_length + 1
+        cumsum = np.concatenate(([0.0], np.cumsum(data.values)))
+        mac = (cumsum[span:end + window_length + 1] -
+               cumsum[:end - window_length]) / span
+        return data[window_length:end].with_samples(mac)
 
     sample = [i.sample for i in data]
     mac = []
@@ -140,7 +169,7 @@ def window_std_dev(data: List[DataPoint],
                    window_start: datetime) -> DataPoint:
     """
 
-    :param data:
+    :param data: List[DataPoint] or TimeSeries
     :param window_start:
     :return:
     """
@@ -148,5 +177,8 @@ def window_std_dev(data: List[DataPoint],
     if data is None or len(data) < 2:
         raise Exception('Standard deviation requires at least 2 values to compute')
 
-    data_points = np.array([dp.sample for dp in data])
+    if isinstance(data, TimeSeries):
+        data_points = data.values
+    else:
+        data_points = np.array([dp.sample for dp in data])
     return DataPoint.from_tuple(window_start, np.std(data_points))
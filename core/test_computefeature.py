@@ -0,0 +1,159 @@
+import time
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from core.computefeature import ComputeFeatureBase
+from core.utils.stream_writer import StreamWriter
+
+STREAM_NAME = 'org.md2k.data_analysis.feature.working_days'
+
+
+class Logging(object):
+
+    def log(self, *args, **kwargs):
+        pass
+
+
+class SlowCerebralCortex(object):
+    """
+    Stores the saved streams in memory, slowly
+    """
+
+    def __init__(self):
+        self.logging = Logging()
+        self.streams = {}
+
+    def save_stream(self, datastream, localtime=True):
+        time.sleep(0.05)
+        self.streams[datastream.identifier] = datastream
+
+    def get_stream_id(self, user_id, stream_name):
+        return [{'identifier': identifier, 'name': datastream.name}
+                for identifier, datastream in self.streams.items()
+                if datastream.name == stream_name and
+                str(datastream.owner) == str(user_id)]
+
+    def get_stream_metadata(self, stream_id):
+        return [{'execution_context': "{'algorithm': {'version': 1}}"}]
+
+
+class DayStream(object):
+
+    def __init__(self, data):
+        self.data = data
+
+
+class PacketCerebralCortex(object):
+    """
+    Returns a day of raw 20 byte packets split over three stream ids, as
+    lists or comma separated strings and with a few malformed packets
+    """
+
+    def __init__(self, count=3000, seed=30):
+        rng = np.random.RandomState(seed)
+        start = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+        self.days = {}
+        for i in range(count):
+            sample = rng.randint(-128, 128, 20).tolist()
+            if i % 97 == 0:
+                sample = sample[:12]
+            if i % 5 == 0:
+                sample = ','.join(str(value) for value in sample)
+            start_time = start + timedelta(microseconds=int(
+                rng.randint(0, 86400000000)))
+            self.days.setdefault(i % 3, []).append(
+                DataPoint(start_time=start_time, offset=-18000000,
+                          sample=sample))
+
+    def get_stream_id(self, user_id, stream_name):
+        return [{'identifier': identifier} for identifier in self.days]
+
+    def get_stream(self, stream_id, user_id, day, localtime=True):
+        return DayStream(list(self.days[stream_id]))
+
+
+class Feature(ComputeFeatureBase):
+
+    def store_points(self, user_id):
+        self.store(identifier=uuid.uuid4(), owner=user_id, name=STREAM_NAME,
+                   data_descriptor=[], execution_context={}, annotations=[],
+                   data=[DataPoint(start_time=datetime.now(timezone.utc),
+                                   sample=1)])
+
+
+class TestComputeFeatureBase(unittest.TestCase):
+
+    def setUp(self):
+        self.CC = SlowCerebralCortex()
+        self.writer = StreamWriter(self.CC, batch_seconds=60)
+        self.user_id = uuid.uuid4()
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_read_after_store_through_writer(self):
+        feature = Feature(self.CC)
+        feature.writer = self.writer
+        feature.store_points(self.user_id)
+        self.assertEqual(1, len(feature.get_latest_stream_id(self.user_id,
+                                                             STREAM_NAME)))
+
+    def test_sub_feature_reads_the_stores_of_its_parent(self):
+        feature = Feature(self.CC)
+        feature.writer = self.writer
+        sub_feature = feature.sub_feature(Feature)
+        self.assertIs(self.writer, sub_feature.writer)
+        feature.store_points(self.user_id)
+        self.assertEqual(1, len(sub_feature.get_latest_stream_id(
+            self.user_id, STREAM_NAME)))
+
+    def test_other_streams_do_not_flush(self):
+        feature = Feature(self.CC)
+        feature.writer = self.writer
+        feature.store_points(self.user_id)
+        self.assertEqual([], feature.get_latest_stream_id(self.user_id,
+                                                          'other'))
+        self.assertTrue(self.writer.is_pending(self.user_id, STREAM_NAME))
+
+
+
+class TestLoadDayArray(unittest.TestCase):
+
+    def test_matches_datapoint_lists(self):
+        CC = PacketCerebralCortex()
+        # the lists of DataPoints the features used to build by hand
+        data = []
+        for stream_id in CC.get_stream_id(None, None):
+            data.extend(CC.get_stream(stream_id['identifier'], None, None)
+                        .data)
+        data = [dp for dp in data if len(dp.sample.split(',')
+                                         if isinstance(dp.sample, str)
+                                         else dp.sample) == 20]
+        data.sort(key=lambda dp: dp.start_time)
+
+        raw = Feature(CC).load_day_array(None, None, '20180101', width=20)
+        self.assertEqual(len(data), len(raw))
+        np.testing.assert_array_equal(
+            [round(dp.start_time.timestamp() * 1e6) for dp in data],
+            raw.timestamps)
+        np.testing.assert_array_equal([dp.offset for dp in data],
+                                      raw.offsets)
+        np.testing.assert_array_equal(
+            [[float(value) for value in dp.sample.split(',')]
+             if isinstance(dp.sample, str) else dp.sample for dp in data],
+            raw.samples)
+
+    def test_columns_and_dtype(self):
+        raw = Feature(PacketCerebralCortex()).load_day_array(
+            None, None, '20180101', columns=[2, 5], dtype=np.float32,
+            width=20)
+        self.assertEqual(np.float32, raw.samples.dtype)
+        self.assertEqual(2, raw.samples.shape[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Memory-aware admission of driver tasks.
+
+Features building large in-memory matrices declare their estimated peak
+memory per input data point:
+
+    feature_memory_per_point = 600  # bytes
+
+The driver estimates the footprint of a task from the points the feature read
+for the user-day in previous runs, and the task reserves it from a memory
+budget shared by all the worker processes of the machine before running. A
+task larger than the whole budget runs alone instead of crashing the worker
+next to other large tasks.
+"""
+import fcntl
+import importlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+# points of a user-day when none were recorded: both MotionSense wrists at
+# 25 Hz, the largest inputs of the features declaring a footprint
+DEFAULT_POINTS_PER_DAY = 2 * 25 * 86400
+
+BUDGET_FILE = os.path.join(tempfile.gettempdir(), 'cc_memory_budget.json')
+
+
+def get_feature_memory_per_point(module_name: str) -> float:
+    """
+    :return: the feature_memory_per_point declared by a feature module, 0 if
+        the feature declares none
+    """
+    module = importlib.import_module(module_name)
+    return getattr(module, 'feature_memory_per_point', 0)
+
+
+def estimate_task_memory(module_names: list, user: str, days: list,
+                         cost_model) -> int:
+    """
+    Estimates the peak memory of a task in bytes. The features of a task run
+    one after the other on one day at a time, so the largest per-day
+    footprint of its features is taken.
+
+    :param cost_model: TaskCostModel with the points recorded by previous
+        runs
+    """
+    memory = 0
+    for module_name in module_names:
+        per_point = get_feature_memory_per_point(module_name)
+        if not per_point:
+            continue
+        points = cost_model.estimate_points(module_name, user, days)
+        if points is None:
+            points = DEFAULT_POINTS_PER_DAY
+        memory = max(memory, per_point * points)
+    return int(memory)
+
+
+class PointCounter(object):
+    """
+    Wraps the CerebralCortex object passed to a feature and counts the data
+    points it reads. Every other attribute is delegated to the wrapped
+    object.
+    """
+
+    def __init__(self, CC):
+        self.CC = CC
+        self.points = 0
+
+    def __getattr__(self, name):
+        return getattr(self.CC, name)
+
+    def get_stream(self, *args, **kwargs):
+        ds = self.CC.get_stream(*args, **kwargs)
+        data = getattr(ds, 'data', None)
+        if data:
+            self.points += len(data)
+        return ds
+
+    def get_stream_timeseries(self, *args, **kwargs):
+        get_stream_timeseries = getattr(self.CC, 'get_stream_timeseries',
+                                        None)
+        if get_stream_timeseries is None:
+            return None
+        timeseries = get_stream_timeseries(*args, **kwargs)
+        if timeseries is not None:
+            self.points += len(timeseries)
+        return timeseries
+
+
+class MemoryBudget(object):
+    """
+    Memory budget of a machine shared by the worker processes running on it,
+    spark python workers or process pool workers alike.
+
+    Reservations are kept in budget_file, updated under an exclusive lock.
+    Tasks are admitted in arrival order, a task larger than the budget when
+    no other reservation is held. Reservations of dead processes are
+    dropped.
+    """
+
+    def __init__(self, budget: int, budget_file: str = BUDGET_FILE,
+                 poll_interval: float = 0.5):
+        """
+        :param int budget: bytes available to the tasks on the machine
+        """
+        self.budget = budget
+        self.budget_file = budget_file
+        self.poll_interval = poll_interval
+
+    @contextmanager
+    def reserve(self, memory: int):
+        """
+        Blocks until memory bytes can be reserved and holds them for the
+        enclosed block.
+        """
+        if not self.budget or memory <= 0:
+            yield
+            return
+        ticket = uuid.uuid4().hex
+        self._update(self._enqueue, ticket, memory)
+        try:
+            waited = False
+            while not self._update(self._admit, ticket, memory):
+                if not waited:
+                    print('Waiting for %d MB of memory' % (memory / 2**20))
+                    waited = True
+                time.sleep(self.poll_interval)
+            yield
+        finally:
+            self._update(self._release, ticket, memory)
+
+    def _update(self, change, ticket, memory):
+        with open(self.budget_file + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = {'queue': [], 'reservations': {}}
+                if os.path.exists(self.budget_file):
+                    try:
+                        with open(self.budget_file) as f:
+                            state = json.load(f)
+                    except ValueError:
+                        pass
+                self._prune(state)
+                result = change(state, ticket, memory)
+                tmp_file = self.budget_file + '.tmp'
+                with open(tmp_file, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_file, self.budget_file)
+                return result
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _enqueue(state, ticket, memory):
+        state['queue'].append([ticket, os.getpid(), memory])
+
+    def _admit(self, state, ticket, memory):
+        if not state['queue'] or state['queue'][0][0] != ticket:
+            return False
+        used = sum(m for _, m in state['reservations'].values())
+        if used and used + memory > self.budget:
+            return False
+        state['queue'].pop(0)
+        state['reservations'][ticket] = [os.getpid(), memory]
+        return True
+
+    @staticmethod
+    def _release(state, ticket, memory):
+        state['reservations'].pop(ticket, None)
+        state['queue'] = [q for q in state['queue'] if q[0] != ticket]
+
+    @staticmethod
+    def _prune(state):
+        state['queue'] = [q for q in state['queue'] if _alive(q[1])]
+        state['reservations'] = {t: r for t, r in
+                                 state['reservations'].items()
+                                 if _alive(r[0])}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,210 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import syslog
+import threading
+import time
+from syslog import LOG_ERR
+
+from cerebralcortex.cerebralcortex import CerebralCortex
+
+# Maximum age in seconds of a pooled CerebralCortex object before it is
+# replaced by a new one
+MAX_AGE = 3600
+
+# Pooled objects idle for longer than this many seconds are health-checked
+# before they are handed out again
+HEALTH_CHECK_IDLE = 60
+
+HEALTH_CHECK_USER = '00000000-0000-0000-0000-000000000000'
+HEALTH_CHECK_STREAM = 'org.md2k.data_analysis.health_check'
+
+# Names of the exception classes raised by the storage drivers when a
+# connection is lost
+CONNECTION_ERRORS = ('ConnectionError', 'InterfaceError', 'OperationalError',
+                     'NoHostAvailable', 'OperationTimedOut')
+
+# Storage connections of a CerebralCortex object closed when the object is
+# dropped from the pool, as (storage attribute, connection attribute, close
+# method): the MySQL connection pool of SqlData, the Cassandra session and
+# cluster of RawData and the InfluxDB client of TimeSeriesData. Used when
+# the CerebralCortex object has no close method of its own.
+STORAGE_CONNECTIONS = (('SqlData', 'pool', '_remove_connections'),
+                       ('RawData', 'session', 'shutdown'),
+                       ('RawData', 'cluster', 'shutdown'),
+                       ('TimeSeriesData', 'client', 'close'))
+
+_pool = {}
+_lock = threading.Lock()
+# objects handed out to the tasks of the current thread, per configuration
+_held = threading.local()
+
+
+class _PooledCerebralCortex(object):
+
+    def __init__(self, cc_config_path):
+        self.CC = CerebralCortex(cc_config_path)
+        self.pid = os.getpid()
+        self.created = time.time()
+        self.last_used = self.created
+        self.tasks = 0
+        # tasks using the object, which is closed once it was dropped from
+        # the pool and none uses it
+        self.active = 0
+        self.retired = False
+
+
+def _close(pooled):
+    """
+    Closes the storage connections of a CerebralCortex object dropped from
+    the pool, with its close method when it has one and otherwise through
+    STORAGE_CONNECTIONS. Logs when no connection could be closed, so that
+    leaked connections do not go unnoticed.
+
+    :return: number of close calls made
+    """
+    closers = []
+    close = getattr(pooled.CC, 'close', None)
+    if callable(close):
+        closers.append(close)
+    else:
+        for store_name, connection_name, method_name in STORAGE_CONNECTIONS:
+            connection = getattr(getattr(pooled.CC, store_name, None),
+                                 connection_name, None)
+            close = getattr(connection, method_name, None)
+            if callable(close):
+                closers.append(close)
+    closed = 0
+    for close in closers:
+        try:
+            close()
+            closed += 1
+        except Exception as exp:
+            syslog.openlog(ident="CerebralCortex-Driver")
+            syslog.syslog(LOG_ERR, 'Closing CerebralCortex connection %s'
+                          % str(exp))
+            syslog.closelog()
+    if not closers:
+        syslog.openlog(ident="CerebralCortex-Driver")
+        syslog.syslog(LOG_ERR, 'No storage connection to close found on the '
+                      'CerebralCortex object of %s' %
+                      type(pooled.CC).__name__)
+        syslog.closelog()
+    return closed
+
+
+def _retire(pooled):
+    """
+    Drops an object from the pool, closing it now if no task uses it and
+    otherwise when the last task using it releases it. Called with _lock
+    held.
+    """
+    pooled.retired = True
+    if pooled.active == 0:
+        _close(pooled)
+
+
+def _is_healthy(pooled) -> bool:
+    """
+    Runs a cheap metadata query to verify the storage connections of an idle
+    CerebralCortex object are still usable.
+    """
+    try:
+        pooled.CC.get_stream_id(HEALTH_CHECK_USER, HEALTH_CHECK_STREAM)
+        return True
+    except Exception as exp:
+        syslog.openlog(ident="CerebralCortex-Driver")
+        syslog.syslog(LOG_ERR, 'Recycling CerebralCortex connection %s' %
+                      str(exp))
+        syslog.closelog()
+        return False
+
+
+def get_cerebralcortex(cc_config_path: str) -> CerebralCortex:
+    """
+    Returns the CerebralCortex object of the current worker process for the
+    given configuration, creating it on first use.
+
+    Objects are reused by all the tasks running in the process instead of
+    parsing the configuration and opening the storage connections for every
+    task. An object is replaced once it is older than MAX_AGE, after it was
+    released as broken, or when it fails the health check done after being
+    idle for HEALTH_CHECK_IDLE seconds. The storage connections of a
+    replaced object are closed once no task uses it. Objects inherited from
+    a parent process through fork are never reused, nor closed, since their
+    connections belong to the parent.
+    """
+    with _lock:
+        pooled = _pool.get(cc_config_path)
+        now = time.time()
+        if pooled is not None:
+            if pooled.pid != os.getpid():
+                pooled = None
+            elif now - pooled.created > MAX_AGE or \
+                    (now - pooled.last_used > HEALTH_CHECK_IDLE and
+                     not _is_healthy(pooled)):
+                _retire(pooled)
+                pooled = None
+        if pooled is None:
+            pooled = _PooledCerebralCortex(cc_config_path)
+            _pool[cc_config_path] = pooled
+        pooled.last_used = now
+        pooled.tasks += 1
+        pooled.active += 1
+        if not hasattr(_held, 'pooled'):
+            _held.pooled = {}
+        _held.pooled.setdefault(cc_config_path, []).append(pooled)
+        return pooled.CC
+
+
+def release_cerebralcortex(cc_config_path: str, broken: bool = False):
+    """
+    Marks the end of a task using the object last handed out to the current
+    thread. With broken set, e.g. after a connection error, the object is
+    dropped, its connections closed, and the next task gets a new one.
+    """
+    held = getattr(_held, 'pooled', {}).get(cc_config_path)
+    if not held:
+        return
+    with _lock:
+        pooled = held.pop()
+        pooled.active -= 1
+        if broken and not pooled.retired:
+            if _pool.get(cc_config_path) is pooled:
+                del _pool[cc_config_path]
+            _retire(pooled)
+        elif pooled.retired:
+            if pooled.active == 0:
+                _close(pooled)
+        else:
+            pooled.last_used = time.time()
+
+
+def is_connection_error(exp: Exception) -> bool:
+    """
+    Returns True if the exception was raised for a lost storage connection.
+    """
+    return any(cls.__name__ in CONNECTION_ERRORS
+               for cls in type(exp).__mro__)
@@ -0,0 +1,431 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from cerebralcortex.core.datatypes.datastream import DataStream
+from core.signalprocessing.timeseries import NO_END_TIME, TimeSeries, \
+    from_microseconds, to_microseconds
+
+# days more recent than this many days may still receive data and are never
+# cached
+MIN_AGE_DAYS = 2
+
+META_FILE = 'meta.json'
+
+# seconds after which the size index of a cache directory is rebuilt from
+# disk, to account for the days written by the other workers of the node
+INDEX_RESYNC_SECONDS = 600
+
+
+class DiskStreamCache(object):
+    """
+    Read-through cache of whole stream days on local disk, in front of a
+    CerebralCortex object.
+
+    A day of a stream is stored as .npy columns (timestamps, samples,
+    offsets, end times) under cache_dir/version/stream id/day, and opened
+    with mmap, so the workers of a node share its pages through the OS page
+    cache. Only days older than MIN_AGE_DAYS, read whole, are cached, and
+    only streams whose samples are numbers, lists of numbers or comma
+    separated numbers; other reads go to storage. Changing version, the
+    data version tag, makes every cached day stale. Timezone aware times
+    are restored with a fixed offset timezone.
+
+    Only raw input streams are cached: the streams computed by a feature,
+    whose execution context has a processing module, can be rewritten by
+    any node and are always read from storage. The cached days of a stream
+    are keyed by its time extent in storage as well, so that data received
+    late for a stream makes its cached days stale when it moves the start
+    or end time of the stream. CerebralCortex keeps no update marker nor
+    per-day count of a stream, so data backfilled inside the extent, e.g.
+    a late upload of a day older than MIN_AGE_DAYS before the last data of
+    the stream, is not seen: the cached day is served until the extent
+    changes or the version is changed.
+
+    The cache is bounded to max_bytes: the least recently used days are
+    evicted after each write, from an index of the cached days and their
+    sizes kept by every worker process. Every other attribute is delegated
+    to the wrapped CerebralCortex object, like StreamCache.
+    """
+
+    def __init__(self, CC, cache_dir: str, max_bytes: int = 50 * 2**30,
+                 version: str = '1'):
+        """
+        :param CC: CerebralCortex object to read from
+        :param str cache_dir: local directory of the cache
+        :param int max_bytes: upper bound on the size of the cache
+        :param str version: data version tag of the cached days
+        """
+        self.CC = CC
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = str(version)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._extents = {}
+        self._derived = set()
+
+    def __getattr__(self, name):
+        return getattr(self.CC, name)
+
+    def get_stream(self, stream_id=None, user_id=None, day=None,
+                   start_time=None, end_time=None, localtime=True,
+                   data_type=DataSet.COMPLETE):
+        entry = None
+        if self._cacheable(day, start_time, end_time, data_type):
+            entry = self._entry(stream_id, day, localtime)
+        if entry is None:
+            return self.CC.get_stream(stream_id, user_id=user_id, day=day,
+                                      start_time=start_time,
+                                      end_time=end_time, localtime=localtime,
+                                      data_type=data_type)
+        cached = self._open(entry)
+        if cached is not None:
+            return _to_datastream(*cached)
+        datastream = self.CC.get_stream(stream_id, user_id=user_id, day=day,
+                                        localtime=localtime,
+                                        data_type=data_type)
+        self._store(entry, datastream)
+        return datastream
+
+    def get_stream_timeseries(self, stream_id, user_id, day, localtime=True):
+        """
+        Returns a cached day of a stream as a TimeSeries whose columns are
+        memory mapped, reading it from storage first on a miss.
+
+        :return: TimeSeries, None when the day cannot be cached
+        """
+        if not self._cacheable(day, None, None, DataSet.COMPLETE):
+            return None
+        entry = self._entry(stream_id, day, localtime)
+        if entry is None:
+            return None
+        cached = self._open(entry)
+        if cached is None:
+            datastream = self.CC.get_stream(stream_id, user_id=user_id,
+                                            day=day, localtime=localtime)
+            if not self._store(entry, datastream):
+                return None
+            cached = self._open(entry, count=False)
+            if cached is None:
+                return None
+        meta, columns = cached
+        return TimeSeries(columns['timestamps'], columns['samples'],
+                          columns.get('offsets'),
+                          columns.get('end_timestamps'),
+                          meta['kind'] == 'scalar', _tz(meta['utcoffset']))
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _cacheable(self, day, start_time, end_time, data_type) -> bool:
+        if day is None or start_time is not None or end_time is not None or \
+                data_type != DataSet.COMPLETE:
+            return False
+        try:
+            day = datetime.strptime(str(day), '%Y%m%d')
+        except ValueError:
+            return False
+        return day < datetime.now() - timedelta(days=MIN_AGE_DAYS)
+
+    def _entry(self, stream_id, day, localtime) -> str:
+        """
+        :return: directory of a cached day, None when the stream is not
+            cached
+        """
+        stream_id = str(stream_id)
+        if stream_id in self._derived:
+            return None
+        extent = self._extent(stream_id)
+        if extent is None:
+            return None
+        return os.path.join(self.cache_dir, self.version, stream_id,
+                            '%s_%s_%s' % (day, 'local' if localtime else
+                                          'utc', extent))
+
+    def _extent(self, stream_id: str):
+        """
+        :return: digest of the start and end times of a stream in storage,
+            read once per stream, None when they are unknown
+        """
+        if stream_id not in self._extents:
+            try:
+                duration = self.CC.get_stream_duration(stream_id)
+                extent = '%s|%s' % (duration['start_time'],
+                                    duration['end_time'])
+                extent = hashlib.md5(extent.encode()).hexdigest()[:16]
+            except Exception:
+                extent = None
+            self._extents[stream_id] = extent
+        return self._extents[stream_id]
+
+    def _open(self, entry, count=True):
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                meta = json.load(f)
+            columns = {name: np.load(os.path.join(entry, name + '.npy'),
+                                     mmap_mode='r')
+                       for name in meta['columns']}
+            os.utime(entry)
+            _index(self.cache_dir).touch(entry)
+        except (OSError, ValueError):
+            if count:
+                with self._lock:
+                    self.misses += 1
+            return None
+        if count:
+            with self._lock:
+                self.hits += 1
+        return meta, columns
+
+    def _store(self, entry, datastream) -> bool:
+        """
+        Writes a day to the cache.
+
+        :return: True if the day is cached
+        """
+        if datastream is None or not datastream.data:
+            return False
+        if 'processing_module' in (datastream.execution_context or {}):
+            self._derived.add(str(datastream.identifier))
+            return False
+        encoded = _encode(datastream)
+        if encoded is None:
+            return False
+        meta, columns = encoded
+        tmp_entry = '%s.%s.tmp' % (entry, uuid.uuid4().hex)
+        try:
+            os.makedirs(tmp_entry)
+            for name, column in columns.items():
+                np.save(os.path.join(tmp_entry, name + '.npy'), column)
+            with open(os.path.join(tmp_entry, META_FILE), 'w') as f:
+                json.dump(meta, f)
+            size = _entry_size(tmp_entry)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # another worker cached the day first, or the disk is full
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return os.path.exists(os.path.join(entry, META_FILE))
+        _index(self.cache_dir).add(entry, size, self.max_bytes)
+        return True
+
+
+class _CacheIndex(object):
+    """
+    Sizes of the days cached under a cache directory, least recently used
+    first. The index is built by walking the directory, and rebuilt every
+    INDEX_RESYNC_SECONDS since the other processes of the node write to the
+    same directory.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.total = 0
+        self.synced = None
+        self._lock = threading.Lock()
+
+    def _resync(self):
+        found = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            if META_FILE not in files:
+                continue
+            dirs[:] = []
+            try:
+                found.append((os.path.getmtime(root), root,
+                              _entry_size(root)))
+            except OSError:
+                continue
+        found.sort()
+        self.entries = OrderedDict((root, size) for _, root, size in found)
+        self.total = sum(self.entries.values())
+        self.synced = time.time()
+
+    def _check_sync(self):
+        if self.synced is None or \
+                time.time() - self.synced > INDEX_RESYNC_SECONDS:
+            self._resync()
+
+    def touch(self, entry: str):
+        with self._lock:
+            if entry in self.entries:
+                self.entries.move_to_end(entry)
+
+    def add(self, entry: str, size: int, max_bytes: int):
+        """
+        Records a new cached day and evicts the least recently used days
+        above max_bytes.
+        """
+        with self._lock:
+            self._check_sync()
+            self.total += size - self.entries.pop(entry, 0)
+            self.entries[entry] = size
+            while self.total > max_bytes and self.entries:
+                root, size = self.entries.popitem(last=False)
+                shutil.rmtree(root, ignore_errors=True)
+                self.total -= size
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _index(cache_dir: str) -> _CacheIndex:
+    """
+    :return: the index of a cache directory, shared by the DiskStreamCache
+        objects of the process
+    """
+    with _indexes_lock:
+        if cache_dir not in _indexes:
+            _indexes[cache_dir] = _CacheIndex(cache_dir)
+        return _indexes[cache_dir]
+
+
+def _entry_size(entry: str) -> int:
+    return sum(os.path.getsize(os.path.join(entry, name))
+               for name in os.listdir(entry))
+
+
+def _tz(utcoffset):
+    if utcoffset is None:
+        return None
+    return timezone(timedelta(seconds=utcoffset))
+
+
+def _encode(datastream):
+    """
+    :return: (meta, dict of column name -> array) of a DataStream, None when
+        its points cannot be stored as columns
+    """
+    data = datastream.data
+    kind, samples = _encode_samples([dp.sample for dp in data])
+    if kind is None:
+        return None
+    utcoffsets = set(dp.start_time.utcoffset() for dp in data)
+    if len(utcoffsets) != 1:
+        return None
+    utcoffset = utcoffsets.pop()
+    columns = {'samples': samples,
+               'timestamps': np.fromiter((to_microseconds(dp.start_time)
+                                          for dp in data), np.int64,
+                                         len(data))}
+    offsets = [dp.offset for dp in data]
+    if any(offset is not None for offset in offsets):
+        if not all(type(offset) is int for offset in offsets):
+            return None
+        columns['offsets'] = np.array(offsets, dtype=np.int64)
+    if any(dp.end_time is not None for dp in data):
+        columns['end_timestamps'] = np.fromiter(
+            (NO_END_TIME if dp.end_time is None else
+             to_microseconds(dp.end_time) for dp in data), np.int64,
+            len(data))
+    meta = {'kind': kind, 'columns': sorted(columns),
+            'utcoffset': None if utcoffset is None else
+            utcoffset.total_seconds(),
+            'identifier': str(datastream.identifier),
+            'owner': str(datastream.owner), 'name': datastream.name,
+            'data_descriptor': datastream.data_descriptor,
+            'execution_context': datastream.execution_context,
+            'annotations': datastream.annotations,
+            'stream_type': getattr(datastream, 'datastream_type', None)}
+    try:
+        json.dumps(meta)
+    except (TypeError, ValueError):
+        return None
+    return meta, columns
+
+
+def _encode_samples(samples):
+    """
+    :return: (kind, sample matrix) with kind 'scalar', 'list' or 'csv',
+        (None, None) when the samples cannot be stored and restored
+        identically
+    """
+    first = samples[0]
+    if isinstance(first, str):
+        kind = 'csv'
+        try:
+            rows = [sample.split(',') for sample in samples]
+            try:
+                matrix = np.array(rows, dtype=np.int64)
+            except ValueError:
+                matrix = np.array(rows, dtype=np.float64)
+        except (AttributeError, ValueError):
+            return None, None
+    elif isinstance(first, (int, float, list)) and \
+            not isinstance(first, bool):
+        kind = 'scalar' if not isinstance(first, list) else 'list'
+        try:
+            matrix = np.array(samples)
+        except ValueError:
+            return None, None
+        if matrix.dtype.kind not in 'if' or \
+                matrix.ndim != (1 if kind == 'scalar' else 2):
+            return None, None
+    else:
+        return None, None
+    if _decode_samples(kind, matrix) != samples:
+        return None, None
+    return kind, matrix
+
+
+def _decode_samples(kind, matrix) -> list:
+    if kind == 'csv':
+        return [','.join(map(str, row)) for row in matrix.tolist()]
+    return matrix.tolist()
+
+
+def _to_datastream(meta, columns) -> DataStream:
+    tz = _tz(meta['utcoffset'])
+    count = len(columns['timestamps'])
+    samples = _decode_samples(meta['kind'], columns['samples'])
+    offsets = columns['offsets'].tolist() if 'offsets' in columns else \
+        [None] * count
+    end_times = [None] * count
+    if 'end_timestamps' in columns:
+        end_times = [None if us == NO_END_TIME else from_microseconds(us, tz)
+                     for us in columns['end_timestamps'].tolist()]
+    data = [DataPoint(start_time=from_microseconds(start, tz),
+                      end_time=end_time, offset=offset, sample=sample)
+            for start, end_time, offset, sample in
+            zip(columns['timestamps'].tolist(), end_times, offsets, samples)]
+    return DataStream(identifier=meta['identifier'], owner=meta['owner'],
+                      name=meta['name'],
+                      data_descriptor=meta['data_descriptor'],
+                      execution_context=meta['execution_context'],
+                      annotations=meta['annotations'],
+                      stream_type=meta['stream_type'], data=data)
@@ -0,0 +1,200 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Timeouts, retries and the failure ledger of the driver tasks.
+
+A feature can bound the time of one of its runs on a user's days by
+declaring, in seconds:
+
+    feature_timeout = 3600
+
+Features without the declaration get the default timeout of the driver.
+"""
+import ctypes
+import json
+import os
+import random
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+# retries of a feature failing on a lost storage connection
+MAX_RETRIES = 2
+
+# seconds between the repeated TaskTimeouts of a feature catching the first
+TIMEOUT_REPEAT = 1.0
+
+# seconds before the first retry, doubled for every further retry
+RETRY_BACKOFF = 5.0
+MAX_RETRY_BACKOFF = 120.0
+
+
+class TaskTimeout(BaseException):
+    """
+    Raised in a feature running for longer than its timeout. It derives from
+    BaseException so that the except Exception: blocks of the features do not
+    swallow it.
+    """
+    pass
+
+
+def get_feature_timeout(module, default: float = None) -> float:
+    """
+    :return: the feature_timeout declared by a feature module, default if the
+        feature declares none
+    """
+    return getattr(module, 'feature_timeout', default)
+
+
+@contextmanager
+def time_limit(seconds: float):
+    """
+    Raises TaskTimeout in the enclosed block once it ran for seconds, and
+    again every TIMEOUT_REPEAT seconds until the block exits, so that a
+    feature catching it with a bare except: is still interrupted.
+
+    In the main thread of a process, as are the tasks run by spark python
+    workers, process pool workers and the single threaded driver, the limit
+    is enforced with SIGALRM, which also interrupts blocking socket reads.
+    In other threads a watchdog thread raises TaskTimeout asynchronously in
+    the thread, which takes effect at its next python instruction. Without
+    seconds, the block runs without limit.
+    """
+    if not seconds:
+        yield
+        return
+    if threading.current_thread() is not threading.main_thread():
+        with _thread_time_limit(seconds):
+            yield
+        return
+
+    def on_alarm(signum, frame):
+        raise TaskTimeout('Timed out after %g seconds' % seconds)
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds, TIMEOUT_REPEAT)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@contextmanager
+def _thread_time_limit(seconds: float):
+    """
+    time_limit of a thread other than the main thread.
+    """
+    thread_id = ctypes.c_ulong(threading.get_ident())
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def watchdog():
+        timeout = seconds
+        while not done.wait(timeout):
+            with lock:
+                if done.is_set():
+                    break
+                ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                    thread_id, ctypes.py_object(TaskTimeout))
+            timeout = TIMEOUT_REPEAT
+
+    watcher = threading.Thread(target=watchdog, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        with lock:
+            done.set()
+            # drops a TaskTimeout raised too late to reach the block
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, None)
+        watcher.join()
+
+
+def retry_delay(attempt: int) -> float:
+    """
+    :return: seconds to wait before retry number attempt (from 0), growing
+        exponentially with a random jitter so that the workers hit by the same
+        storage outage do not reconnect all at once
+    """
+    delay = min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class FailureLedger(object):
+    """
+    Local JSON file of the feature runs that failed, per feature, user and
+    day ('*' for features working on a range of days). A failed run stays in
+    the ledger until the feature succeeds on the same user and days, so that
+    a later run with --retry-failed only recomputes the failed user-days.
+    """
+
+    def __init__(self, ledger_file: str):
+        self.ledger_file = ledger_file
+        self.failures = {}
+        if ledger_file and os.path.exists(ledger_file):
+            with open(ledger_file) as f:
+                self.failures = json.load(f)
+
+    @staticmethod
+    def key(module_name: str, user: str, days: list) -> str:
+        day = days[0] if len(days) == 1 else '*'
+        return '|'.join([module_name, str(user), day])
+
+    def record_failure(self, module_name: str, user: str, days: list,
+                       error: str):
+        key = self.key(module_name, user, days)
+        attempts = self.failures.get(key, {}).get('attempts', 0)
+        self.failures[key] = {'module': module_name, 'user': str(user),
+                              'days': list(days), 'error': error,
+                              'attempts': attempts + 1, 'time': time.time()}
+
+    def record_success(self, module_name: str, user: str, days: list):
+        self.failures.pop(self.key(module_name, user, days), None)
+
+    def modules(self) -> list:
+        """
+        :return: sorted names of the feature modules with failed runs
+        """
+        return sorted(set(f['module'] for f in self.failures.values()))
+
+    def user_days(self, module_name: str) -> dict:
+        """
+        :return: dict of user -> sorted failed days of a feature module
+        """
+        user_days = {}
+        for failure in self.failures.values():
+            if failure['module'] == module_name:
+                user_days.setdefault(failure['user'], set()).update(
+                    failure['days'])
+        return {user: sorted(days) for user, days in user_days.items()}
+
+    def save(self):
+        if not self.ledger_file:
+            return
+        tmp_file = self.ledger_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.failures, f, indent=1, sort_keys=True)
+        os.replace(tmp_file, self.ledger_file)
@@ -0,0 +1,99 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Registry of the feature packages under core/feature, so that the driver does
+not have to walk the directory at startup. A feature package is a directory
+core/feature/<name> containing the module <name>.py.
+
+After adding or removing a feature, regenerate FEATURES with
+
+    python3 -m core.utils.feature_registry
+"""
+import os
+
+FEATURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, 'feature')
+
+FEATURES = [
+    'DataQualityPPG',
+    'DecodeHRV',
+    'PPGHourYield',
+    'PresenceDecodeHRV',
+    'activity',
+    'activity_features',
+    'audio_features',
+    'beacon',
+    'context',
+    'cyberslacking',
+    'data_yield',
+    'example_feature',
+    'gps',
+    'gps_daily',
+    'gps_location_daywise',
+    'gpsfeature',
+    'heart_rate',
+    'office_time',
+    'phone_app_usage',
+    'phone_data_yield',
+    'phone_features',
+    'phone_screen_touch_features',
+    'puffmarker',
+    'respiration_cycle_statistics',
+    'rr_interval',
+    'sleep_duration',
+    'sleep_duration_analysis',
+    'sleep_time',
+    'socialjetlag',
+    'stress_and_qualtrics_combination',
+    'stress_from_ppg',
+    'stress_from_respiration',
+    'stress_from_wrist',
+    'task_features',
+    'typing',
+    'typing_context',
+    'typing_speed',
+]
+
+
+def feature_module(name: str) -> str:
+    """
+    :return: dotted module name of a feature, e.g. core.feature.gps.gps
+    """
+    return 'core.feature.%s.%s' % (name, name)
+
+
+def scan_features(feature_dir: str = FEATURES_DIR) -> list:
+    """
+    :return: sorted names of the feature packages found on disk
+    """
+    return sorted(name for name in os.listdir(feature_dir)
+                  if os.path.isfile(os.path.join(feature_dir, name,
+                                                 name + '.py')))
+
+
+if __name__ == '__main__':
+    print('FEATURES = [')
+    for name in scan_features():
+        print("    '%s'," % name)
+    print(']')
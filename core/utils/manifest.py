@@ -0,0 +1,276 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from core.utils.scheduler import feature_name
+
+METADATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            os.pardir, 'resources', 'metadata')
+
+# Data of a neighbouring day can end up in a day depending on the timezone,
+# so stream extents are compared over the day extended by this margin.
+DAY_MARGIN = timedelta(days=1)
+
+
+def _naive(ts):
+    if ts is None:
+        return None
+    return ts.replace(tzinfo=None)
+
+
+def day_extent(duration: dict, day: str):
+    """
+    Clips the extent of a stream to the given day.
+
+    :param dict duration: stream duration with start_time and end_time as
+        returned by CC.get_stream_duration
+    :param str day: day in YYYYMMDD format
+    :return: [start, end] iso strings of the stream data within the day, None
+        if the stream has no data in the day
+    """
+    if not duration or not duration.get('start_time') or \
+            not duration.get('end_time'):
+        return None
+    day_start = datetime.strptime(day, '%Y%m%d') - DAY_MARGIN
+    day_end = day_start + timedelta(days=1) + 2 * DAY_MARGIN
+    start = max(_naive(duration['start_time']), day_start)
+    end = min(_naive(duration['end_time']), day_end)
+    if start > end:
+        return None
+    return [start.isoformat(), end.isoformat()]
+
+
+def compute_fingerprint(user_streams, stream_ids: dict, extents: dict) -> str:
+    """
+    Hashes the inputs a feature saw for a user-day.
+
+    :param user_streams: sorted stream names of the user, None if the feature
+        did not list the user streams
+    :param dict stream_ids: stream name -> sorted stream identifiers
+    :param dict extents: stream identifier -> day extent
+    """
+    content = json.dumps([user_streams, stream_ids, extents], sort_keys=True)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+_template_versions = None
+
+
+def template_versions() -> dict:
+    """
+    :return: stream name -> algorithm version of the metadata templates in
+        core/resources/metadata, i.e. of all the streams written by features
+    """
+    global _template_versions
+    if _template_versions is None:
+        versions = {}
+        for filename in os.listdir(METADATA_DIR):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(METADATA_DIR, filename)) as f:
+                    metadata = json.load(f)
+                versions[metadata['name']] = str(
+                    metadata['execution_context']['algorithm']['version'])
+            except Exception:
+                continue
+        _template_versions = versions
+    return _template_versions
+
+
+class InputRecorder(object):
+    """
+    Wraps the CerebralCortex object passed to a feature and records the
+    streams it looks up, the extents of the streams it reads (taken before the
+    data is read) and the versions of the streams it saves. Every other
+    attribute is delegated to the wrapped object.
+    """
+
+    def __init__(self, CC):
+        self.CC = CC
+        self.user_streams = None
+        self.stream_ids = {}
+        self.durations = {}
+        self.outputs = {}
+
+    def __getattr__(self, name):
+        return getattr(self.CC, name)
+
+    def get_user_streams(self, user_id, *args, **kwargs):
+        streams = self.CC.get_user_streams(user_id, *args, **kwargs)
+        self.user_streams = sorted(streams) if streams else []
+        return streams
+
+    def get_stream_id(self, user_id, stream_name):
+        stream_ids = self.CC.get_stream_id(user_id, stream_name)
+        self.note_stream_ids(stream_name, stream_ids)
+        return stream_ids
+
+    def note_stream_ids(self, stream_name, stream_ids):
+        """
+        Records a stream id lookup answered from a cache instead of CC.
+        """
+        self.stream_ids[stream_name] = sorted(
+            str(s['identifier']) for s in stream_ids or [])
+
+    def get_stream(self, stream_id=None, *args, **kwargs):
+        if str(stream_id) not in self.durations:
+            self.durations[str(stream_id)] = \
+                self.CC.get_stream_duration(stream_id)
+        return self.CC.get_stream(stream_id, *args, **kwargs)
+
+    def get_stream_timeseries(self, stream_id, *args, **kwargs):
+        get_stream_timeseries = getattr(self.CC, 'get_stream_timeseries',
+                                        None)
+        if get_stream_timeseries is None:
+            return None
+        if str(stream_id) not in self.durations:
+            self.durations[str(stream_id)] = \
+                self.CC.get_stream_duration(stream_id)
+        return get_stream_timeseries(stream_id, *args, **kwargs)
+
+    def save_stream(self, datastream, *args, **kwargs):
+        try:
+            version = datastream.execution_context['algorithm']['version']
+        except Exception:
+            version = None
+        self.outputs[datastream.name] = str(version)
+        return self.CC.save_stream(datastream, *args, **kwargs)
+
+    def entry(self, day: str) -> dict:
+        """
+        :return: the manifest entry of the recorded run for the given day
+        """
+        extents = {stream_id: day_extent(duration, day)
+                   for stream_id, duration in self.durations.items()}
+        return {'user_streams': self.user_streams is not None,
+                'stream_names': sorted(self.stream_ids),
+                'stream_reads': sorted(self.durations),
+                'outputs': self.outputs,
+                'fingerprint': compute_fingerprint(self.user_streams,
+                                                   self.stream_ids, extents)}
+
+
+class Manifest(object):
+    """
+    Records per (feature, user, day) the fingerprint of the inputs and the
+    algorithm versions of the outputs of the last successful computation, so
+    that unchanged user-days can be skipped by later runs.
+
+    The manifest is kept in a JSON file owned by the driver. Lookups against
+    CerebralCortex made while checking are cached for the lifetime of the
+    object.
+    """
+
+    def __init__(self, manifest_file: str, CC=None):
+        self.manifest_file = manifest_file
+        self.CC = CC
+        self.entries = {}
+        if manifest_file and os.path.exists(manifest_file):
+            with open(manifest_file) as f:
+                self.entries = json.load(f)
+        self.updated = set()
+        self._lock = threading.Lock()
+        self._user_streams = {}
+        self._stream_ids = {}
+        self._durations = {}
+
+    @staticmethod
+    def key(module_name: str, user: str, day: str) -> str:
+        return '|'.join([feature_name(module_name), str(user), day])
+
+    def record(self, module_name: str, user: str, day: str, entry: dict):
+        with self._lock:
+            self.entries[self.key(module_name, user, day)] = entry
+
+    def mark_updated(self, module_name: str, user: str, days: list):
+        """
+        Marks the output of a feature as rewritten in this run. Features
+        computed over a range of days are marked for all days.
+        """
+        day = days[0] if len(days) == 1 else '*'
+        with self._lock:
+            self.updated.add(self.key(module_name, user, day))
+
+    def is_updated(self, module_name: str, user: str, day: str) -> bool:
+        """
+        Returns True if the feature output for the user-day was rewritten in
+        this run.
+        """
+        return self.key(module_name, user, day) in self.updated or \
+            self.key(module_name, user, '*') in self.updated
+
+    def save(self):
+        if not self.manifest_file:
+            return
+        with self._lock:
+            tmp_file = self.manifest_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_file, self.manifest_file)
+
+    def is_up_to_date(self, module_name: str, user: str, day: str) -> bool:
+        """
+        Returns True if the feature was computed on the user-day before with
+        the current algorithm versions and its inputs have not changed since.
+        """
+        entry = self.entries.get(self.key(module_name, user, day))
+        if not entry:
+            return False
+        versions = template_versions()
+        for name, version in entry['outputs'].items():
+            if versions.get(name, version) != version:
+                return False
+        try:
+            user_streams = None
+            if entry['user_streams']:
+                if user not in self._user_streams:
+                    streams = self.CC.get_user_streams(user)
+                    self._user_streams[user] = sorted(streams) \
+                        if streams else []
+                user_streams = self._user_streams[user]
+            stream_ids = {}
+            for name in entry['stream_names']:
+                if (user, name) not in self._stream_ids:
+                    self._stream_ids[(user, name)] = sorted(
+                        str(s['identifier']) for s in
+                        self.CC.get_stream_id(user, name) or [])
+                stream_ids[name] = self._stream_ids[(user, name)]
+            extents = {}
+            for stream_id in entry['stream_reads']:
+                if stream_id not in self._durations:
+                    self._durations[stream_id] = \
+                        self.CC.get_stream_duration(stream_id)
+                extents[stream_id] = day_extent(self._durations[stream_id],
+                                                day)
+        except Exception:
+            return False
+        return entry['fingerprint'] == compute_fingerprint(user_streams,
+                                                           stream_ids,
+                                                           extents)
@@ -0,0 +1,127 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Registry of the models unpickled from core/resources/models.
+
+Features get their models through get_model, which deserializes each model
+file once per process. The driver additionally ships the models of a job
+with it: as spark broadcast variables, fetched once per executor, or for the
+process backend by loading them before the worker processes are forked so
+that the workers share them.
+
+Feature modules declare the model files they use:
+
+    feature_models = [POSTURE_MODEL_FILENAME, ACTIVITY_MODEL_FILENAME]
+
+Only model files that ship with the repository are shipped with the jobs, a
+declared file that is missing is left to get_model in the tasks, where it
+fails the task rather than the whole job.
+"""
+import importlib
+import os
+import pickle
+import threading
+
+_models = {}
+_broadcasts = {}
+_driver_broadcasts = {}
+_lock = threading.Lock()
+
+
+def get_model(resource_name: str):
+    """
+    :param str resource_name: path of the model file relative to the
+        repository root, e.g. core/resources/models/motion/clf_motion.p
+    :return: the unpickled model, shared by all the callers of the process
+        and not to be modified
+    """
+    model = _models.get(resource_name)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(resource_name)
+        if model is None:
+            broadcast = _broadcasts.get(resource_name)
+            if broadcast is not None:
+                model = broadcast.value
+            else:
+                # imported here, computefeature needs cerebralcortex
+                from core.computefeature import get_resource_contents
+                model = pickle.loads(get_resource_contents(resource_name))
+            _models[resource_name] = model
+    return model
+
+
+def get_feature_models(module_names: list) -> list:
+    """
+    :return: sorted model files declared by the given feature modules in
+        feature_models, without the files that do not exist
+    """
+    resources = set()
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for resource_name in getattr(module, 'feature_models', []):
+            if os.path.isfile(resource_name):
+                resources.add(resource_name)
+            else:
+                print('Model file not found, loaded on first use:',
+                      module_name, resource_name)
+    return sorted(resources)
+
+
+def preload_models(resource_names: list):
+    """
+    Loads the given models in the current process.
+    """
+    for resource_name in resource_names:
+        get_model(resource_name)
+
+
+def broadcast_models(spark_context, resource_names: list) -> dict:
+    """
+    Broadcasts the given models from the driver. A model is broadcast once
+    per driver process and reused by the following jobs.
+
+    :return: resource name -> Broadcast, to be passed to use_broadcasts in the
+        tasks
+    """
+    broadcasts = {}
+    for resource_name in resource_names:
+        broadcast = _driver_broadcasts.get(resource_name)
+        if broadcast is None:
+            broadcast = spark_context.broadcast(get_model(resource_name))
+            _driver_broadcasts[resource_name] = broadcast
+        broadcasts[resource_name] = broadcast
+    return broadcasts
+
+
+def use_broadcasts(broadcasts: dict):
+    """
+    Makes get_model resolve the given models from their broadcast variables
+    in the current process.
+    """
+    with _lock:
+        for resource_name, broadcast in broadcasts.items():
+            if resource_name not in _models:
+                _broadcasts[resource_name] = broadcast
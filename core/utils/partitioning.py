@@ -0,0 +1,180 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import heapq
+import json
+import os
+import threading
+from collections import defaultdict
+
+from core.utils.scheduler import feature_name
+
+
+class TaskCostModel(object):
+    """
+    Estimates the cost of driver tasks from the wall clock times recorded in
+    previous runs.
+
+    Timings are kept per (feature, user, day) in a JSON file. Features working
+    on a range of days are recorded with the day '*'. A task without a
+    recorded timing is estimated by the average timing of the same feature
+    for the user, then by the average timing of the feature over all users,
+    and finally by default_cost.
+
+    The data points read by the features are kept alongside, per day, to
+    estimate the memory footprint of a task. The largest points per feature
+    and user, and per feature, are indexed as they are recorded.
+
+    The model is shared by the threads of the driver running concurrent jobs,
+    and guarded by a lock.
+    """
+
+    def __init__(self, timings_file: str = None, default_cost: float = 1.0):
+        self.timings_file = timings_file
+        self.default_cost = default_cost
+        self.timings = {}
+        self.points = {}
+        self._lock = threading.Lock()
+        if timings_file and os.path.exists(timings_file):
+            with open(timings_file) as f:
+                timings = json.load(f)
+            # files written before points were recorded only hold timings
+            if 'seconds' in timings:
+                self.timings = timings['seconds']
+                self.points = timings.get('points', {})
+            else:
+                self.timings = timings
+        self._build_averages()
+        self._user_points = {}
+        self._feature_points = {}
+        for key, points in self.points.items():
+            self._index_points(key, points)
+
+    @staticmethod
+    def key(module_name: str, user: str, days: list) -> str:
+        day = days[0] if len(days) == 1 else '*'
+        return '|'.join([feature_name(module_name), str(user), day])
+
+    def _build_averages(self):
+        per_user = defaultdict(list)
+        per_feature = defaultdict(list)
+        for key, seconds in self.timings.items():
+            feature, user, _ = key.split('|')
+            per_user[(feature, user)].append(seconds)
+            per_feature[feature].append(seconds)
+        self._user_average = {k: sum(v) / len(v) for k, v in per_user.items()}
+        self._feature_average = {k: sum(v) / len(v) for k, v in
+                                 per_feature.items()}
+
+    def _index_points(self, key: str, points: float):
+        feature, user, _ = key.split('|')
+        if points > self._user_points.get((feature, user), -1):
+            self._user_points[(feature, user)] = points
+        if points > self._feature_points.get(feature, -1):
+            self._feature_points[feature] = points
+
+    def estimate(self, module_names: list, user: str, days: list) -> float:
+        """
+        :return: estimated seconds to run the features on the user and days
+        """
+        cost = 0.0
+        with self._lock:
+            for module_name in module_names:
+                key = self.key(module_name, user, days)
+                feature = feature_name(module_name)
+                if key in self.timings:
+                    cost += self.timings[key]
+                elif (feature, str(user)) in self._user_average:
+                    cost += self._user_average[(feature, str(user))]
+                else:
+                    cost += self._feature_average.get(feature,
+                                                      self.default_cost)
+        return cost
+
+    def estimate_points(self, module_name: str, user: str, days: list):
+        """
+        :return: estimated data points read per day by the feature on the
+            user and days, None if the feature never recorded any
+        """
+        key = self.key(module_name, user, days)
+        feature, user = feature_name(module_name), str(user)
+        with self._lock:
+            if key in self.points:
+                return self.points[key]
+            if (feature, user) in self._user_points:
+                return self._user_points[(feature, user)]
+            return self._feature_points.get(feature)
+
+    def record(self, module_name: str, user: str, days: list,
+               seconds: float, points: int = None):
+        key = self.key(module_name, user, days)
+        with self._lock:
+            self.timings[key] = seconds
+            if points is not None:
+                self.points[key] = points / max(1, len(days))
+                self._index_points(key, self.points[key])
+
+    def save(self):
+        if not self.timings_file:
+            return
+        with self._lock:
+            self._build_averages()
+            tmp_file = self.timings_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump({'seconds': self.timings, 'points': self.points},
+                          f)
+        os.replace(tmp_file, self.timings_file)
+
+
+def longest_first(tasks: list, costs: list) -> list:
+    """
+    Returns the tasks sorted by decreasing cost.
+    """
+    order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+    return [tasks[i] for i in order]
+
+
+def partition_tasks(tasks: list, costs: list, num_partitions: int) -> list:
+    """
+    Bin-packs tasks into num_partitions partitions of balanced total cost
+    using the longest processing time first rule: tasks are taken in
+    decreasing cost and each one is put into the currently lightest
+    partition.
+
+    :return: list of non-empty partitions, each a list of tasks in decreasing
+        cost, ordered by decreasing partition cost
+    """
+    num_partitions = max(1, min(num_partitions, len(tasks)))
+    heap = [(0.0, i) for i in range(num_partitions)]
+    partitions = [[] for _ in range(num_partitions)]
+    loads = [0.0] * num_partitions
+    order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+    for i in order:
+        load, index = heapq.heappop(heap)
+        partitions[index].append(tasks[i])
+        loads[index] = load + costs[i]
+        heapq.heappush(heap, (loads[index], index))
+    ranked = sorted(range(num_partitions), key=lambda i: loads[i],
+                    reverse=True)
+    return [partitions[i] for i in ranked if partitions[i]]
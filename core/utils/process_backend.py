@@ -0,0 +1,283 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import importlib
+import queue
+import syslog
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from syslog import LOG_ERR
+
+# a task running this many times longer than expected is speculatively
+# re-executed once the pool has idle workers
+SPECULATION_MULTIPLIER = 3.0
+SPECULATION_MIN_SECONDS = 60.0
+SPECULATION_POLL = 5.0
+
+
+class ProcessPoolBackend(object):
+    """
+    Runs driver tasks on a local pool of worker processes instead of Spark.
+
+    Tasks are handed out one at a time, so an idle worker always picks up the
+    next pending task and long user-days do not hold back a whole partition.
+    At most max_in_flight tasks are queued in the pool at any time, which
+    keeps the memory held by pending task arguments bounded. The pool is
+    shared by all the jobs running concurrently in the driver.
+
+    A worker killed while running a task, by the kernel OOM killer for
+    instance, breaks the pool without telling which task killed it: a new
+    pool is started, and the tasks that were in flight are run again one at
+    a time in a separate single worker pool. A task whose worker dies there
+    fails.
+    """
+
+    def __init__(self, num_workers: int, max_in_flight: int = None,
+                 initializer=None, initargs=()):
+        """
+        :param int num_workers: number of worker processes
+        :param int max_in_flight: maximum number of tasks submitted to the
+            pool and not yet finished, defaults to twice the number of workers
+        :param initializer: called once in every worker process before its
+            first task
+        :param tuple initargs: arguments of initializer
+        """
+        self.num_workers = num_workers
+        self.max_in_flight = max_in_flight or 2 * num_workers
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._initializer = initializer
+        self._initargs = initargs
+        self._lock = threading.Lock()
+        # tasks of all the jobs submitted to the pool and not finished, and
+        # completion times of all the tasks run on the pool
+        self._in_flight = 0
+        self._completions = []
+        self._pools = {False: ProcessPoolExecutor(num_workers), True: None}
+        # only one task at a time runs in the single worker pool, so that a
+        # task killing its worker does not fail the tasks queued behind it
+        self._isolation = threading.Semaphore(1)
+
+    def map_tasks(self, func, tasks: list, expected: list = None) -> list:
+        """
+        Applies func to every task (a tuple of arguments) and blocks until all
+        of them are done.
+
+        Once every task is submitted, a task still running after
+        SPECULATION_MULTIPLIER times its expected seconds (and at least
+        SPECULATION_MIN_SECONDS) is speculatively submitted a second time to
+        an idle worker of the pool. The first of the two runs to complete
+        gives the result, so a straggler does not hold back the end of the
+        job.
+
+        :param list expected: estimated seconds of every task, disables
+            speculative execution when not given
+        :return: list of results in the order of tasks, None for the tasks
+            that raised an exception or killed their worker
+        """
+        results = [None] * len(tasks)
+        finished = [False] * len(tasks)
+        speculated = [False] * len(tasks)
+        started = [None] * len(tasks)
+        # runs of every task in flight
+        runs = [0] * len(tasks)
+        events = queue.Queue()
+
+        def finish(index, result):
+            # under self._lock
+            if finished[index]:
+                return
+            finished[index] = True
+            results[index] = result
+            events.put(('done', index))
+
+        def on_done(index, isolated, executor):
+            def callback(future):
+                exp = future.exception() if not future.cancelled() else \
+                    BrokenProcessPool('Task cancelled')
+                broken = isinstance(exp, BrokenProcessPool)
+                self._slots.release()
+                if isolated:
+                    self._isolation.release()
+                failed = False
+                with self._lock:
+                    if not isolated:
+                        self._in_flight -= 1
+                        self._completions.append(time.time())
+                    runs[index] -= 1
+                    if exp is None:
+                        finish(index, future.result())
+                    elif broken and not isolated and not finished[index]:
+                        runs[index] += 1
+                        events.put(('isolate', index))
+                    elif runs[index] == 0 and not finished[index]:
+                        # no other run of the task is still in flight
+                        finish(index, None)
+                        failed = True
+                if broken:
+                    self._restart(isolated, executor)
+                if failed:
+                    syslog.openlog(ident="CerebralCortex-Driver")
+                    syslog.syslog(LOG_ERR, 'Worker task failed %s' %
+                                  str(exp))
+                    syslog.closelog()
+            return callback
+
+        def submit(index, isolated=False):
+            while True:
+                with self._lock:
+                    executor = self._pools[isolated]
+                    if executor is None:
+                        executor = self._pools[isolated] = \
+                            ProcessPoolExecutor(1)
+                try:
+                    future = executor.submit(_run_task, self._initializer,
+                                             self._initargs, func,
+                                             tasks[index])
+                    break
+                except (BrokenProcessPool, RuntimeError):
+                    # the pool broke, or was replaced after breaking
+                    self._restart(isolated, executor)
+            if not isolated:
+                with self._lock:
+                    self._in_flight += 1
+            future.add_done_callback(on_done(index, isolated, executor))
+
+        for index in range(len(tasks)):
+            self._slots.acquire()
+            with self._lock:
+                # the pool starts tasks in submission order: this one starts
+                # once enough of the tasks ahead of it, from all the jobs,
+                # completed to free a worker
+                started[index] = (len(self._completions), self._in_flight,
+                                  time.time())
+                runs[index] += 1
+            submit(index)
+
+        remaining = len(tasks)
+        while remaining:
+            try:
+                event, index = events.get(timeout=SPECULATION_POLL)
+            except queue.Empty:
+                if expected is None:
+                    continue
+                for index in self._stragglers(started, finished, speculated,
+                                              expected):
+                    if not self._slots.acquire(blocking=False):
+                        break
+                    print('Speculatively re-running task', tasks[index][:1])
+                    with self._lock:
+                        speculated[index] = True
+                        runs[index] += 1
+                    submit(index)
+                continue
+            if event == 'done':
+                remaining -= 1
+                continue
+            print('Re-running task', tasks[index][:1], 'alone after a '
+                  'worker died')
+            self._slots.acquire()
+            self._isolation.acquire()
+            submit(index, isolated=True)
+        return results
+
+    def _restart(self, isolated, executor):
+        """
+        Replaces a broken pool by a new one, unless another thread already
+        did.
+        """
+        with self._lock:
+            if self._pools[isolated] is not executor:
+                return
+            self._pools[isolated] = ProcessPoolExecutor(
+                1 if isolated else self.num_workers)
+        executor.shutdown(wait=False)
+
+    def _stragglers(self, started, finished, speculated, expected) -> list:
+        with self._lock:
+            if self._in_flight >= self.num_workers:
+                return []
+            completions = self._completions
+            now = time.time()
+            stragglers = []
+            for index in range(len(started)):
+                if finished[index] or speculated[index]:
+                    continue
+                completed, ahead, start = started[index]
+                needed = ahead - self.num_workers + 1
+                if needed > 0:
+                    if completed + needed > len(completions):
+                        continue
+                    start = completions[completed + needed - 1]
+                limit = max(SPECULATION_MIN_SECONDS,
+                            SPECULATION_MULTIPLIER * expected[index])
+                if now - start > limit:
+                    stragglers.append(index)
+            return stragglers
+
+    def close(self, wait=True):
+        with self._lock:
+            pools = [pool for pool in self._pools.values()
+                     if pool is not None]
+        for pool in pools:
+            pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close(wait=exc_type is None)
+
+
+_initialized = False
+
+
+def _run_task(initializer, initargs, func, args):
+    """
+    Runs a task in a worker process, calling the initializer of the pool
+    first in a new worker.
+    """
+    global _initialized
+    if not _initialized:
+        _initialized = True
+        if initializer is not None:
+            initializer(*initargs)
+    return func(*args)
+
+
+def import_feature_modules(module_names: list):
+    """
+    Worker initializer which imports the feature modules once per worker
+    process instead of once per task.
+    """
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+        except Exception as exp:
+            syslog.openlog(ident="CerebralCortex-Driver")
+            syslog.syslog(LOG_ERR, str(exp) + '\n' +
+                          str(traceback.format_exc()))
+            syslog.closelog()
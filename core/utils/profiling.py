@@ -0,0 +1,327 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import csv
+import json
+import os
+import pickle
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+from core.utils.scheduler import feature_name
+
+# operations measured around a feature run on a user-day
+PROCESS = 'process'
+GET_STREAM = 'get_stream'
+INFERENCE = 'inference'
+STORE = 'store'
+OPERATIONS = [PROCESS, GET_STREAM, INFERENCE, STORE]
+
+# number of data points pickled to estimate the size of a stream
+SIZE_SAMPLE_POINTS = 100
+
+REPORT_FIELDS = ['feature', 'user', 'day', 'operation', 'count', 'wall_time',
+                 'cpu_time', 'points', 'bytes', 'points_per_second',
+                 'peak_rss', 'peak_rss_scope']
+
+_active = threading.local()
+
+
+def estimate_bytes(data: list) -> int:
+    """
+    Estimates the serialized size of a list of data points from the pickled
+    size of its first points, pickling the whole stream being too costly.
+    """
+    if not data:
+        return 0
+    sample = data[:SIZE_SAMPLE_POINTS]
+    try:
+        size = len(pickle.dumps([(dp.start_time, dp.end_time, dp.offset,
+                                  dp.sample) for dp in sample], protocol=4))
+    except Exception:
+        return 0
+    return int(size * len(data) / len(sample))
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the current process to its current
+    resident set size, so that peak_rss measures the peak of what runs next
+    rather than of the whole life of a reused worker. Needs Linux 4.0 or
+    later.
+
+    :return: True if the peak was reset
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """
+    :return: peak resident set size of the current process in bytes since
+        its start or the last reset_peak_rss
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux, and never reset
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler(object):
+    """
+    Accumulates the wall time, CPU time, points and bytes of the operations of
+    one feature run on a user-day. Operations may be added from several
+    threads, e.g. the stores of a StreamWriter.
+
+    The peak RSS of the process is reset when the profiler is created, so
+    that the peak recorded is the one of the run. Where it cannot be reset,
+    the peak over the life of the process is recorded instead, with
+    peak_rss_scope 'process'.
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self._lock = threading.Lock()
+        self.peak_rss_scope = 'task' if reset_peak_rss() else 'process'
+
+    def add(self, operation: str, wall_time: float, cpu_time: float,
+            points: int = 0, nbytes: int = 0):
+        with self._lock:
+            stats = self.operations.setdefault(operation, {
+                'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0, 'points': 0,
+                'bytes': 0})
+            stats['count'] += 1
+            stats['wall_time'] += wall_time
+            stats['cpu_time'] += cpu_time
+            stats['points'] += points
+            stats['bytes'] += nbytes
+
+    @contextmanager
+    def measure(self, operation: str):
+        """
+        Measures the enclosed block. The yielded dict can be given 'points'
+        and 'bytes' for the data handled by the block.
+        """
+        counts = {}
+        wall_start = time.time()
+        cpu_start = time.process_time()
+        try:
+            yield counts
+        finally:
+            self.add(operation, time.time() - wall_start,
+                     time.process_time() - cpu_start,
+                     counts.get('points', 0), counts.get('bytes', 0))
+
+    def record(self, module_name: str, user: str, days: list) -> dict:
+        """
+        :return: the profile of the run, with the peak RSS of the worker
+            process during the run, or during its whole life for the
+            'process' peak_rss_scope
+        """
+        return {'feature': feature_name(module_name), 'user': str(user),
+                'day': days[0] if len(days) == 1 else '*',
+                'peak_rss': peak_rss(), 'peak_rss_scope': self.peak_rss_scope,
+                'operations': self.operations}
+
+
+@contextmanager
+def profiling(profiler: Profiler):
+    """
+    Makes profiler the one used by profile_section in the current thread.
+    """
+    previous = getattr(_active, 'profiler', None)
+    _active.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _active.profiler = previous
+
+
+@contextmanager
+def profile_section(operation: str):
+    """
+    Measures the enclosed block as the given operation of the feature being
+    profiled, e.g. around model inference:
+
+        with profile_section(INFERENCE) as counts:
+            preds = clf.predict(X)
+            counts['points'] = len(X)
+
+    Does nothing when the feature is not profiled.
+    """
+    profiler = getattr(_active, 'profiler', None)
+    if profiler is None:
+        yield {}
+        return
+    with profiler.measure(operation) as counts:
+        yield counts
+
+
+class ProfilingCC(object):
+    """
+    Wraps the CerebralCortex object passed to a feature and measures its
+    stream reads and writes. Every other attribute is delegated to the
+    wrapped object.
+    """
+
+    def __init__(self, CC, profiler: Profiler):
+        self.CC = CC
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.CC, name)
+
+    def get_stream(self, *args, **kwargs):
+        with self.profiler.measure(GET_STREAM) as counts:
+            ds = self.CC.get_stream(*args, **kwargs)
+            data = getattr(ds, 'data', None) or []
+            counts['points'] = len(data)
+            counts['bytes'] = estimate_bytes(data)
+        return ds
+
+    def get_stream_timeseries(self, *args, **kwargs):
+        get_stream_timeseries = getattr(self.CC, 'get_stream_timeseries',
+                                        None)
+        if get_stream_timeseries is None:
+            return None
+        with self.profiler.measure(GET_STREAM) as counts:
+            timeseries = get_stream_timeseries(*args, **kwargs)
+            if timeseries is not None:
+                counts['points'] = len(timeseries)
+                counts['bytes'] = timeseries.timestamps.nbytes + \
+                    timeseries.samples.nbytes
+        return timeseries
+
+    def save_stream(self, datastream, *args, **kwargs):
+        with self.profiler.measure(STORE) as counts:
+            data = datastream.data or []
+            counts['points'] = len(data)
+            counts['bytes'] = estimate_bytes(data)
+            return self.CC.save_stream(datastream, *args, **kwargs)
+
+
+class ProfileReport(object):
+    """
+    Collects the profiles returned by the tasks of a run and writes them as a
+    JSON or CSV report, depending on the extension of report_file.
+    """
+
+    def __init__(self, report_file: str):
+        self.report_file = report_file
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+
+    def rows(self) -> list:
+        """
+        :return: one row per feature, user-day and operation
+        """
+        rows = []
+        for record in self.records:
+            for operation, stats in sorted(record['operations'].items()):
+                row = {'feature': record['feature'], 'user': record['user'],
+                       'day': record['day'], 'operation': operation,
+                       'peak_rss': record['peak_rss'],
+                       'peak_rss_scope': record.get('peak_rss_scope',
+                                                    'process')}
+                row.update(stats)
+                row['points_per_second'] = _rate(stats)
+                rows.append(row)
+        return rows
+
+    def summary(self) -> dict:
+        """
+        :return: feature -> operation -> totals over all user-days, and the
+            maximum peak RSS seen per feature
+        """
+        summary = {}
+        for record in self.records:
+            feature = summary.setdefault(record['feature'],
+                                         {'runs': 0, 'peak_rss': 0,
+                                          'operations': {}})
+            feature['runs'] += 1
+            feature['peak_rss'] = max(feature['peak_rss'],
+                                      record['peak_rss'])
+            for operation, stats in record['operations'].items():
+                total = feature['operations'].setdefault(operation, {
+                    'count': 0, 'wall_time': 0.0, 'cpu_time': 0.0,
+                    'points': 0, 'bytes': 0})
+                for k in total:
+                    total[k] += stats[k]
+        for feature in summary.values():
+            for total in feature['operations'].values():
+                total['points_per_second'] = _rate(total)
+        return summary
+
+    def print_summary(self):
+        print('-' * 120)
+        print('Profile summary (seconds, points, MB)')
+        print('%-32s %-10s %8s %10s %10s %12s %10s %12s' %
+              ('feature', 'operation', 'count', 'wall', 'cpu', 'points',
+               'MB', 'points/s'))
+        for name, feature in sorted(self.summary().items()):
+            for operation in OPERATIONS:
+                total = feature['operations'].get(operation)
+                if total is None:
+                    continue
+                print('%-32s %-10s %8d %10.1f %10.1f %12d %10.1f %12.0f' %
+                      (name, operation, total['count'], total['wall_time'],
+                       total['cpu_time'], total['points'],
+                       total['bytes'] / 1e6, total['points_per_second']))
+            print('%-32s peak RSS %.1f MB' % (name, feature['peak_rss'] / 1e6))
+        print('-' * 120)
+
+    def save(self):
+        if not self.report_file:
+            return
+        tmp_file = self.report_file + '.tmp'
+        if self.report_file.endswith('.csv'):
+            with open(tmp_file, 'w', newline='') as f:
+                writer = csv.DictWriter(f, REPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(self.rows())
+        else:
+            with open(tmp_file, 'w') as f:
+                json.dump({'records': self.records,
+                           'summary': self.summary()}, f, indent=1)
+        os.replace(tmp_file, self.report_file)
+
+
+def _rate(stats: dict) -> float:
+    if stats['wall_time'] <= 0:
+        return 0.0
+    return stats['points'] / stats['wall_time']
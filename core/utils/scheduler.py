@@ -0,0 +1,238 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import importlib
+import syslog
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from syslog import LOG_ERR
+
+# Features that compute over a range of days for a user rather than a single
+# day. These are parallelized per user only.
+USER_LEVEL_FEATURES = ['sleep_duration_analysis', 'office_time',
+                       'phone_screen_touch_features', 'socialjetlag',
+                       'gps_location_daywise', 'gps']
+
+
+def feature_name(module_name: str) -> str:
+    """
+    Returns the short feature name (the directory under core/feature) of a
+    feature module, e.g. 'core.feature.gps.gps' -> 'gps'
+    """
+    return module_name.split('.')[-1]
+
+
+def is_user_level_feature(module_name: str) -> bool:
+    """
+    Returns True if the feature processes a range of days per user instead of
+    a single user-day.
+    """
+    return feature_name(module_name) in USER_LEVEL_FEATURES
+
+
+def get_feature_dependencies(module_name: str) -> list:
+    """
+    Returns the names of the features declared in the 'feature_dependencies'
+    attribute of a feature module. Modules without the declaration do not
+    depend on any other feature.
+    """
+    try:
+        module = importlib.import_module(module_name)
+    except Exception as exp:
+        syslog.openlog(ident="CerebralCortex-Driver")
+        syslog.syslog(LOG_ERR, 'Could not read dependencies of %s %s' %
+                      (module_name, str(exp)))
+        syslog.closelog()
+        return []
+    return list(getattr(module, 'feature_dependencies', []))
+
+
+def build_dependency_graph(feature_list: list, dependencies=None) -> dict:
+    """
+    Builds the dependency graph of the selected features.
+
+    :param list feature_list: dotted feature module names
+    :param dependencies: callable returning the dependency names of a module,
+        defaults to reading the module's 'feature_dependencies'
+    :return: dict mapping every module name to the set of module names in
+        feature_list it depends on. Dependencies on features that are not
+        selected for this run are ignored.
+    """
+    if dependencies is None:
+        dependencies = get_feature_dependencies
+    by_name = {feature_name(m): m for m in feature_list}
+    graph = {}
+    for module in feature_list:
+        graph[module] = set(by_name[d] for d in dependencies(module)
+                            if d in by_name and by_name[d] != module)
+    return graph
+
+
+def topological_order(feature_list: list, graph: dict) -> list:
+    """
+    Orders the features so that every feature comes after all the features it
+    depends on. Ties are resolved by the order of feature_list.
+
+    :raises ValueError: if the dependencies contain a cycle
+    """
+    remaining = {m: set(graph.get(m, ())) for m in feature_list}
+    order = []
+    while remaining:
+        ready = [m for m in feature_list if m in remaining and
+                 not remaining[m]]
+        if not ready:
+            raise ValueError('Cyclic feature dependencies: %s' %
+                             ', '.join(sorted(remaining)))
+        for module in ready:
+            del remaining[module]
+            order.append(module)
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+
+class FeatureJob(object):
+    """
+    A unit of scheduling. A job either contains a single user level feature or
+    a pipeline of per-day features which are run one after another inside the
+    same user-day task, so a downstream feature starts on a user-day as soon
+    as its upstream features have written their output for that user-day.
+    """
+
+    def __init__(self, modules: list, user_level: bool):
+        self.modules = modules
+        self.user_level = user_level
+        self.depends_on = set()
+
+    def __repr__(self):
+        return 'FeatureJob(%s)' % ','.join(feature_name(m)
+                                           for m in self.modules)
+
+
+def plan_jobs(order: list, graph: dict, fuse: bool = False) -> list:
+    """
+    Groups topologically ordered features into jobs.
+
+    A per-day feature joins the pipeline of its upstream features when all of
+    them are per-day features of one and the same pipeline. Every other
+    feature starts a new job whose dependencies are the jobs of its upstream
+    features.
+
+    :param bool fuse: additionally fuse all per-day features that do not
+        depend on a user level feature into a single job, so each user-day
+        task runs all of them in one pass over the raw streams
+    :return: list of FeatureJob in a valid execution order
+    """
+    jobs = []
+    job_of = {}
+    fused_job = None
+    for module in order:
+        upstream_jobs = set(job_of[d] for d in graph.get(module, ()))
+        user_level = is_user_level_feature(module)
+        if not user_level and fuse and \
+                (not upstream_jobs or upstream_jobs == {fused_job}):
+            if fused_job is None:
+                fused_job = FeatureJob([], False)
+                jobs.append(fused_job)
+            fused_job.modules.append(module)
+            job_of[module] = fused_job
+            continue
+        if not user_level and len(upstream_jobs) == 1:
+            job = next(iter(upstream_jobs))
+            if not job.user_level:
+                job.modules.append(module)
+                job_of[module] = job
+                continue
+        job = FeatureJob([module], user_level)
+        job.depends_on = upstream_jobs
+        jobs.append(job)
+        job_of[module] = job
+    return jobs
+
+
+class JobsFailed(Exception):
+    """
+    Raised by run_jobs once all the jobs are done when some of them failed.
+    failures maps every failed or skipped FeatureJob to its exception.
+    unrecorded_users holds the users whose tasks in these jobs got no
+    outcome recorded anywhere, filled in by the driver.
+    """
+
+    def __init__(self, failures: dict):
+        self.failures = failures
+        self.unrecorded_users = set()
+        super().__init__('%d jobs failed: %s' % (
+            len(failures), ', '.join('%s %s' % (job, exp)
+                                     for job, exp in failures.items())))
+
+
+def run_jobs(jobs: list, run_job, max_concurrent_jobs: int = None):
+    """
+    Runs the jobs on a thread pool. Each job is started as soon as all the jobs
+    it depends on have finished, so independent jobs run concurrently. A job
+    depending on a failed job is skipped.
+
+    :param list jobs: FeatureJob list as returned by plan_jobs
+    :param run_job: callable executing a single FeatureJob
+    :param int max_concurrent_jobs: limit on the jobs running at the same
+        time, defaults to no limit
+    :raises JobsFailed: when some jobs failed, after all the others are done
+    """
+    if not jobs:
+        return
+    finished = {job: threading.Event() for job in jobs}
+    slots = threading.BoundedSemaphore(max_concurrent_jobs or len(jobs))
+    failures = {}
+    lock = threading.Lock()
+
+    def execute(job):
+        try:
+            for upstream in job.depends_on:
+                finished[upstream].wait()
+            with lock:
+                failed = [str(upstream) for upstream in job.depends_on
+                          if upstream in failures]
+            if failed:
+                raise RuntimeError('skipped after the failure of %s' %
+                                   ', '.join(sorted(failed)))
+            with slots:
+                run_job(job)
+        except Exception as exp:
+            with lock:
+                failures[job] = exp
+            err = 'Job %s failed %s\n%s' % (str(job), str(exp),
+                                            traceback.format_exc())
+            print(err)
+            syslog.openlog(ident="CerebralCortex-Driver")
+            syslog.syslog(LOG_ERR, err)
+            syslog.closelog()
+        finally:
+            finished[job].set()
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        for job in jobs:
+            executor.submit(execute, job)
+    if failures:
+        raise JobsFailed(failures)
@@ -0,0 +1,151 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import copy
+import threading
+from collections import OrderedDict
+
+from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+
+# approximate memory in bytes of a cached DataPoint: the object, its start
+# time datetime, offset and a small sample
+DATAPOINT_BYTES = 200
+
+# default bound on the DataPoints cached by a task, about 1 GB, so that a
+# cache sharing an executor with other tasks does not exhaust its memory
+MAX_CACHED_POINTS = 5000000
+
+
+class StreamCache(object):
+    """
+    Read-through cache in front of a CerebralCortex object.
+
+    Several features read the same raw streams (e.g. the MotionSense HRV
+    accelerometer, gyroscope and raw byte streams) for the same user-day.
+    When they run inside one task with a shared StreamCache each stream is
+    fetched from storage only once. Every other attribute is delegated to the
+    wrapped CerebralCortex object, so the cache can be passed to a feature in
+    place of CC.
+
+    Callers get a copy of the cached DataStream with its own DataPoints, and
+    own copies of list samples, so features modifying the list, the points
+    or their samples (e.g. phone_features unwrapping single value samples)
+    do not leak into other features.
+    Cached entries of a stream are dropped when a stream with the same
+    identifier is saved through the cache. Saves may come from another
+    thread, e.g. a StreamWriter, so the cache bookkeeping is locked.
+    """
+
+    def __init__(self, CC, max_points: int = MAX_CACHED_POINTS):
+        """
+        :param CC: CerebralCortex object to read from
+        :param int max_points: upper bound on the number of cached DataPoints,
+            the least recently used streams are evicted beyond it
+        """
+        self.CC = CC
+        self.max_points = max_points
+        self.hits = 0
+        self.misses = 0
+        self._streams = OrderedDict()
+        self._cached_points = 0
+        self._stream_ids = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.CC, name)
+
+    def get_stream(self, stream_id=None, user_id=None, day=None,
+                   start_time=None, end_time=None, localtime=True,
+                   data_type=DataSet.COMPLETE):
+        key = (str(stream_id), str(user_id), day, start_time, end_time,
+               localtime, data_type)
+        with self._lock:
+            cached = self._streams.get(key)
+            if cached is not None:
+                self.hits += 1
+                self._streams.move_to_end(key)
+            else:
+                self.misses += 1
+        if cached is not None:
+            return self._copy(cached)
+
+        datastream = self.CC.get_stream(stream_id, user_id=user_id, day=day,
+                                        start_time=start_time,
+                                        end_time=end_time,
+                                        localtime=localtime,
+                                        data_type=data_type)
+        if datastream is None:
+            return datastream
+        size = len(datastream.data) if datastream.data else 0
+        if size <= self.max_points:
+            with self._lock:
+                if key in self._streams:
+                    self._drop(key)
+                self._streams[key] = datastream
+                self._cached_points += size
+                self._evict()
+        return self._copy(datastream)
+
+    def get_stream_id(self, user_id, stream_name):
+        key = (str(user_id), stream_name)
+        stream_ids = self._stream_ids.get(key)
+        if stream_ids is None:
+            stream_ids = self.CC.get_stream_id(user_id, stream_name)
+            with self._lock:
+                self._stream_ids[key] = stream_ids
+        return list(stream_ids)
+
+    def save_stream(self, datastream, *args, **kwargs):
+        identifier = str(datastream.identifier)
+        with self._lock:
+            for key in [k for k in self._streams if k[0] == identifier]:
+                self._drop(key)
+            self._stream_ids.clear()
+        return self.CC.save_stream(datastream, *args, **kwargs)
+
+    def clear(self):
+        """
+        Drops all cached streams.
+        """
+        with self._lock:
+            self._streams.clear()
+            self._stream_ids.clear()
+            self._cached_points = 0
+
+    def _copy(self, datastream):
+        result = copy.copy(datastream)
+        result.data = [DataPoint(dp.start_time, dp.end_time, dp.offset,
+                                 dp.sample[:] if type(dp.sample) is list
+                                 else dp.sample)
+                       for dp in datastream.data or []]
+        return result
+
+    def _drop(self, key):
+        datastream = self._streams.pop(key)
+        self._cached_points -= len(datastream.data) if datastream.data else 0
+
+    def _evict(self):
+        while self._cached_points > self.max_points and self._streams:
+            self._drop(next(iter(self._streams)))
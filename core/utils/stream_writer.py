@@ -0,0 +1,207 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+import threading
+import time
+import traceback
+
+
+class StoreError(Exception):
+    """
+    Raised by StreamWriter when some of the buffered streams could not be
+    saved.
+    """
+    pass
+
+
+class StreamWriter(object):
+    """
+    Write-behind buffer for the DataStreams stored by a feature.
+
+    Streams handed to write are saved to CerebralCortex by a background thread
+    so that the writes overlap with the computation of the feature. The
+    thread saves the buffered streams in one batch once batch_points data
+    points are buffered or the oldest buffered stream waited batch_seconds,
+    and whenever flush is called. write blocks while more than
+    max_pending_points data points are waiting to be saved.
+
+    Failed saves are logged like synchronous ones and reported by raising a
+    StoreError from the next write, flush or close.
+
+    A stream saved through the writer can only be read back after flush,
+    ComputeFeatureBase flushes the writer of a feature before it reads a
+    stream with pending writes.
+    """
+
+    def __init__(self, CC, batch_points: int = 200000,
+                 batch_seconds: float = 5.0,
+                 max_pending_points: int = 2000000):
+        self.CC = CC
+        self.batch_points = batch_points
+        self.batch_seconds = batch_seconds
+        self.max_pending_points = max_pending_points
+        self.saved_streams = 0
+        self.saved_points = 0
+        self._cond = threading.Condition()
+        self._queued = []
+        self._queued_points = 0
+        self._oldest = None
+        self._inflight = False
+        self._inflight_batch = []
+        self._inflight_points = 0
+        self._flush_requested = False
+        self._closed = False
+        self._errors = []
+        self._thread = threading.Thread(target=self._run,
+                                        name='StreamWriter', daemon=True)
+        self._thread.start()
+
+    def write(self, datastream, localtime=True):
+        points = len(datastream.data) if datastream.data else 0
+        with self._cond:
+            if self._closed:
+                raise StoreError('StreamWriter is closed')
+            self._raise_errors()
+            # backpressure, a single stream larger than the limit is
+            # accepted once nothing else is pending
+            while (self._queued or self._inflight) and \
+                    self._queued_points + self._inflight_points + points > \
+                    self.max_pending_points:
+                self._cond.wait()
+            if not self._queued:
+                self._oldest = time.time()
+            self._queued.append((datastream, localtime))
+            self._queued_points += points
+            self._cond.notify_all()
+
+    def is_pending(self, owner, name) -> bool:
+        """
+        :return: whether a stream of the given owner and name is waiting to
+            be saved
+        """
+        with self._cond:
+            return any(str(datastream.owner) == str(owner) and
+                       datastream.name == name
+                       for datastream, _ in self._queued +
+                       self._inflight_batch)
+
+    def flush(self):
+        """
+        Waits until all the buffered streams are saved.
+
+        :raises StoreError: if some of the streams could not be saved
+        """
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._queued or self._inflight:
+                self._cond.wait()
+            self._flush_requested = False
+            self._raise_errors()
+
+    def close(self, raise_errors=True):
+        """
+        Flushes the buffered streams and stops the background thread. Closing
+        a closed writer does nothing.
+
+        :raises StoreError: with raise_errors set, if some of the streams
+            could not be saved
+        """
+        if self._closed:
+            return
+        try:
+            if raise_errors:
+                self.flush()
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+            self._thread.join()
+        if raise_errors:
+            with self._cond:
+                self._raise_errors()
+
+    def _raise_errors(self):
+        if self._errors:
+            errors = self._errors
+            self._errors = []
+            raise StoreError('%d streams could not be saved: %s' %
+                             (len(errors), '; '.join(errors)))
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._queued and (
+                        self._closed or self._flush_requested or
+                        self._queued_points >= self.batch_points or
+                        time.time() - self._oldest >= self.batch_seconds):
+                    break
+                if self._closed:
+                    return None
+                timeout = None
+                if self._queued:
+                    timeout = self.batch_seconds - (time.time() -
+                                                    self._oldest)
+                self._cond.wait(timeout)
+            batch = self._queued
+            self._inflight = True
+            self._inflight_batch = batch
+            self._inflight_points = self._queued_points
+            self._queued = []
+            self._queued_points = 0
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            errors = []
+            for datastream, localtime in batch:
+                errors.extend(self._save(datastream, localtime))
+            with self._cond:
+                self._errors.extend(errors)
+                self._inflight = False
+                self._inflight_batch = []
+                self._inflight_points = 0
+                self._cond.notify_all()
+
+    def _save(self, datastream, localtime):
+        try:
+            self.CC.save_stream(datastream=datastream, localtime=localtime)
+            self.saved_streams += 1
+            self.saved_points += len(datastream.data)
+            self.CC.logging.log('Saved %d data points stream id %s user_id '
+                                '%s' % (len(datastream.data),
+                                        str(datastream.identifier),
+                                        str(datastream.owner)))
+            return []
+        except Exception as exp:
+            try:
+                self.CC.logging.log(str(exp) + "\n" +
+                                    str(traceback.format_exc()) + '\n' +
+                                    str(datastream.name))
+            except Exception:
+                pass
+            return ['%s %s: %s' % (str(datastream.name),
+                                   str(datastream.identifier), str(exp))]
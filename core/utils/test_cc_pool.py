@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+
+from core.utils import cc_pool
+
+CONFIG = 'test_cc_pool/cc_configuration.yml'
+
+
+class Connection(object):
+
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    def shutdown(self):
+        self.calls.append(self.name + '.shutdown')
+
+    def close(self):
+        self.calls.append(self.name + '.close')
+
+    def _remove_connections(self):
+        self.calls.append(self.name + '._remove_connections')
+
+
+class Store(object):
+    pass
+
+
+class StorageCerebralCortex(object):
+    """
+    CerebralCortex object holding its storage connections
+    """
+
+    def __init__(self, cc_config_path):
+        self.calls = []
+        self.SqlData = Store()
+        self.SqlData.pool = Connection(self.calls, 'pool')
+        self.RawData = Store()
+        self.RawData.session = Connection(self.calls, 'session')
+        self.RawData.cluster = Connection(self.calls, 'cluster')
+        self.TimeSeriesData = Store()
+        self.TimeSeriesData.client = Connection(self.calls, 'client')
+
+
+class ClosingCerebralCortex(StorageCerebralCortex):
+    """
+    CerebralCortex object with a close method of its own
+    """
+
+    def close(self):
+        self.calls.append('close')
+
+
+class TestClose(unittest.TestCase):
+
+    def tearDown(self):
+        cc_pool._pool.pop(CONFIG, None)
+
+    def test_closes_storage_connections(self):
+        CC = StorageCerebralCortex(CONFIG)
+        pooled = mock.Mock(CC=CC)
+        self.assertEqual(4, cc_pool._close(pooled))
+        self.assertEqual(['pool._remove_connections', 'session.shutdown',
+                          'cluster.shutdown', 'client.close'], CC.calls)
+
+    def test_prefers_close_method(self):
+        CC = ClosingCerebralCortex(CONFIG)
+        self.assertEqual(1, cc_pool._close(mock.Mock(CC=CC)))
+        self.assertEqual(['close'], CC.calls)
+
+    def test_logs_when_nothing_was_closed(self):
+        with mock.patch.object(cc_pool.syslog, 'syslog') as log:
+            self.assertEqual(0, cc_pool._close(mock.Mock(CC=object())))
+        self.assertEqual(1, log.call_count)
+
+    def test_broken_object_is_closed_once_released(self):
+        with mock.patch.object(cc_pool, 'CerebralCortex',
+                               StorageCerebralCortex):
+            outer = cc_pool.get_cerebralcortex(CONFIG)
+            inner = cc_pool.get_cerebralcortex(CONFIG)
+            self.assertIs(outer, inner)
+            cc_pool.release_cerebralcortex(CONFIG, broken=True)
+            # still used by the outer task
+            self.assertEqual([], outer.calls)
+            cc_pool.release_cerebralcortex(CONFIG)
+            self.assertEqual(4, len(outer.calls))
+            self.assertIsNot(outer, cc_pool.get_cerebralcortex(CONFIG))
+            cc_pool.release_cerebralcortex(CONFIG)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+
+from core.utils.failures import TaskTimeout, time_limit
+
+
+def swallowing_feature(seconds):
+    '''
+    A feature catching every Exception in its loop, as many features do.
+    '''
+    end = time.time() + seconds
+    while time.time() < end:
+        try:
+            time.sleep(0.01)
+        except Exception:
+            pass
+
+
+def bare_except_feature(seconds):
+    '''
+    A feature catching everything once, then running on.
+    '''
+    try:
+        swallowing_feature(seconds)
+    except:
+        pass
+    swallowing_feature(seconds)
+
+
+class TestTimeLimit(unittest.TestCase):
+
+    def assertTimesOut(self, feature):
+        start = time.time()
+        with self.assertRaises(TaskTimeout):
+            with time_limit(0.1):
+                feature(5)
+        self.assertLess(time.time() - start, 4)
+
+    def test_except_exception(self):
+        self.assertTimesOut(swallowing_feature)
+
+    def test_bare_except(self):
+        self.assertTimesOut(bare_except_feature)
+
+    def test_no_timeout(self):
+        with time_limit(1):
+            swallowing_feature(0.05)
+        time.sleep(1.2)
+
+    def test_thread(self):
+        errors = []
+
+        def run():
+            try:
+                self.assertTimesOut(swallowing_feature)
+                self.assertTimesOut(bare_except_feature)
+                with time_limit(0.5):
+                    swallowing_feature(0.05)
+                time.sleep(1)
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual([], errors)
+
+if __name__ == '__main__':
+    unittest.main()
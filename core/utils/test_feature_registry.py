@@ -0,0 +1,18 @@
+import unittest
+
+from core.utils.feature_registry import FEATURES, feature_module, \
+    scan_features
+
+
+class TestFeatureRegistry(unittest.TestCase):
+
+    def test_registry_is_up_to_date(self):
+        # regenerate with python3 -m core.utils.feature_registry
+        self.assertEqual(scan_features(), sorted(FEATURES))
+
+    def test_feature_module(self):
+        self.assertEqual('core.feature.gps.gps', feature_module('gps'))
+
+
+if __name__ == '__main__':
+    unittest.main()
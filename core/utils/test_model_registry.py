@@ -0,0 +1,28 @@
+import importlib
+import unittest
+
+from core.utils.feature_registry import FEATURES, feature_module
+from core.utils.model_registry import get_feature_models, get_model
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def test_declared_models_load(self):
+        for name in FEATURES:
+            module = importlib.import_module(feature_module(name))
+            for resource_name in getattr(module, 'feature_models', []):
+                with self.subTest(feature=name, model=resource_name):
+                    self.assertIsNotNone(get_model(resource_name))
+
+    def test_missing_models_are_not_shipped(self):
+        module = 'core.feature.example_feature.example_feature'
+        features = importlib.import_module(module)
+        features.feature_models.append('core/resources/models/missing.model')
+        try:
+            self.assertEqual([], get_feature_models([module]))
+        finally:
+            features.feature_models.pop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import threading
+import unittest
+
+from core.utils.scheduler import JobsFailed, build_dependency_graph, \
+    plan_jobs, run_jobs, topological_order
+
+
+DEPENDENCIES = {
+    'core.feature.activity.activity': [],
+    'core.feature.activity_features.activity_features': ['activity'],
+    'core.feature.rr_interval.rr_interval': [],
+    'core.feature.stress_from_wrist.stress_from_wrist': ['activity',
+                                                         'rr_interval'],
+    'core.feature.gps.gps': [],
+    'core.feature.gps_daily.gps_daily': ['gps'],
+}
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.features = list(reversed(sorted(DEPENDENCIES)))
+        self.graph = build_dependency_graph(self.features,
+                                            DEPENDENCIES.get)
+
+    def test_topological_order(self):
+        order = topological_order(self.features, self.graph)
+        self.assertEqual(len(self.features), len(order))
+        for module, deps in self.graph.items():
+            for dep in deps:
+                self.assertLess(order.index(dep), order.index(module))
+
+    def test_unselected_dependencies_are_ignored(self):
+        graph = build_dependency_graph(
+            ['core.feature.gps_daily.gps_daily'], DEPENDENCIES.get)
+        self.assertEqual({'core.feature.gps_daily.gps_daily': set()}, graph)
+
+    def test_cycle(self):
+        graph = {'a': {'b'}, 'b': {'a'}}
+        self.assertRaises(ValueError, topological_order, ['a', 'b'], graph)
+
+    def test_plan_jobs(self):
+        order = topological_order(self.features, self.graph)
+        jobs = plan_jobs(order, self.graph)
+        modules = [job.modules for job in jobs]
+        # activity_features runs in the activity pipeline, stress_from_wrist
+        # has two upstream pipelines and gets its own job
+        self.assertIn(['core.feature.activity.activity',
+                       'core.feature.activity_features.activity_features'],
+                      modules)
+        gps_job = [job for job in jobs if job.modules ==
+                   ['core.feature.gps.gps']][0]
+        self.assertTrue(gps_job.user_level)
+        gps_daily_job = [job for job in jobs if job.modules ==
+                         ['core.feature.gps_daily.gps_daily']][0]
+        self.assertEqual({gps_job}, gps_daily_job.depends_on)
+
+    def test_plan_fused_jobs(self):
+        order = topological_order(self.features, self.graph)
+        jobs = plan_jobs(order, self.graph, fuse=True)
+        fused = [job for job in jobs if len(job.modules) > 1]
+        self.assertEqual(1, len(fused))
+        self.assertEqual(set(), fused[0].depends_on)
+        self.assertEqual(4, len(fused[0].modules))
+        self.assertNotIn('core.feature.gps_daily.gps_daily',
+                         fused[0].modules)
+
+    def test_run_jobs_respects_dependencies(self):
+        order = topological_order(self.features, self.graph)
+        jobs = plan_jobs(order, self.graph)
+        executed = []
+        run_jobs(jobs, lambda job: executed.extend(job.modules))
+        self.assertEqual(sorted(self.features), sorted(executed))
+        for module, deps in self.graph.items():
+            for dep in deps:
+                self.assertLess(executed.index(dep), executed.index(module))
+
+    def test_run_jobs_reports_failures(self):
+        order = topological_order(self.features, self.graph)
+        jobs = plan_jobs(order, self.graph)
+        executed = []
+
+        def run_job(job):
+            if 'core.feature.gps.gps' in job.modules:
+                raise ValueError('storage lost')
+            executed.extend(job.modules)
+
+        with self.assertRaises(JobsFailed) as failed:
+            run_jobs(jobs, run_job)
+        failures = {m: exp for job, exp in failed.exception.failures.items()
+                    for m in job.modules}
+        self.assertIsInstance(failures['core.feature.gps.gps'], ValueError)
+        # the jobs depending on the failed one are skipped, the others run
+        self.assertIn('core.feature.gps_daily.gps_daily', failures)
+        self.assertNotIn('core.feature.gps_daily.gps_daily', executed)
+        self.assertEqual(sorted(set(self.features) - set(failures)),
+                         sorted(executed))
+
+    def test_run_jobs_concurrently(self):
+        jobs = plan_jobs(['a', 'b', 'c', 'd'], {m: set() for m in 'abcd'})
+        barrier = threading.Barrier(len(jobs), timeout=10)
+        recorded = []
+        lock = threading.Lock()
+
+        def run_job(job):
+            # every job waits for all the others to be running
+            barrier.wait()
+            for i in range(1000):
+                with lock:
+                    recorded.append(job.modules[0])
+
+        run_jobs(jobs, run_job)
+        self.assertEqual(4000, len(recorded))
+
+    def test_run_jobs_limits_concurrency(self):
+        jobs = plan_jobs(['a', 'b', 'c', 'd'], {m: set() for m in 'abcd'})
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def run_job(job):
+            with lock:
+                running.append(job)
+                peak.append(len(running))
+            threading.Event().wait(0.05)
+            with lock:
+                running.remove(job)
+
+        run_jobs(jobs, run_job, max_concurrent_jobs=2)
+        self.assertEqual(2, max(peak))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+from cerebralcortex.core.datatypes.datastream import DataStream
+from core.utils.stream_cache import StreamCache
+
+START = datetime(2018, 1, 1, 5, tzinfo=timezone.utc)
+
+
+class CerebralCortex(object):
+
+    def __init__(self):
+        self.reads = 0
+
+    def get_stream(self, stream_id, user_id=None, day=None, **kwargs):
+        self.reads += 1
+        datastream = DataStream(identifier=stream_id, owner=user_id)
+        datastream.data = [DataPoint(start_time=START + timedelta(seconds=i),
+                                     offset=-18000000, sample=[i])
+                           for i in range(10)]
+        return datastream
+
+
+class TestStreamCache(unittest.TestCase):
+
+    def test_callers_do_not_share_datapoints(self):
+        CC = CerebralCortex()
+        cache = StreamCache(CC)
+        data = cache.get_stream('stream', 'user', '20180101').data
+        # the way phone_features unwraps single value samples
+        for dp in data:
+            dp.sample = dp.sample[0]
+        data[0].start_time = START - timedelta(days=1)
+        data[1].sample = None
+        data.reverse()
+
+        data = cache.get_stream('stream', 'user', '20180101').data
+        self.assertEqual(1, CC.reads)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual([[i] for i in range(10)], [dp.sample for dp in data])
+        self.assertEqual(START, data[0].start_time)
+
+        data[2].sample.append(1)
+        data = cache.get_stream('stream', 'user', '20180101').data
+        self.assertEqual([2], data[2].sample)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import json
+import os
+import syslog
+import traceback
+from datetime import datetime, timedelta
+from syslog import LOG_ERR
+
+from core.utils.manifest import template_versions
+
+DATE_FORMAT = '%Y%m%d'
+WATERMARK_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+class Watermarks(object):
+    """
+    Keeps per user and input stream name the end time of the data that was
+    processed last, so that a long running driver only schedules the
+    user-days that received new data.
+
+    Streams written by the features themselves (all the stream names of the
+    metadata templates) are not watched; their consumers are scheduled
+    through the feature dependencies instead.
+    """
+
+    def __init__(self, watermark_file: str = None):
+        self.watermark_file = watermark_file
+        self.watermarks = {}
+        if watermark_file and os.path.exists(watermark_file):
+            with open(watermark_file) as f:
+                self.watermarks = json.load(f)
+
+    def save(self):
+        if not self.watermark_file:
+            return
+        tmp_file = self.watermark_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.watermarks, f)
+        os.replace(tmp_file, self.watermark_file)
+
+    def poll(self, CC, users: list, first_day: str, last_day: str = None):
+        """
+        Looks up the current end time of every input stream of the users and
+        compares it against the watermarks.
+
+        :param CC: CerebralCortex object
+        :param list users: user identifiers
+        :param str first_day: days before it (YYYYMMDD) are never scheduled
+        :param str last_day: days after it are never scheduled
+        :return: (user_days, updates) where user_days maps every user with
+            new data to the sorted list of affected days and updates holds
+            the new watermarks to pass to advance once the days are processed
+        """
+        outputs = template_versions()
+        user_days = {}
+        updates = {}
+        for user in users:
+            try:
+                streams = CC.get_user_streams(user) or {}
+            except Exception as exp:
+                syslog.openlog(ident="CerebralCortex-Driver")
+                syslog.syslog(LOG_ERR, str(exp) + '\n' +
+                              str(traceback.format_exc()))
+                syslog.closelog()
+                continue
+            days = set()
+            user_watermarks = self.watermarks.get(user, {})
+            for stream_name in streams:
+                if stream_name in outputs:
+                    continue
+                end_time = self._end_time(CC, user, stream_name)
+                if end_time is None:
+                    continue
+                end_time = end_time.replace(tzinfo=None)
+                watermark = user_watermarks.get(stream_name)
+                if watermark is not None and \
+                        end_time.strftime(WATERMARK_FORMAT) <= watermark:
+                    continue
+                if watermark is None:
+                    day = datetime.strptime(first_day, DATE_FORMAT)
+                else:
+                    day = datetime.strptime(watermark, WATERMARK_FORMAT)
+                    day = day.replace(hour=0, minute=0, second=0,
+                                      microsecond=0)
+                while day.date() <= end_time.date():
+                    day_str = day.strftime(DATE_FORMAT)
+                    if day_str >= first_day and \
+                            (last_day is None or day_str <= last_day):
+                        days.add(day_str)
+                    day += timedelta(days=1)
+                updates.setdefault(user, {})[stream_name] = \
+                    end_time.strftime(WATERMARK_FORMAT)
+            if days:
+                user_days[user] = sorted(days)
+        return user_days, updates
+
+    def advance(self, updates: dict):
+        """
+        Moves the watermarks forward to the end times returned by poll.
+        """
+        for user, user_updates in updates.items():
+            self.watermarks.setdefault(user, {}).update(user_updates)
+
+    @staticmethod
+    def _end_time(CC, user, stream_name):
+        end_time = None
+        for stream in CC.get_stream_id(user, stream_name) or []:
+            duration = CC.get_stream_duration(stream['identifier'])
+            if duration and duration.get('end_time'):
+                if end_time is None or duration['end_time'] > end_time:
+                    end_time = duration['end_time']
+        return end_time
@@ -36,6 +36,7 @@ from cerebralcortex.core.datatypes.datastream import DataStream
 from cerebralcortex.core.datatypes.stream_types import StreamTypes
 from cerebralcortex.cerebralcortex import CerebralCortex
 from cerebralcortex.core.util.spark_helper import get_or_create_sc
+from core.utils.cc_pool import get_cerebralcortex, release_cerebralcortex
 
 CC_CONFIG_PATH = '/home/vagrant/CerebralCortex-DockerCompose/cc_config_file/cc_vagrant_configuration.yml'
 
@@ -82,24 +83,27 @@ all_user_ids = [usr['identifier'] for usr in all_users]
 
 def audit_user_streams(user_id, all_days, cc_config):
     print('X'*100,cc_config)
-    CC = CerebralCortex(cc_config)
-    all_user_streams = CC.get_user_streams(user_id)
-    userbuf=''
-    for user_stream_key in all_user_streams:
-        user_stream = all_user_streams[user_stream_key]
+    CC = get_cerebralcortex(cc_config)
+    try:
+        all_user_streams = CC.get_user_streams(user_id)
+        userbuf=''
+        for user_stream_key in all_user_streams:
+            user_stream = all_user_streams[user_stream_key]
         
-        if 'analysis' not in user_stream['name']:
-            continue
-
-        for day in all_days:
-            data_points = 0
-            for stream_id in user_stream['stream_ids']:
-                ds = CC.get_stream(stream_id,user_id,day)
-                data_points += len(ds.data)
-
-            buf = '%s\t%s\t%s\t%d\n' % (user_id, user_stream['name'], str(day),
-                                       data_points)
-            userbuf += buf
+            if 'analysis' not in user_stream['name']:
+                continue
+
+            for day in all_days:
+                data_points = 0
+                for stream_id in user_stream['stream_ids']:
+                    ds = CC.get_stream(stream_id,user_id,day)
+                    data_points += len(ds.data)
+
+                buf = '%s\t%s\t%s\t%d\n' % (user_id, user_stream['name'], str(day),
+                                           data_points)
+                userbuf += buf
+    finally:
+        release_cerebralcortex(cc_config)
 
     out_dir = '/tmp/data_audit'
     if not os.path.exists(out_dir):
@@ -16,7 +16,8 @@ END_DATE="20180130"
 MAX_CORES=128
 
 SPARK_MASTER="spark://dagobah10dot.memphis.edu:7077"
-PY_FILES=${CC_EGG}
+DA_EGG="../../dist/MD2K_Cerebral_Cortex_DataAnalysis_compute_features-2.2.1-py3.6.egg"
+PY_FILES=${CC_EGG}","${DA_EGG}
 
 
 spark-submit --master $SPARK_MASTER \
@@ -0,0 +1,226 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+In-memory stand-in for the CerebralCortex object, implementing the part of its
+interface used by the features so that they can run without Cassandra and
+MySQL.
+"""
+import os
+import pickle
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+from cerebralcortex.core.data_manager.raw.stream_handler import DataSet
+from cerebralcortex.core.datatypes.datastream import DataStream
+from cerebralcortex.core.datatypes.stream_types import StreamTypes
+
+
+class LocalLogging(object):
+    """
+    Replaces CC.logging, keeping the messages in memory.
+    """
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.messages = []
+
+    def log(self, error_message='', error_type=None, *args, **kwargs):
+        self.messages.append(str(error_message))
+        if self.verbose:
+            print(error_message)
+
+
+class LocalCerebralCortex(object):
+    """
+    Keeps streams in memory, optionally loaded from and dumped to a directory
+    with one pickle file per stream.
+
+    Streams are indexed by identifier, with their data points sorted by start
+    time. Days are selected on the local time of the data points, given by
+    their offset, and data points are returned as stored.
+    """
+
+    def __init__(self, data_dir: str = None, verbose=False):
+        self.streams = {}
+        self.logging = LocalLogging(verbose)
+        self.config = {}
+        self.reads = 0
+        self.writes = 0
+        self._cache = {}
+        if data_dir:
+            self.load(data_dir)
+
+    def add_stream(self, user_id: str, name: str, data: list,
+                   identifier: str = None, data_descriptor=None,
+                   execution_context=None, annotations=None,
+                   stream_type=StreamTypes.DATASTREAM) -> str:
+        """
+        Adds or replaces a stream. The identifier defaults to one derived from
+        the user and stream name, like the features do for their outputs.
+
+        :return: the stream identifier
+        """
+        if identifier is None:
+            identifier = str(uuid.uuid3(uuid.NAMESPACE_DNS,
+                                        str(user_id) + name))
+        if execution_context is None:
+            execution_context = {'algorithm': {'version': '1'}}
+        data = sorted(data, key=lambda dp: dp.start_time)
+        self.streams[str(identifier)] = {
+            'identifier': str(identifier), 'owner': str(user_id),
+            'name': name, 'data_descriptor': data_descriptor or [],
+            'execution_context': execution_context,
+            'annotations': annotations or [], 'stream_type': stream_type,
+            'data': data,
+            'start_times': [dp.start_time for dp in data]}
+        return str(identifier)
+
+    def get_all_users(self, study_name: str) -> list:
+        users = sorted(set(s['owner'] for s in self.streams.values()))
+        return [{'identifier': u, 'username': u} for u in users]
+
+    def get_user_streams(self, user_id: str) -> dict:
+        """
+        :return: stream name -> metadata of the user's streams
+        """
+        streams = {}
+        for stream in self.streams.values():
+            if stream['owner'] != str(user_id):
+                continue
+            metadata = self._metadata(stream)
+            duration = self.get_stream_duration(stream['identifier'])
+            metadata.update(duration)
+            streams[stream['name']] = metadata
+        return streams
+
+    def get_stream_id(self, user_id: str, stream_name: str) -> list:
+        return [{'identifier': s['identifier']}
+                for s in self.streams.values()
+                if s['owner'] == str(user_id) and s['name'] == stream_name]
+
+    def get_stream_duration(self, stream_id) -> dict:
+        stream = self.streams.get(str(stream_id))
+        if not stream or not stream['data']:
+            return {'start_time': None, 'end_time': None}
+        last = stream['data'][-1]
+        return {'start_time': stream['start_times'][0],
+                'end_time': last.end_time or last.start_time}
+
+    def get_stream_metadata(self, stream_id) -> list:
+        """
+        :return: the metadata of the stream with its json fields as strings,
+            as returned by the MySQL store
+        """
+        stream = self.streams.get(str(stream_id))
+        if stream is None:
+            return []
+        metadata = self._metadata(stream)
+        for key in ['data_descriptor', 'execution_context', 'annotations']:
+            metadata[key] = str(metadata[key])
+        return [metadata]
+
+    def get_stream(self, stream_id=None, user_id=None, day=None,
+                   start_time=None, end_time=None, localtime=True,
+                   data_type=DataSet.COMPLETE) -> DataStream:
+        self.reads += 1
+        stream = self.streams.get(str(stream_id))
+        if stream is None:
+            return DataStream(identifier=stream_id, owner=user_id, data=[])
+        data = stream['data']
+        if day:
+            # one day of margin on both sides covers all time zones
+            day_start = datetime.strptime(day, '%Y%m%d').replace(
+                tzinfo=timezone.utc)
+            lo = bisect_left(stream['start_times'],
+                             day_start - timedelta(days=1))
+            hi = bisect_left(stream['start_times'],
+                             day_start + timedelta(days=2))
+            data = [dp for dp in data[lo:hi] if self._day(dp) == day]
+        if start_time is not None:
+            data = [dp for dp in data if dp.start_time >= start_time]
+        if end_time is not None:
+            data = [dp for dp in data if dp.start_time <= end_time]
+        metadata = self._metadata(stream)
+        if data_type == DataSet.ONLY_METADATA:
+            data = []
+        elif data_type == DataSet.ONLY_DATA:
+            return DataStream(identifier=stream['identifier'],
+                              owner=stream['owner'], data=list(data))
+        return DataStream(identifier=metadata['identifier'],
+                          owner=metadata['owner'], name=metadata['name'],
+                          data_descriptor=metadata['data_descriptor'],
+                          execution_context=metadata['execution_context'],
+                          annotations=metadata['annotations'],
+                          stream_type=metadata['stream_type'],
+                          data=list(data))
+
+    def save_stream(self, datastream: DataStream, localtime=True):
+        """
+        Stores the data of a DataStream, merged with the data already stored
+        under its identifier.
+        """
+        self.writes += 1
+        identifier = str(datastream.identifier)
+        data = list(datastream.data or [])
+        if identifier in self.streams:
+            data = self.streams[identifier]['data'] + data
+        self.add_stream(datastream.owner, datastream.name, data, identifier,
+                        datastream.data_descriptor,
+                        datastream.execution_context,
+                        datastream.annotations,
+                        getattr(datastream, 'datastream_type', None) or
+                        StreamTypes.DATASTREAM)
+
+    def get_cache_value(self, key):
+        return self._cache.get(key)
+
+    def set_cache_value(self, key, value):
+        self._cache[key] = value
+        return True
+
+    def load(self, data_dir: str):
+        for filename in os.listdir(data_dir):
+            if filename.endswith('.pickle'):
+                with open(os.path.join(data_dir, filename), 'rb') as f:
+                    stream = pickle.load(f)
+                self.streams[stream['identifier']] = stream
+
+    def dump(self, data_dir: str):
+        os.makedirs(data_dir, exist_ok=True)
+        for identifier, stream in self.streams.items():
+            with open(os.path.join(data_dir, identifier + '.pickle'),
+                      'wb') as f:
+                pickle.dump(stream, f, protocol=4)
+
+    @staticmethod
+    def _metadata(stream: dict) -> dict:
+        return {k: v for k, v in stream.items()
+                if k not in ('data', 'start_times')}
+
+    @staticmethod
+    def _day(dp) -> str:
+        offset = int(dp.offset or 0)
+        return (dp.start_time + timedelta(milliseconds=offset)).strftime(
+            '%Y%m%d')
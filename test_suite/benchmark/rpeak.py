@@ -0,0 +1,248 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Times the R-peak detection stages of core/signalprocessing/ecg.py on
+synthetic AutoSense ECG days against the loop implementations they
+replaced, which are kept here as the reference, and checks that both find
+the same R peaks. Run from the repository root, e.g.
+
+    python3 -m test_suite.benchmark.rpeak -H 1,6,24
+
+The exit status is 1 when an output differs from the reference.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core.signalprocessing import ecg
+from test_suite.benchmark.synthetic import ECG_FREQUENCY
+from test_suite.benchmark.synthetic import ecg as synthetic_ecg
+
+
+def reference_simple_peaks(y: np.ndarray) -> list:
+    return [(i, y[i]) for i in range(2, len(y) - 1)
+            if ecg.check_peak(y[i - 2:i + 3])]
+
+
+def reference_rr_interval_update(rpeak_temp1: list, rr_ave: float,
+                                 min_size: int = 8) -> float:
+    peak_interval = np.diff([0] + rpeak_temp1)
+    return rr_ave if len(peak_interval) < min_size else \
+        np.sum(peak_interval[-min_size:]) / min_size
+
+
+def reference_compute_r_peaks(threshold_1: float, rr_ave: float,
+                              mov_win_int_signal: np.ndarray,
+                              peak_tuple_array: list) -> list:
+    peak_location_in_signal_array = [i[0] for i in peak_tuple_array]
+    amplitude_in_peak_locations = [i[1] for i in peak_tuple_array]
+
+    threshold_2 = 0.5 * threshold_1
+    sig_lev = 4 * threshold_1
+    noise_lev = 0.1 * sig_lev
+    ind_rpeak = 0
+    rpeak_array_indices = []
+    rpeak_inds_in_peak_array = []
+    while ind_rpeak < len(peak_location_in_signal_array):
+        if len(rpeak_array_indices) >= 1 and \
+                peak_location_in_signal_array[ind_rpeak] - \
+                peak_location_in_signal_array[rpeak_inds_in_peak_array[-1]] \
+                > 1.66 * rr_ave and \
+                ind_rpeak - rpeak_inds_in_peak_array[-1] > 1:
+            searchback_array = [
+                (k - rpeak_inds_in_peak_array[-1],
+                 amplitude_in_peak_locations[k])
+                for k in range(rpeak_inds_in_peak_array[-1] + 1, ind_rpeak)
+                if 3 * sig_lev > amplitude_in_peak_locations[k] > threshold_2]
+            if len(searchback_array) > 0:
+                searchback_max_index = np.argmax(
+                    [x[1] for x in searchback_array])
+                rpeak_array_indices.append(peak_location_in_signal_array[
+                    rpeak_inds_in_peak_array[-1] +
+                    searchback_array[searchback_max_index][0]])
+                rpeak_inds_in_peak_array.append(
+                    rpeak_inds_in_peak_array[-1] +
+                    searchback_array[searchback_max_index][0])
+                sig_lev = ecg.ewma(sig_lev, mov_win_int_signal[
+                    peak_location_in_signal_array[ind_rpeak]], .125)
+                threshold_1 = noise_lev + 0.25 * (sig_lev - noise_lev)
+                threshold_2 = 0.5 * threshold_1
+                rr_ave = reference_rr_interval_update(rpeak_array_indices,
+                                                      rr_ave)
+                ind_rpeak = rpeak_inds_in_peak_array[-1] + 1
+            else:
+                threshold_1 = noise_lev + 0.25 * (sig_lev - noise_lev)
+                threshold_2 = 0.5 * threshold_1
+                ind_rpeak += 1
+        else:
+            value = mov_win_int_signal[peak_location_in_signal_array[ind_rpeak]]
+            if threshold_1 <= value < 3 * sig_lev:
+                rpeak_array_indices.append(
+                    peak_location_in_signal_array[ind_rpeak])
+                rpeak_inds_in_peak_array.append(ind_rpeak)
+                sig_lev = ecg.ewma(sig_lev, value, .125)
+            elif threshold_1 > value > threshold_2:
+                noise_lev = ecg.ewma(noise_lev, value, .125)
+            threshold_1 = noise_lev + 0.25 * (sig_lev - noise_lev)
+            threshold_2 = 0.5 * threshold_1
+            ind_rpeak += 1
+            rr_ave = reference_rr_interval_update(rpeak_array_indices, rr_ave)
+    return rpeak_array_indices
+
+
+def reference_remove_close_peaks(rpeak_temp1: list, sample: np.ndarray,
+                                 fs: float, min_range: float = .5) -> list:
+    difference = 0
+    rpeak_temp2 = list(rpeak_temp1)
+    while difference != 1:
+        length_rpeak_temp2 = len(rpeak_temp2)
+        temp = np.diff(rpeak_temp2)
+        close = [i for i in range(len(temp)) if temp[i] < min_range * fs]
+        comp1 = sample[[rpeak_temp2[i] for i in close]]
+        comp2 = sample[[rpeak_temp2[i + 1] for i in close]]
+        temp_ind = np.unique(
+            close + np.argmin(np.array([comp1, comp2]), axis=0))
+        count = 0
+        for i in temp_ind:
+            rpeak_temp2.remove(rpeak_temp2[i - count])
+            count = count + 1
+        difference = length_rpeak_temp2 - len(rpeak_temp2) + 1
+    return rpeak_temp2
+
+
+def reference_confirm_peaks(rpeak_temp1: list, sample: np.ndarray, fs: float,
+                            range_for_checking: float = 1 / 10) -> np.ndarray:
+    rpeak_temp1 = list(rpeak_temp1)
+    for i in range(1, len(rpeak_temp1) - 1):
+        start_index = int(rpeak_temp1[i] - np.ceil(range_for_checking * fs))
+        end_index = int(rpeak_temp1[i] + np.ceil(range_for_checking * fs) + 1)
+        index = np.argmax(sample[start_index:end_index])
+        rpeak_temp1[i] = rpeak_temp1[i] - np.ceil(range_for_checking * fs) + \
+            index
+    return np.array(rpeak_temp1).astype(np.int64)
+
+
+STAGES = ['simple_peaks', 'compute_r_peaks', 'remove_close_peaks',
+          'confirm_peaks']
+
+
+def run_stages(sample: np.ndarray, y: np.ndarray, fs: float,
+               implementation: dict) -> tuple:
+    """
+    :return: seconds spent in each stage and the R peak indices
+    """
+    timings = {}
+    start = time.perf_counter()
+    peaks = implementation['simple_peaks'](y)
+    timings['simple_peaks'] = time.perf_counter() - start
+    peak_location = [i[0] for i in peaks]
+    running_rr_avg = sum(np.diff(peak_location)) / (len(peak_location) - 1)
+
+    start = time.perf_counter()
+    rpeak_temp1 = implementation['compute_r_peaks'](.5, running_rr_avg, y,
+                                                    peaks)
+    timings['compute_r_peaks'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rpeak_temp2 = implementation['remove_close_peaks'](rpeak_temp1, sample,
+                                                       fs)
+    timings['remove_close_peaks'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = implementation['confirm_peaks'](rpeak_temp2, sample, fs)
+    timings['confirm_peaks'] = time.perf_counter() - start
+    return timings, index
+
+
+REFERENCE = {
+    'simple_peaks': reference_simple_peaks,
+    'compute_r_peaks': reference_compute_r_peaks,
+    'remove_close_peaks': reference_remove_close_peaks,
+    'confirm_peaks': reference_confirm_peaks,
+}
+
+def simple_peaks(y: np.ndarray) -> list:
+    peak_location = ecg.find_simple_peaks(y)
+    return list(zip(peak_location.tolist(), y[peak_location].tolist()))
+
+
+VECTORIZED = {
+    'simple_peaks': simple_peaks,
+    'compute_r_peaks': ecg.compute_r_peaks,
+    'remove_close_peaks': ecg.remove_close_peaks,
+    'confirm_peaks': ecg.confirm_peaks,
+}
+
+
+def benchmark(hours: float, seed: int = 0) -> bool:
+    """
+    Prints the stage timings of both implementations on a synthetic ECG
+    day of the given length.
+
+    :return: whether both implementations found the same R peaks
+    """
+    start = datetime(2018, 1, 1, tzinfo=timezone.utc)
+    data = synthetic_ecg(start, hours, seed=seed)
+    sample = np.array([i.sample for i in data])
+    fs = ECG_FREQUENCY
+    y = ecg.compute_moving_window_int(sample, fs, np.ceil(fs * 0.2))
+
+    reference_timings, reference_index = run_stages(sample, y, fs, REFERENCE)
+    timings, index = run_stages(sample, y, fs, VECTORIZED)
+    same = np.array_equal(reference_index, index)
+
+    print('%g hours, %d samples, %d R peaks%s' % (
+        hours, len(sample), len(index), '' if same else ', OUTPUT DIFFERS'))
+    for stage in STAGES + ['total']:
+        if stage == 'total':
+            before = sum(reference_timings.values())
+            after = sum(timings.values())
+        else:
+            before = reference_timings[stage]
+            after = timings[stage]
+        print('  %-20s %9.3fs %9.3fs %8.1fx' % (
+            stage, before, after, before / after if after else float('inf')))
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the R-peak detection of ecg.py')
+    parser.add_argument('-H', '--hours', default='1,6,24',
+                        help='comma separated lengths of the ECG days')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-22s %10s %10s %9s' % ('', 'reference', 'numpy', 'speedup'))
+    same = True
+    for hours in args.hours.split(','):
+        same = benchmark(float(hours), args.seed) and same
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
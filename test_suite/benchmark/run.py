@@ -0,0 +1,191 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Times the process method of features on synthetic user-days of increasing
+size, against a LocalCerebralCortex. Run from the repository root, e.g.
+
+    python3 -m test_suite.benchmark.run -f activity,DecodeHRV -H 1,6,24 \
+        -o benchmark.json
+
+The exit status is 1 when a feature produced no output, since its timing
+then only measures an early exit. With a baseline report of a previous run,
+features which got slower by more than the tolerance are listed and the exit
+status is 1 as well.
+"""
+import argparse
+import importlib
+import json
+import statistics
+import sys
+import time
+
+from core.utils.profiling import PROCESS, Profiler, ProfilingCC, profiling
+from test_suite.benchmark.local_cc import LocalCerebralCortex
+from test_suite.benchmark.synthetic import *
+
+BENCHMARK_USER = '00000000-0000-0000-0000-000000000000'
+BENCHMARK_DAY = '20180101'
+
+MOTIONSENSE_STREAMS = [MOTIONSENSE_HRV_ACCEL_LEFT, MOTIONSENSE_HRV_ACCEL_RIGHT,
+                       MOTIONSENSE_HRV_GYRO_LEFT, MOTIONSENSE_HRV_GYRO_RIGHT]
+RAW_MOTIONSENSE_STREAMS = [MOTIONSENSE_HRV_RAW_LEFT, MOTIONSENSE_HRV_RAW_RIGHT]
+DECODED_MOTIONSENSE_STREAMS = [MOTIONSENSE_HRV_DECODED_LEFT,
+                               MOTIONSENSE_HRV_DECODED_RIGHT]
+PHONE_STREAMS = [PHONE_CALL_DURATION, PHONE_SMS_LENGTH, PHONE_LIGHT,
+                 PHONE_PROXIMITY]
+
+# feature -> input streams generated for it
+FEATURE_INPUTS = {
+    'activity': MOTIONSENSE_STREAMS,
+    'puffmarker': MOTIONSENSE_STREAMS,
+    'typing': MOTIONSENSE_STREAMS,
+    'DecodeHRV': RAW_MOTIONSENSE_STREAMS,
+    'PresenceDecodeHRV': DECODED_MOTIONSENSE_STREAMS,
+    'phone_features': PHONE_STREAMS,
+    'gps': [PHONE_LOCATION],
+    'respiration_cycle_statistics': [AUTOSENSE_RIP, AUTOSENSE_RIP_BASELINE],
+}
+
+
+def run_feature(feature: str, hours: float, seed=0) -> dict:
+    """
+    Runs a feature once on a fresh LocalCerebralCortex holding one synthetic
+    user-day of its input streams.
+
+    :return: measurements of the run
+    """
+    CC = LocalCerebralCortex()
+    input_points = generate_user_day(CC, BENCHMARK_USER, BENCHMARK_DAY,
+                                     FEATURE_INPUTS[feature], hours, seed)
+    inputs = set(CC.streams)
+    module = importlib.import_module('core.feature.%s.%s' % (feature,
+                                                            feature))
+    profiler = Profiler()
+    instance = getattr(module, module.feature_class_name)(
+        ProfilingCC(CC, profiler))
+    cpu_start = time.process_time()
+    with profiling(profiler), profiler.measure(PROCESS) as counts:
+        instance.process(BENCHMARK_USER, [BENCHMARK_DAY])
+        counts['points'] = input_points
+    output_points = sum(len(s['data']) for i, s in CC.streams.items()
+                        if i not in inputs)
+    process = profiler.operations[PROCESS]
+    return {'feature': feature, 'hours': hours,
+            'input_points': input_points, 'output_points': output_points,
+            'wall_time': process['wall_time'],
+            'cpu_time': time.process_time() - cpu_start,
+            'operations': profiler.operations}
+
+
+def benchmark(features: list, hours: list, repeat: int) -> list:
+    """
+    :return: one result per feature and size, with the median and minimum
+        wall time over the repetitions
+    """
+    results = []
+    for feature in features:
+        for h in hours:
+            runs = [run_feature(feature, h) for _ in range(repeat)]
+            walls = [r['wall_time'] for r in runs]
+            result = runs[-1]
+            result['wall_time'] = statistics.median(walls)
+            result['min_wall_time'] = min(walls)
+            result['cpu_time'] = statistics.median(r['cpu_time']
+                                                   for r in runs)
+            result['points_per_second'] = \
+                result['input_points'] / result['wall_time'] \
+                if result['wall_time'] > 0 else 0.0
+            result['repeat'] = repeat
+            results.append(result)
+            print('%-32s %6.1f h %10d points %9.2f s %12.0f points/s' %
+                  (feature, h, result['input_points'], result['wall_time'],
+                   result['points_per_second']))
+    return results
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    """
+    :return: (feature, hours, baseline seconds, seconds) of the results whose
+        median wall time exceeds the baseline by more than tolerance
+    """
+    previous = {(r['feature'], r['hours']): r['wall_time'] for r in baseline}
+    slower = []
+    for r in results:
+        before = previous.get((r['feature'], r['hours']))
+        if before and r['wall_time'] > before * (1 + tolerance):
+            slower.append((r['feature'], r['hours'], before, r['wall_time']))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CerebralCortex feature '
+                                     'benchmark on synthetic data')
+    parser.add_argument("-f", "--feature-list", help="Comma separated "
+                        "features, all benchmarked features by default",
+                        required=False)
+    parser.add_argument("-H", "--hours", default='1,6,24', help="Comma "
+                        "separated hours of data per user-day",
+                        required=False)
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Runs per feature and size", required=False)
+    parser.add_argument("-o", "--output", help="JSON file to write the "
+                        "results to", required=False)
+    parser.add_argument("-b", "--baseline", help="JSON results of a "
+                        "previous run to compare against", required=False)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown relative to the baseline",
+                        required=False)
+    args = parser.parse_args()
+
+    features = sorted(FEATURE_INPUTS)
+    if args.feature_list:
+        features = args.feature_list.split(',')
+    unsupported = [f for f in features if f not in FEATURE_INPUTS]
+    if unsupported:
+        parser.error('unsupported features %s, choose from %s' %
+                     (','.join(unsupported), ','.join(sorted(FEATURE_INPUTS))))
+    hours = [float(h) for h in args.hours.split(',')]
+    results = benchmark(features, hours, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    failed = False
+    for r in results:
+        if r['output_points'] == 0:
+            print('NO OUTPUT %s %.1f h' % (r['feature'], r['hours']))
+            failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        for feature, h, before, after in slower:
+            print('REGRESSION %s %.1f h: %.2f s -> %.2f s' % (feature, h,
+                                                               before, after))
+        if slower:
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Measures the time to first task of the driver: the time a fresh interpreter
+takes to import the driver, resolve a feature, import its module and run it
+on a small synthetic user-day. Each measurement runs in its own interpreter,
+as every executor pays the imports once. Run from the repository root, e.g.
+
+    python3 -m test_suite.benchmark.startup -f activity,gps -r 3
+
+Only light modules are imported at the top of this file, so that the child
+interpreters measure the imports of the driver and the feature alone.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+STAGES = ['driver_import', 'discover', 'feature_import', 'first_task']
+
+
+def measure(feature: str, hours: float) -> dict:
+    """
+    Runs in the child interpreter.
+
+    :return: seconds spent in each stage
+    """
+    timings = {}
+    start = time.perf_counter()
+    import driver
+    timings['driver_import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    modules = driver.discover_features([feature])
+    timings['discover'] = time.perf_counter() - start
+
+    import importlib
+    start = time.perf_counter()
+    module = importlib.import_module(modules[0])
+    timings['feature_import'] = time.perf_counter() - start
+
+    from test_suite.benchmark.local_cc import LocalCerebralCortex
+    from test_suite.benchmark.run import BENCHMARK_DAY, BENCHMARK_USER, \
+        FEATURE_INPUTS
+    from test_suite.benchmark.synthetic import generate_user_day
+    CC = LocalCerebralCortex()
+    generate_user_day(CC, BENCHMARK_USER, BENCHMARK_DAY,
+                      FEATURE_INPUTS.get(feature, []), hours)
+    start = time.perf_counter()
+    instance = getattr(module, module.feature_class_name)(CC)
+    instance.process(BENCHMARK_USER, [BENCHMARK_DAY])
+    timings['first_task'] = time.perf_counter() - start
+    timings['time_to_first_task'] = sum(timings[s] for s in STAGES)
+    return timings
+
+
+def run_child(feature: str, hours: float) -> dict:
+    """
+    Measures a feature in a fresh interpreter.
+    """
+    root = os.getcwd()
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root, os.path.join(root, 'core')] +
+        [p for p in [env.get('PYTHONPATH')] if p])
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'test_suite.benchmark.startup', '--child',
+         feature, '--data-hours', str(hours)], env=env, cwd=root)
+    # features print, the timings are on the last line
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Driver startup benchmark')
+    parser.add_argument("-f", "--feature-list", help="Comma separated "
+                        "features, all registered features by default",
+                        required=False)
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Fresh interpreters per feature", required=False)
+    parser.add_argument("--data-hours", type=float, default=0.1,
+                        help="Hours of synthetic data of the first task",
+                        required=False)
+    parser.add_argument("-o", "--output", help="JSON file to write the "
+                        "results to", required=False)
+    parser.add_argument("--child", help=argparse.SUPPRESS, required=False)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.data_hours)))
+        return
+
+    if args.feature_list:
+        features = args.feature_list.split(',')
+    else:
+        from core.utils.feature_registry import FEATURES
+        features = FEATURES
+    results = []
+    print('%-32s' % 'feature' + ''.join('%16s' % s for s in STAGES) +
+          '%20s' % 'time_to_first_task')
+    for feature in features:
+        try:
+            runs = [run_child(feature, args.data_hours)
+                    for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print('%-32s failed: %s' % (feature, str(e)))
+            continue
+        result = {'feature': feature}
+        for key in runs[0]:
+            result[key] = statistics.median(r[key] for r in runs)
+        results.append(result)
+        print('%-32s' % feature +
+              ''.join('%16.3f' % result[s] for s in STAGES) +
+              '%20.3f' % result['time_to_first_task'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+# Copyright (c) 2018, MD2K Center of Excellence
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+# list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+# this list of conditions and the following disclaimer in the documentation
+# and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+# FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+# SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+# OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+Generators of synthetic, but realistically shaped, streams of the sensors used
+by the features. All generators are deterministic for a given seed and return
+lists of DataPoints starting at start and covering the given number of hours.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import numpy as np
+from cerebralcortex.core.datatypes.datapoint import DataPoint
+
+# stream names
+MOTIONSENSE_HRV_ACCEL_LEFT = "ACCELEROMETER--org.md2k.motionsense--MOTION_SENSE_HRV--LEFT_WRIST"
+MOTIONSENSE_HRV_ACCEL_RIGHT = "ACCELEROMETER--org.md2k.motionsense--MOTION_SENSE_HRV--RIGHT_WRIST"
+MOTIONSENSE_HRV_GYRO_LEFT = "GYROSCOPE--org.md2k.motionsense--MOTION_SENSE_HRV--LEFT_WRIST"
+MOTIONSENSE_HRV_GYRO_RIGHT = "GYROSCOPE--org.md2k.motionsense--MOTION_SENSE_HRV--RIGHT_WRIST"
+MOTIONSENSE_HRV_RAW_LEFT = "RAW--org.md2k.motionsense--MOTION_SENSE_HRV--LEFT_WRIST"
+MOTIONSENSE_HRV_RAW_RIGHT = "RAW--org.md2k.motionsense--MOTION_SENSE_HRV--RIGHT_WRIST"
+MOTIONSENSE_HRV_DECODED_LEFT = "org.md2k.feature.motionsensehrv.decoded.leftwrist.v2"
+MOTIONSENSE_HRV_DECODED_RIGHT = "org.md2k.feature.motionsensehrv.decoded.rightwrist.v2"
+PHONE_CALL_DURATION = "CU_CALL_DURATION--edu.dartmouth.eureka"
+PHONE_SMS_LENGTH = "CU_SMS_LENGTH--edu.dartmouth.eureka"
+PHONE_LIGHT = "AMBIENT_LIGHT--org.md2k.phonesensor--PHONE"
+PHONE_PROXIMITY = "PROXIMITY--org.md2k.phonesensor--PHONE"
+PHONE_LOCATION = "LOCATION--org.md2k.phonesensor--PHONE"
+AUTOSENSE_RIP = "RESPIRATION--org.md2k.autosenseble--AUTOSENSE_BLE--CHEST"
+AUTOSENSE_RIP_BASELINE = "RESPIRATION_BASELINE--org.md2k.autosenseble--AUTOSENSE_BLE--CHEST"
+AUTOSENSE_ECG = "ECG--org.md2k.autosenseble--AUTOSENSE_BLE--CHEST"
+
+# sampling frequencies in Hz
+MOTIONSENSE_FREQUENCY = 25.0
+RIP_FREQUENCY = 64.0 / 3
+ECG_FREQUENCY = 64.0
+
+# time zone offset of the generated data points in milliseconds
+DEFAULT_OFFSET = -18000000
+
+
+def _start_times(start: datetime, hours: float, frequency: float,
+                 rng=None) -> np.ndarray:
+    """
+    :return: epoch milliseconds of the samples of a stream of the given
+        frequency, with a small jitter when rng is given
+    """
+    count = int(hours * 3600 * frequency)
+    start_ms = start.timestamp() * 1000
+    ts = start_ms + np.arange(count) * 1000.0 / frequency
+    if rng is not None:
+        ts += rng.uniform(0, 200.0 / frequency, count)
+    return ts
+
+
+def _events(start: datetime, hours: float, per_hour: float, rng) -> np.ndarray:
+    """
+    :return: sorted epoch milliseconds of events happening at a Poisson rate
+    """
+    count = rng.poisson(per_hour * hours)
+    start_ms = start.timestamp() * 1000
+    return np.sort(start_ms + rng.uniform(0, hours * 3600000, count))
+
+
+def _datapoints(ts: np.ndarray, samples, offset: int,
+                duration_ms=None) -> List[DataPoint]:
+    data = []
+    for i, t in enumerate(ts):
+        start_time = datetime.fromtimestamp(t / 1000, timezone.utc)
+        end_time = None
+        if duration_ms is not None:
+            end_time = start_time + timedelta(milliseconds=duration_ms[i])
+        data.append(DataPoint(start_time=start_time, end_time=end_time,
+                              offset=offset, sample=samples[i]))
+    return data
+
+
+def _activity_level(ts: np.ndarray, rng) -> np.ndarray:
+    """
+    :return: per sample intensity in [0, 1], piecewise constant over
+        minutes, mostly sedentary with bouts of walking
+    """
+    if not len(ts):
+        return ts
+    minutes = ((ts - ts[0]) // 60000).astype(int)
+    levels = rng.choice([0.05, 0.2, 0.6, 1.0], minutes[-1] + 1,
+                        p=[0.6, 0.25, 0.1, 0.05])
+    return levels[minutes]
+
+
+def motionsense_accel(start: datetime, hours: float,
+                      frequency=MOTIONSENSE_FREQUENCY, offset=DEFAULT_OFFSET,
+                      seed=0) -> List[DataPoint]:
+    """
+    Wrist accelerometer in g: gravity plus periodic arm swing whose amplitude
+    follows the activity level.
+    """
+    rng = np.random.RandomState(seed)
+    ts = _start_times(start, hours, frequency, rng)
+    level = _activity_level(ts, rng)
+    t = np.arange(len(ts)) / frequency
+    swing = level * np.sin(2 * np.pi * 1.8 * t)
+    samples = np.stack([0.1 + 0.8 * swing,
+                        -0.3 + 0.4 * swing,
+                        0.9 + 0.5 * level * np.cos(2 * np.pi * 1.8 * t)],
+                       axis=1)
+    samples += rng.normal(0, 0.02, samples.shape)
+    samples = np.clip(samples, -2.5, 2.5)
+    return _datapoints(ts, samples.tolist(), offset)
+
+
+def motionsense_gyro(start: datetime, hours: float,
+                     frequency=MOTIONSENSE_FREQUENCY, offset=DEFAULT_OFFSET,
+                     seed=0) -> List[DataPoint]:
+    """
+    Wrist gyroscope in degrees per second.
+    """
+    rng = np.random.RandomState(seed + 1)
+    ts = _start_times(start, hours, frequency, rng)
+    level = _activity_level(ts, np.random.RandomState(seed))
+    t = np.arange(len(ts)) / frequency
+    rotation = 120 * level * np.sin(2 * np.pi * 1.8 * t + 0.5)
+    samples = np.stack([rotation, 0.5 * rotation, -0.3 * rotation],
+                       axis=1)
+    samples += rng.normal(0, 2.0, samples.shape)
+    samples = np.clip(samples, -250, 250)
+    return _datapoints(ts, samples.tolist(), offset)
+
+
+def encode_motionsense_packet(accel, gyro, leds, seq) -> List[int]:
+    """
+    Packs one sample into the 20 byte MotionSense HRV packet decoded by
+    core.feature.DecodeHRV.util_raw_byte_decode: accel and gyro as big endian
+    int16, three 18 bit PPG channels and a 10 bit sequence number.
+
+    :return: the 20 bytes as signed ints, as stored in the RAW streams
+    """
+    packet = []
+    for v in list(accel) + list(gyro):
+        v = int(v) & 0xffff
+        packet += [v >> 8, v & 0xff]
+    led1, led2, led3 = [int(v) & 0x3ffff for v in leds]
+    seq = int(seq) & 0x3ff
+    packet += [led1 >> 10, (led1 >> 2) & 0xff,
+               ((led1 & 0x3) << 6) | (led2 >> 12), (led2 >> 4) & 0xff,
+               ((led2 & 0xf) << 4) | (led3 >> 14), (led3 >> 6) & 0xff,
+               ((led3 & 0x3f) << 2) | (seq >> 8), seq & 0xff]
+    return [b - 256 if b > 127 else b for b in packet]
+
+
+def motionsense_raw(start: datetime, hours: float,
+                    frequency=MOTIONSENSE_FREQUENCY, offset=DEFAULT_OFFSET,
+                    seed=0) -> List[DataPoint]:
+    """
+    Raw MotionSense HRV packets with accelerometer, gyroscope and a PPG
+    signal pulsing at about 72 beats per minute.
+    """
+    rng = np.random.RandomState(seed + 2)
+    ts = _start_times(start, hours, frequency, rng)
+    t = np.arange(len(ts)) / frequency
+    pulse = np.sin(2 * np.pi * 1.2 * t)
+    red = 150000 + 600 * pulse + rng.normal(0, 30, len(ts))
+    infrared = 175000 + 800 * pulse + rng.normal(0, 30, len(ts))
+    green = 6000 + 300 * pulse + rng.normal(0, 30, len(ts))
+    accel = rng.normal(0, 400, (len(ts), 3)) + [0, 0, 8192]
+    gyro = rng.normal(0, 200, (len(ts), 3))
+    samples = [encode_motionsense_packet(accel[i], gyro[i],
+                                         (red[i], infrared[i], green[i]), i)
+               for i in range(len(ts))]
+    return _datapoints(ts, samples, offset)
+
+
+def motionsense_decoded(start: datetime, hours: float,
+                        frequency=MOTIONSENSE_FREQUENCY, offset=DEFAULT_OFFSET,
+                        seed=0) -> List[DataPoint]:
+    """
+    Decoded MotionSense HRV samples as stored by DecodeHRV: the three PPG
+    channels, the accelerometer in g, the gyroscope in degrees per second
+    and the PPG quality mark, 1 for attached.
+    """
+    rng = np.random.RandomState(seed + 10)
+    ts = _start_times(start, hours, frequency, rng)
+    t = np.arange(len(ts)) / frequency
+    pulse = np.sin(2 * np.pi * 1.2 * t)
+    leds = np.stack([150000 + 600 * pulse, 175000 + 800 * pulse,
+                     6000 + 300 * pulse], axis=1)
+    leds += rng.normal(0, 30, leds.shape)
+    accel = rng.normal(0, 0.05, (len(ts), 3)) + [0, 0, 1]
+    gyro = rng.normal(0, 6, (len(ts), 3))
+    samples = np.concatenate([leds, accel, gyro, np.ones((len(ts), 1))],
+                             axis=1)
+    return _datapoints(ts, samples.tolist(), offset)
+
+
+def phone_call_duration(start: datetime, hours: float, calls_per_hour=0.5,
+                        offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    Call durations in seconds.
+    """
+    rng = np.random.RandomState(seed + 3)
+    ts = _events(start, hours, calls_per_hour, rng)
+    return _datapoints(ts, rng.exponential(120, len(ts)).round().tolist(),
+                       offset)
+
+
+def phone_sms_length(start: datetime, hours: float, sms_per_hour=2.0,
+                     offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    SMS lengths in characters.
+    """
+    rng = np.random.RandomState(seed + 4)
+    ts = _events(start, hours, sms_per_hour, rng)
+    return _datapoints(ts, rng.randint(1, 160, len(ts)).tolist(), offset)
+
+
+def phone_light(start: datetime, hours: float, frequency=0.2,
+                offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    Ambient light in lux following the time of the day.
+    """
+    rng = np.random.RandomState(seed + 5)
+    ts = _start_times(start, hours, frequency, rng)
+    hour_of_day = ((ts / 3600000.0) + DEFAULT_OFFSET / 3600000.0) % 24
+    daylight = np.clip(np.sin(np.pi * (hour_of_day - 6) / 14), 0, None)
+    lux = 5 + 400 * daylight * rng.uniform(0.2, 1.0, len(ts))
+    return _datapoints(ts, lux.round(1).tolist(), offset)
+
+
+def phone_proximity(start: datetime, hours: float, frequency=0.1,
+                    offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    Proximity in cm, 0 when the phone is covered.
+    """
+    rng = np.random.RandomState(seed + 6)
+    ts = _start_times(start, hours, frequency, rng)
+    covered = rng.uniform(size=len(ts)) < 0.3
+    return _datapoints(ts, np.where(covered, 0.0, 5.0).tolist(), offset)
+
+
+def gps(start: datetime, hours: float, frequency=1.0 / 60,
+        offset=DEFAULT_OFFSET, seed=0, home=(35.1175, -89.9711),
+        work=(35.1212, -89.9378)) -> List[DataPoint]:
+    """
+    Phone locations [latitude, longitude, altitude, speed, bearing,
+    accuracy] of a participant staying at home at night and at work during
+    the day, with noise of a few meters and commutes in between.
+    """
+    rng = np.random.RandomState(seed + 7)
+    ts = _start_times(start, hours, frequency, rng)
+    hour_of_day = ((ts / 3600000.0) + DEFAULT_OFFSET / 3600000.0) % 24
+    at_work = np.clip(np.minimum(hour_of_day - 8.5, 17.5 - hour_of_day) * 2 +
+                      0.5, 0, 1)
+    lat = home[0] + (work[0] - home[0]) * at_work
+    lon = home[1] + (work[1] - home[1]) * at_work
+    lat += rng.normal(0, 0.00005, len(ts))
+    lon += rng.normal(0, 0.00005, len(ts))
+    moving = (at_work > 0) & (at_work < 1)
+    speed = np.where(moving, rng.uniform(5, 20, len(ts)), 0.0)
+    samples = np.stack([lat, lon, rng.normal(80, 2, len(ts)), speed,
+                        rng.uniform(0, 360, len(ts)),
+                        rng.uniform(5, 30, len(ts))], axis=1)
+    return _datapoints(ts, samples.tolist(), offset)
+
+
+def rip(start: datetime, hours: float, frequency=RIP_FREQUENCY,
+        offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    AutoSense respiration (RIP) in ADC units, breathing at 12 to 18 breaths
+    per minute.
+    """
+    rng = np.random.RandomState(seed + 8)
+    ts = _start_times(start, hours, frequency)
+    t = np.arange(len(ts)) / frequency
+    rate = 0.25 + 0.05 * np.sin(2 * np.pi * t / 600)
+    phase = 2 * np.pi * np.cumsum(rate) / frequency
+    signal = 2000 + 600 * np.sin(phase) + rng.normal(0, 15, len(ts))
+    return _datapoints(ts, signal.round().tolist(), offset)
+
+
+def rip_baseline(start: datetime, hours: float, frequency=RIP_FREQUENCY,
+                 offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    AutoSense respiration baseline (reference) in ADC units, slowly drifting,
+    at the sample times of rip.
+    """
+    rng = np.random.RandomState(seed + 11)
+    ts = _start_times(start, hours, frequency)
+    t = np.arange(len(ts)) / frequency
+    signal = 2048 + 100 * np.sin(2 * np.pi * t / 900) + \
+        rng.normal(0, 5, len(ts))
+    return _datapoints(ts, signal.round().tolist(), offset)
+
+
+def ecg(start: datetime, hours: float, frequency=ECG_FREQUENCY,
+        offset=DEFAULT_OFFSET, seed=0) -> List[DataPoint]:
+    """
+    AutoSense ECG in ADC units with gaussian QRS complexes at a heart rate
+    varying around 70 beats per minute.
+    """
+    rng = np.random.RandomState(seed + 9)
+    ts = _start_times(start, hours, frequency)
+    t = np.arange(len(ts)) / frequency
+    rr = 60.0 / 70 + rng.normal(0, 0.04, int(hours * 3600 * 70 / 60) + 2)
+    beats = np.cumsum(rr)
+    idx = np.searchsorted(beats, t)
+    idx = np.clip(idx, 1, len(beats) - 1)
+    distance = np.minimum(np.abs(t - beats[idx - 1]), np.abs(beats[idx] - t))
+    signal = 2000 + 1500 * np.exp(-(distance / 0.015) ** 2) + \
+        150 * np.sin(2 * np.pi * 0.25 * t) + rng.normal(0, 20, len(ts))
+    return _datapoints(ts, signal.round().tolist(), offset)
+
+
+# stream name -> generator
+STREAM_GENERATORS = {
+    MOTIONSENSE_HRV_ACCEL_LEFT: motionsense_accel,
+    MOTIONSENSE_HRV_ACCEL_RIGHT: motionsense_accel,
+    MOTIONSENSE_HRV_GYRO_LEFT: motionsense_gyro,
+    MOTIONSENSE_HRV_GYRO_RIGHT: motionsense_gyro,
+    MOTIONSENSE_HRV_RAW_LEFT: motionsense_raw,
+    MOTIONSENSE_HRV_RAW_RIGHT: motionsense_raw,
+    MOTIONSENSE_HRV_DECODED_LEFT: motionsense_decoded,
+    MOTIONSENSE_HRV_DECODED_RIGHT: motionsense_decoded,
+    PHONE_CALL_DURATION: phone_call_duration,
+    PHONE_SMS_LENGTH: phone_sms_length,
+    PHONE_LIGHT: phone_light,
+    PHONE_PROXIMITY: phone_proximity,
+    PHONE_LOCATION: gps,
+    AUTOSENSE_RIP: rip,
+    AUTOSENSE_RIP_BASELINE: rip_baseline,
+    AUTOSENSE_ECG: ecg,
+}
+
+
+def generate_user_day(CC, user_id: str, day: str, stream_names: list,
+                      hours=24.0, seed=0) -> int:
+    """
+    Adds synthetic streams to a LocalCerebralCortex for a user-day. The data
+    starts at the local midnight of the day.
+
+    :param str day: YYYYMMDD
+    :return: number of data points added
+    """
+    start = datetime.strptime(day, '%Y%m%d').replace(tzinfo=timezone.utc) - \
+        timedelta(milliseconds=DEFAULT_OFFSET)
+    count = 0
+    for i, stream_name in enumerate(stream_names):
+        data = STREAM_GENERATORS[stream_name](start, hours, seed=seed + i)
+        CC.add_stream(user_id, stream_name, data)
+        count += len(data)
+    return count